@@ -0,0 +1,60 @@
+"""
+Compare two results files written by benchmarks.run.
+
+Prints the relative change of every timing and exits with status 1 if any
+timing got slower than --threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for case, timings in sorted(current["results"].items()):
+        baseline_timings = baseline["results"].get(case)
+        if baseline_timings is None:
+            print(f"{case}: not in baseline")
+            continue
+
+        for phase, seconds in sorted(timings.items()):
+            if phase == "lines" or phase not in baseline_timings:
+                continue
+            before = baseline_timings[phase]
+            ratio = seconds / before if before else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{case} {phase}")
+            print(
+                f"{case:<16} {phase:<36} {before * 1000:10.2f}ms "
+                f"{seconds * 1000:10.2f}ms {ratio:6.2f}x{flag}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", type=str)
+    parser.add_argument("current", type=str)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown as a fraction, 0.1 means 10%%",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} timings regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
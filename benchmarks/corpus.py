@@ -0,0 +1,142 @@
+"""
+Deterministic generator of synthetic Python modules for benchmarking.
+
+The same (shape, size, seed) always produces byte-identical source, so results
+can be compared between commits and machines.
+"""
+import argparse
+import os
+import random
+
+SHAPES = ("flat", "nested", "lambdas", "huge", "attrs")
+DEFAULT_SIZES = (100, 1000)
+DEFAULT_SEED = 0
+
+
+def _function(rng: random.Random, name: str, indent: str = "") -> list[str]:
+    num_args = rng.randint(0, 6)
+    args = [f"arg{idx}" for idx in range(num_args)]
+    if args and rng.random() < 0.2:
+        args[-1] += "=[]"
+    lines = [f"{indent}def {name}({', '.join(args)}):"]
+    body_indent = indent + "    "
+    for idx in range(rng.randint(1, 6)):
+        choice = rng.random()
+        if args and choice < 0.15:
+            statement = f"{args[0].split('=')[0]} = {idx}"
+        elif choice < 0.2:
+            statement = f"value{idx} = getattr(obj, 'name{idx}')"
+        elif choice < 0.6:
+            statement = f"value{idx} = [item * {idx} for item in range(10)]"
+        else:
+            statement = f"value{idx} = {{'key': {idx}, 'other': str({idx})}}"
+        lines.append(body_indent + statement)
+    lines.append(f"{body_indent}return None")
+    return lines
+
+
+def _flat(rng: random.Random, size: int) -> list[str]:
+    lines = ["import os", ""]
+    for idx in range(size):
+        lines.extend(_function(rng, f"function_{idx}"))
+        lines.append("")
+    return lines
+
+
+def _nested(rng: random.Random, size: int) -> list[str]:
+    # Blocks of functions nested a few dozen levels deep, so nesting depth
+    # stays within Python's recursion limit for any size
+    lines = []
+    for block in range(max(1, size // 25)):
+        for depth in range(25):
+            indent = "    " * depth
+            lines.append(f"{indent}def level_{block}_{depth}(arg{depth}):")
+            lines.append(f"{indent}    arg{depth} += {rng.randint(0, 9)}")
+        lines.append("    " * 25 + "return None")
+        lines.append("")
+    return lines
+
+
+def _lambdas(rng: random.Random, size: int) -> list[str]:
+    lines = []
+    for idx in range(size):
+        body = rng.choice(["x + 1", "x * y", "(x, y)", "eval(x)", "lambda z: z"])
+        lines.append(f"handler_{idx} = lambda x, y=0: {body}")
+    return lines
+
+
+def _huge(rng: random.Random, size: int) -> list[str]:
+    # A generated-code style module: mostly long flat statements, few rules fire
+    lines = ["TABLE = {"]
+    for idx in range(size * 10):
+        lines.append(f"    'key_{idx}': ({rng.randint(0, 1 << 30)}, 'value_{idx}'),")
+    lines.append("}")
+    lines.append("")
+    for idx in range(size):
+        lines.append(f"CONSTANT_{idx} = TABLE['key_{idx}'][0] * {rng.randint(1, 100)}")
+    return lines
+
+
+def _attrs(rng: random.Random, size: int) -> list[str]:
+    lines = ["import attr", ""]
+    keywords = ["auto_attribs=True", "frozen=True", "kw_only=True", "repr=False"]
+    for idx in range(size):
+        chosen = rng.sample(keywords, rng.randint(1, len(keywords)))
+        if rng.random() < 0.1:
+            chosen.append("slots=True")
+        lines.append(f"@attr.s({', '.join(chosen)})")
+        lines.append(f"class Record{idx}:")
+        for field_idx in range(rng.randint(1, 5)):
+            lines.append(f"    field_{field_idx}: int = {field_idx}")
+        lines.append("")
+    return lines
+
+
+GENERATORS = {
+    "flat": _flat,
+    "nested": _nested,
+    "lambdas": _lambdas,
+    "huge": _huge,
+    "attrs": _attrs,
+}
+
+
+def generate_module(shape: str, size: int, seed: int = DEFAULT_SEED) -> str:
+    rng = random.Random(f"{shape}:{size}:{seed}")
+    return "\n".join(GENERATORS[shape](rng, size)) + "\n"
+
+
+def write_corpus(
+    output_dir: str,
+    shapes: tuple[str, ...] = SHAPES,
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    seed: int = DEFAULT_SEED,
+) -> list[str]:
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for shape in shapes:
+        for size in sizes:
+            path = os.path.join(output_dir, f"{shape}_{size}.py")
+            with open(path, "w") as file:
+                file.write(generate_module(shape, size, seed))
+            paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output_dir", type=str)
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    paths = write_corpus(
+        args.output_dir, tuple(args.shapes), tuple(args.sizes), args.seed
+    )
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Time each phase of linting a synthetic corpus and write the results as JSON.
+
+Phases are timed separately: parsing, loading the parsed tree from a
+TreeCache, metadata (positions) resolution, the function index, every rule on
+its own, all rules fused in one traversal, and the ast backend. Each timing is
+the minimum over --repeat runs.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+from typing import Callable, Optional
+
+import libcst as cst
+from benchmarks.corpus import DEFAULT_SEED
+from benchmarks.corpus import DEFAULT_SIZES
+from benchmarks.corpus import SHAPES
+from benchmarks.corpus import generate_module
+from cstlint.backends import AstBackend
+from cstlint.engine import DEFAULT_RULES
+from cstlint.engine import lint_module
+from cstlint.function_index import FunctionIndexProvider
+from cstlint.tree_cache import CachedTree
+from cstlint.tree_cache import TreeCache
+from cstlint.visitors import LintMetadataWrapper
+from libcst.metadata import PositionProvider
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def best_time(func: Callable[..., object], repeat: int, *args: object) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _resolve(tree: cst.Module, provider: type) -> None:
+    LintMetadataWrapper(tree, unsafe_skip_copy=True).resolve(provider)
+
+
+def _visit(wrapper: cst.MetadataWrapper, rule: type) -> None:
+    wrapper.visit(rule())
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def benchmark_source(source_code: str, repeat: int) -> dict[str, float]:
+    tree = cst.parse_module(source_code)
+    timings = {
+        "parse": best_time(cst.parse_module, repeat, source_code),
+        "metadata": best_time(_resolve, repeat, tree, PositionProvider),
+        "index": best_time(_resolve, repeat, tree, FunctionIndexProvider),
+    }
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tree_cache = TreeCache(cache_dir)
+        key = tree_cache.key(source_code.encode())
+        tree_cache.set(key, CachedTree(tree))
+        timings["tree_cache:load"] = best_time(tree_cache.get, repeat, key)
+
+    # Metadata is resolved up front so it is not billed to whichever rule
+    # happens to need it first
+    wrapper = LintMetadataWrapper(tree, unsafe_skip_copy=True)
+    wrapper.resolve_many([PositionProvider, FunctionIndexProvider])
+    for rule in DEFAULT_RULES:
+        timings[f"rule:{rule.__name__}"] = best_time(_visit, repeat, wrapper, rule)
+    timings["rules:fused"] = best_time(lint_module, repeat, wrapper)
+    timings["backend:ast"] = best_time(
+        AstBackend().lint, repeat, source_code, DEFAULT_RULES
+    )
+    return timings
+
+
+def run(
+    shapes: tuple[str, ...], sizes: tuple[int, ...], seed: int, repeat: int
+) -> dict:
+    results = {}
+    for shape in shapes:
+        for size in sizes:
+            source_code = generate_module(shape, size, seed)
+            case = f"{shape}_{size}"
+            results[case] = benchmark_source(source_code, repeat)
+            results[case]["lines"] = source_code.count("\n")
+            print(f"{case}: {json.dumps(results[case])}", file=sys.stderr)
+
+    return {
+        "format": RESULTS_FORMAT_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "libcst": metadata.version("libcst"),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--output", "-o", type=str, default=None, help="Defaults to stdout"
+    )
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = run(tuple(args.shapes), tuple(args.sizes), args.seed, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
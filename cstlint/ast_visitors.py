@@ -0,0 +1,299 @@
+import ast
+from collections import Counter
+from operator import attrgetter
+from typing import Optional
+
+from cstlint.function_index import AstFunctionIndex
+from cstlint.function_index import AstFunctionNode
+from cstlint.function_index import FunctionInfo
+from cstlint.function_index import build_ast_function_index
+from cstlint.imports import ImportAliases
+from cstlint.imports import absolute_bindings
+from cstlint.imports import ast_bindings
+from cstlint.imports import ast_dotted_name
+from cstlint.patterns import NO_IMPORTS
+from cstlint.style_violation import StyleViolation
+from cstlint.violation_error_codes import ViolationErrorCode
+from cstlint.visitors import ARG_ASSIGN_MESSAGE
+from cstlint.visitors import ARG_AUG_ASSIGN_MESSAGE
+from cstlint.visitors import AUTO_ATTRIBS_NOT_TRUE_MESSAGE
+from cstlint.visitors import KEYWORD_NOT_ALLOWED_MESSAGE
+from cstlint.visitors import KW_ONLY_NOT_TRUE_MESSAGE
+from cstlint.visitors import MISSING_AUTO_ATTRIBS_MESSAGE
+from cstlint.visitors import NESTED_FUNCTION_MESSAGE
+from cstlint.visitors import REPR_NOT_FALSE_MESSAGE
+from cstlint.visitors import AttrDecoratorVisitor
+from cstlint.visitors import DangerousFunctionVisitor
+from cstlint.visitors import FunctionArgAssignVisitor
+from cstlint.visitors import LambdaVisitor
+from cstlint.visitors import MutableDefaultArgVisitor
+from cstlint.visitors import NestedFunctionVisitor
+
+
+def extract_values_from_ast_target(target: ast.expr) -> list[str]:
+    # Mirrors extract_values_from_assign_target
+    if isinstance(target, ast.Name):
+        return [target.id]
+    elif isinstance(target, (ast.Subscript, ast.Attribute)):
+        if isinstance(target.value, ast.Name):
+            return [target.value.id]
+    elif isinstance(target, ast.Tuple):
+        names = []
+        for elem in target.elts:
+            if isinstance(elem, ast.Starred):
+                elem = elem.value
+            if isinstance(elem, ast.Name):
+                names.append(elem.id)
+        return names
+
+    return []
+
+
+class AstStyleViolationsVisitor(ast.NodeVisitor):
+    """
+    Base class for rules implemented on the stdlib ast module.
+
+    Positions are reported like libcst's PositionProvider does: 1-indexed
+    lines and 0-indexed columns counted in characters, where ast counts
+    columns in UTF-8 bytes.
+    """
+
+    # Whether the rule reads self.function_index. The index is then built once
+    # per tree and shared by all the rules that use it.
+    USES_FUNCTION_INDEX = False
+    # Whether the rule reads self.imports, see StyleViolationsVisitor.IMPORTS
+    USES_IMPORTS = False
+
+    def __init__(
+        self, source_code: str, function_index: Optional[AstFunctionIndex] = None
+    ):
+        super().__init__()
+        self.source_code = source_code
+        self.function_index = function_index
+        self.violations = []
+        # When set, violations are only counted here by error code, see
+        # StyleViolationsVisitor
+        self.counts: Optional[Counter] = None
+        self.imports: ImportAliases = NO_IMPORTS
+        self._lines: Optional[list[str]] = None
+
+    def _line(self, line: int) -> str:
+        if self._lines is None:
+            self._lines = self.source_code.split("\n")
+        return self._lines[line - 1]
+
+    def _char_column(self, line: int, byte_column: int) -> int:
+        text = self._line(line)
+        if text.isascii():
+            return byte_column
+        return len(text.encode("utf-8")[:byte_column].decode("utf-8"))
+
+    def get_source_text(self, node: ast.AST) -> str:
+        # Like ast.get_source_segment, which re-splits the whole source on
+        # every call
+        lines = [
+            self._line(line).encode("utf-8")
+            for line in range(node.lineno, node.end_lineno + 1)
+        ]
+        lines[-1] = lines[-1][: node.end_col_offset]
+        lines[0] = lines[0][node.col_offset :]
+        return b"\n".join(lines).decode("utf-8")
+
+    def add_violation(
+        self,
+        error_code: ViolationErrorCode,
+        node: ast.AST,
+        message_template: str = "",
+        *message_args: str,
+    ) -> None:
+        if self.counts is not None:
+            self.counts[error_code.error_code] += 1
+            return
+        self.violations.append(
+            StyleViolation(
+                error_code,
+                node.lineno,
+                self._char_column(node.lineno, node.col_offset),
+                node.end_lineno,
+                self._char_column(node.end_lineno, node.end_col_offset),
+                message_template,
+                message_args,
+            )
+        )
+
+    def sorted_violations(self) -> list[StyleViolation]:
+        # ast visits some fields (e.g. decorators) after the body, libcst visits
+        # in source order. A stable sort by position restores libcst's order.
+        return sorted(self.violations, key=attrgetter("line_number", "column_number"))
+
+    @classmethod
+    def parse_and_evaluate_violations(cls, source_code: str) -> list[StyleViolation]:
+        tree = ast.parse(source_code)
+        function_index = None
+        if cls.USES_FUNCTION_INDEX:
+            function_index = build_ast_function_index(tree)
+        visitor = cls(source_code, function_index)
+        if cls.USES_IMPORTS:
+            visitor.imports = ImportAliases(absolute_bindings(ast_bindings(tree.body)))
+        visitor.visit(tree)
+        return visitor.sorted_violations()
+
+
+class DangerousFunctionAstVisitor(AstStyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = DangerousFunctionVisitor.VIOLATION_ERROR_CODE
+    USES_IMPORTS = True
+    QUALIFIED_NAMES = frozenset(DangerousFunctionVisitor.IMPORTS)
+
+    def visit_Call(self, node: ast.Call):
+        name = ast_dotted_name(node.func)
+        if (
+            name is not None
+            and self.imports.qualified_name(name) in self.QUALIFIED_NAMES
+        ):
+            self.add_violation(self.VIOLATION_ERROR_CODE, node)
+        self.generic_visit(node)
+
+
+class NestedFunctionAstVisitor(AstStyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = NestedFunctionVisitor.VIOLATION_ERROR_CODE
+    USES_FUNCTION_INDEX = True
+
+    def visit_FunctionDef(self, node: AstFunctionNode):
+        function = self.function_index[node]
+        if function.parent is not None:
+            self.add_violation(
+                self.VIOLATION_ERROR_CODE,
+                node,
+                NESTED_FUNCTION_MESSAGE,
+                function.name,
+                function.parent.name,
+            )
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+class FunctionArgAssignAstVisitor(AstStyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = FunctionArgAssignVisitor.VIOLATION_ERROR_CODE
+    USES_FUNCTION_INDEX = True
+
+    def _current_function(self, node: ast.stmt) -> Optional[FunctionInfo]:
+        function = self.function_index.get(node)
+        if function is None or function.name in ("__init__", "__new__"):
+            return None
+        return function
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        current_function = self._current_function(node)
+        if current_function is not None:
+            for assign_target in extract_values_from_ast_target(node.target):
+                if assign_target in current_function.params:
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE,
+                        node,
+                        ARG_AUG_ASSIGN_MESSAGE,
+                        assign_target,
+                    )
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign):
+        current_function = self._current_function(node)
+        if current_function is not None:
+            for target in node.targets:
+                for assign_target in extract_values_from_ast_target(target):
+                    if assign_target in current_function.params:
+                        self.add_violation(
+                            self.VIOLATION_ERROR_CODE,
+                            node,
+                            ARG_ASSIGN_MESSAGE,
+                            assign_target,
+                        )
+        self.generic_visit(node)
+
+
+class LambdaAstVisitor(AstStyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = LambdaVisitor.VIOLATION_ERROR_CODE
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self.add_violation(self.VIOLATION_ERROR_CODE, node)
+        self.generic_visit(node)
+
+
+class MutableDefaultArgAstVisitor(AstStyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = MutableDefaultArgVisitor.VIOLATION_ERROR_CODE
+
+    def visit_FunctionDef(self, node: AstFunctionNode):
+        # Defaults line up with the tail of the positional parameters, but
+        # only the non positional-only ones count, like libcst's params.params
+        args = node.args
+        num_positional = len(args.posonlyargs) + len(args.args)
+        first_default = num_positional - len(args.defaults)
+        for idx, default in enumerate(args.defaults, start=first_default):
+            if idx < len(args.posonlyargs):
+                continue
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                self.add_violation(self.VIOLATION_ERROR_CODE, node)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+class AttrDecoratorAstVisitor(AstStyleViolationsVisitor):
+    """See AttrDecoratorVisitor for the rules being checked."""
+
+    VIOLATION_ERROR_CODE = AttrDecoratorVisitor.VIOLATION_ERROR_CODE
+    USES_IMPORTS = True
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for decorator in node.decorator_list:
+            # A bare @attr.s is a call without arguments
+            keywords = []
+            if isinstance(decorator, ast.Call):
+                keywords = [kw for kw in decorator.keywords if kw.arg is not None]
+                decorator = decorator.func
+            name = ast_dotted_name(decorator)
+            if name is None or self.imports.qualified_name(name) != "attr.s":
+                continue
+
+            if "auto_attribs" not in {kw.arg for kw in keywords}:
+                self.add_violation(
+                    self.VIOLATION_ERROR_CODE, node, MISSING_AUTO_ATTRIBS_MESSAGE
+                )
+
+            for kw in keywords:
+                value = self.get_source_text(kw.value)
+                if kw.arg not in ["auto_attribs", "frozen", "kw_only", "repr"]:
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE,
+                        node,
+                        KEYWORD_NOT_ALLOWED_MESSAGE,
+                        kw.arg,
+                    )
+
+                if kw.arg == "auto_attribs" and value != "True":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, AUTO_ATTRIBS_NOT_TRUE_MESSAGE
+                    )
+
+                if kw.arg == "kw_only" and value != "True":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, KW_ONLY_NOT_TRUE_MESSAGE
+                    )
+
+                if kw.arg == "repr" and value != "False":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, REPR_NOT_FALSE_MESSAGE
+                    )
+
+        self.generic_visit(node)
+
+
+# libcst rule -> the same rule implemented on ast
+AST_RULES = {
+    DangerousFunctionVisitor: DangerousFunctionAstVisitor,
+    NestedFunctionVisitor: NestedFunctionAstVisitor,
+    LambdaVisitor: LambdaAstVisitor,
+    FunctionArgAssignVisitor: FunctionArgAssignAstVisitor,
+    AttrDecoratorVisitor: AttrDecoratorAstVisitor,
+    MutableDefaultArgVisitor: MutableDefaultArgAstVisitor,
+}
@@ -0,0 +1,124 @@
+import ast
+from collections import Counter
+from functools import partial
+from typing import Optional, Sequence
+
+from cstlint.imports import ModuleImports
+from cstlint.imports import ast_bindings
+from cstlint.patterns import NO_IMPORTS
+from cstlint.profiling import FileProfile
+from cstlint.profiling import profile_phase
+from cstlint.style_violation import StyleViolation
+from cstlint.tree_cache import TreeCache
+
+# The rules, and with them libcst, are imported by lint() rather than here, so
+# that runs which never parse anything (--help, cache hits, files no rule could
+# match) don't pay for importing them.
+
+
+class CstBackend:
+    """Parses with libcst and runs the rules in cstlint.visitors."""
+
+    name = "cst"
+
+    def preload(self) -> None:
+        """Import what lint() needs up front, e.g. before forking workers."""
+        import cstlint.engine  # noqa: F401
+
+    def lint(
+        self,
+        code: str,
+        rules: Sequence[type],
+        profile: Optional[FileProfile] = None,
+        tree_cache: Optional[TreeCache] = None,
+        counts: Optional[Counter] = None,
+        imports: Optional[ModuleImports] = None,
+    ) -> list[StyleViolation]:
+        """
+        Raises SyntaxError, like the ast backend, if `code` can't be parsed. If
+        `counts` is given, violations are only counted into it by error code.
+        `imports` are what's known about the module's imports beforehand.
+        """
+        import libcst as cst
+        from cstlint.engine import lint_source
+
+        try:
+            return lint_source(code, rules, profile, tree_cache, counts, imports)
+        except cst.ParserSyntaxError as e:
+            raise SyntaxError(
+                e.message, (None, e.raw_line, e.raw_column + 1, None)
+            ) from e
+
+
+class AstBackend:
+    """
+    Parses with the stdlib ast module and runs the equivalent rules in
+    cstlint.ast_visitors. Much faster to parse, but only usable for rules
+    that don't need whitespace or comments.
+    """
+
+    name = "ast"
+
+    def preload(self) -> None:
+        import cstlint.ast_visitors  # noqa: F401
+        import cstlint.engine  # noqa: F401
+
+    def lint(
+        self,
+        code: str,
+        rules: Sequence[type],
+        profile: Optional[FileProfile] = None,
+        tree_cache: Optional[TreeCache] = None,
+        counts: Optional[Counter] = None,
+        imports: Optional[ModuleImports] = None,
+    ) -> list[StyleViolation]:
+        # tree_cache is ignored: ast parses faster than trees could be loaded
+        from cstlint.ast_visitors import AST_RULES
+        from cstlint.engine import rules_for_source
+        from cstlint.function_index import build_ast_function_index
+
+        unsupported = [rule.__name__ for rule in rules if rule not in AST_RULES]
+        if unsupported:
+            raise ValueError(
+                f"Rules not supported by the ast backend: {', '.join(unsupported)}"
+            )
+
+        with profile_phase(profile, "prefilter"):
+            rules = rules_for_source(code, rules, imports and imports.triggers)
+        if not rules:
+            return []
+
+        with profile_phase(profile, "parse"):
+            tree = ast.parse(code)
+        num_nodes = 0
+        if profile is not None:
+            num_nodes = sum(1 for _ in ast.walk(tree))
+            profile.nodes += num_nodes
+        function_index = None
+        if any(AST_RULES[rule].USES_FUNCTION_INDEX for rule in rules):
+            with profile_phase(profile, "index"):
+                function_index = build_ast_function_index(tree)
+        aliases = NO_IMPORTS
+        if any(rule.IMPORTS for rule in rules):
+            with profile_phase(profile, "imports"):
+                aliases = (imports or ModuleImports()).aliases(
+                    partial(ast_bindings, tree.body)
+                )
+
+        violations = []
+        for rule in rules:
+            visitor = AST_RULES[rule](code, function_index)
+            visitor.counts = counts
+            visitor.imports = aliases
+            if profile is None:
+                visitor.visit(tree)
+            else:
+                # Each rule walks the whole tree on its own
+                with profile.rule(rule.__name__, calls=num_nodes):
+                    visitor.visit(tree)
+            violations.extend(visitor.sorted_violations())
+        return violations
+
+
+BACKENDS = {backend.name: backend for backend in (CstBackend(), AstBackend())}
+DEFAULT_BACKEND = CstBackend.name
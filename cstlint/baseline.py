@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from typing import Optional, Sequence
+
+from cstlint.runner import FileResult
+from cstlint.runner import decode_source
+from cstlint.style_violation import StyleViolation
+from cstlint.suppression import scan_source
+
+# Bump when fingerprints or the layout of baseline files change
+BASELINE_FORMAT_VERSION = 1
+
+
+def normalize_line(line: str) -> str:
+    # Indentation and spacing changes don't count as changes to the line
+    return " ".join(line.split())
+
+
+def fingerprint(error_code: str, line: str, scope: str) -> str:
+    """
+    Identifies a violation independently of where in its file it is: by its
+    error code, the violating line and the function or class it's in.
+    """
+    key = f"{error_code}\0{scope}\0{normalize_line(line)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def violation_fingerprints(
+    source_code: str, violations: Sequence[StyleViolation]
+) -> list[str]:
+    code_lines = source_code.split("\n")
+    scan = scan_source(source_code)
+    fingerprints = []
+    for violation in violations:
+        line_number = violation.line_number
+        line = code_lines[line_number - 1] if line_number <= len(code_lines) else ""
+        fingerprints.append(
+            fingerprint(violation.error_code.error_code, line, scan.scope(line_number))
+        )
+    return fingerprints
+
+
+def read_source(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as file:
+            return decode_source(file.read())
+    except (OSError, UnicodeError):
+        return None
+
+
+class Baseline:
+    """
+    Known violations to leave unreported, so that new rules can be enabled
+    without fixing existing code first.
+
+    Violations are stored per file as counts of fingerprints, see fingerprint(),
+    so entries still match after lines are added or removed above them. Each
+    entry covers as many violations as were recorded with its fingerprint, and
+    further ones are reported. Matching a violation is a couple of dict
+    lookups, and files without entries aren't looked at at all. Problems with
+    files themselves, like syntax errors, are never part of a baseline.
+    """
+
+    def __init__(self, entries: Optional[dict[str, dict[str, int]]] = None):
+        # Normalized path to fingerprints and their counts
+        self.entries: dict[str, dict[str, int]] = entries or {}
+
+    def __len__(self) -> int:
+        return sum(sum(counts.values()) for counts in self.entries.values())
+
+    @classmethod
+    def load(cls, path: str) -> "Baseline":
+        """Raises OSError or ValueError if `path` isn't a readable baseline."""
+        with open(path, "r") as file:
+            data = json.load(file)
+        version = data.get("version") if isinstance(data, dict) else None
+        if version != BASELINE_FORMAT_VERSION:
+            raise ValueError(
+                f"{path} isn't a version {BASELINE_FORMAT_VERSION} cstlint baseline"
+            )
+        return cls(data["files"])
+
+    def save(self, path: str) -> None:
+        data = {"version": BASELINE_FORMAT_VERSION, "files": self.entries}
+        with open(path, "w") as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+            file.write("\n")
+
+    def add(self, result: FileResult, source_code: Optional[str] = None) -> None:
+        """
+        Records the violations of `result`, reading its file if need be, and
+        removes them from `result` like filter() would.
+        """
+        violations = [v for v in result.violations if not v.error_code.is_file_error]
+        if not violations:
+            return
+        if source_code is None:
+            source_code = read_source(result.path)
+        if source_code is None:
+            return
+        counts = self.entries.setdefault(os.path.normpath(result.path), {})
+        for key in violation_fingerprints(source_code, violations):
+            counts[key] = counts.get(key, 0) + 1
+        result.violations = [
+            violation
+            for violation in result.violations
+            if violation.error_code.is_file_error
+        ]
+
+    def filter(self, result: FileResult, source_code: Optional[str] = None) -> None:
+        """
+        Removes the violations in the baseline from `result`, reading its file
+        if need be.
+        """
+        known = self.entries.get(os.path.normpath(result.path))
+        if not known or not result.violations:
+            return
+        if source_code is None:
+            source_code = read_source(result.path)
+        if source_code is None:
+            return
+        remaining = dict(known)
+        violations = []
+        for violation, key in zip(
+            result.violations, violation_fingerprints(source_code, result.violations)
+        ):
+            if remaining.get(key) and not violation.error_code.is_file_error:
+                remaining[key] -= 1
+            else:
+                violations.append(violation)
+        result.violations = violations
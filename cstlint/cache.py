@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import tempfile
+from importlib import metadata
+from typing import Optional, Sequence
+
+from cstlint.registry import RULES
+from cstlint.style_violation import StyleViolation
+
+# Bump when the on-disk entry format, or what the violations in entries are
+# filtered by, changes
+CACHE_FORMAT_VERSION = 2
+DEFAULT_MAX_CACHE_SIZE = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "cstlint")
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _source_digest() -> str:
+    # Covers rule changes in development checkouts, where the installed
+    # version number does not change between edits.
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for file_name in sorted(os.listdir(package_dir)):
+        if file_name.endswith(".py"):
+            with open(os.path.join(package_dir, file_name), "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def rules_fingerprint(rules: Sequence[str], backend: str = "cst") -> str:
+    parts = [
+        f"format={CACHE_FORMAT_VERSION}",
+        f"backend={backend}",
+        f"cstlint={_package_version('cstlint')}",
+        f"libcst={_package_version('libcst')}",
+        f"source={_source_digest()}",
+    ]
+    parts.extend(f"{code}={RULES[code].path}" for code in rules)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    On-disk cache of entries keyed by file content.
+
+    Keys are the hash of the content combined with a fingerprint of whatever
+    else the entries depend on, so any change to either is a cache miss.
+    Entries are written atomically, so concurrent workers never see partial
+    files. Reads bump an entry's mtime, which prune() uses to evict the least
+    recently used entries once the cache outgrows max_size.
+    """
+
+    SUFFIX = ""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        fingerprint: str,
+        max_size: int = DEFAULT_MAX_CACHE_SIZE,
+    ):
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+
+    def key(self, source: bytes, context: str = "") -> str:
+        """
+        The key of `source`'s entry. `context` is anything else that entries
+        for some sources depend on, e.g. the other modules a module imports.
+        """
+        digest = hashlib.sha256(self.fingerprint.encode())
+        if context:
+            digest.update(context.encode())
+            digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key[2:] + self.SUFFIX)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        except OSError:
+            # A cache that can't be written to is just a slower run
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def prune(self) -> None:
+        entries = []
+        total_size = 0
+        try:
+            buckets = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+
+        for bucket in buckets:
+            # Buckets are named after the first two characters of the keys.
+            # Other caches may live in subdirectories with longer names.
+            if len(bucket.name) != 2 or not bucket.is_dir():
+                continue
+            # Concurrent runs may remove buckets and entries meanwhile
+            try:
+                bucket_entries = list(os.scandir(bucket.path))
+            except FileNotFoundError:
+                continue
+            for entry in bucket_entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+
+class ResultCache(DiskCache):
+    """Violations per file, for a given rule set. See rules_fingerprint()."""
+
+    SUFFIX = ".json"
+
+    def get(self, key: str) -> Optional[list[StyleViolation]]:
+        data = self._read(key)
+        if data is None:
+            return None
+        # Entries that are truncated, or were written by something else, are
+        # misses
+        try:
+            entry = json.loads(data)
+            return [StyleViolation.from_dict(data) for data in entry["violations"]]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def set(self, key: str, violations: Sequence[StyleViolation]) -> None:
+        entry = {"violations": [violation.to_dict() for violation in violations]}
+        self._write(key, json.dumps(entry, separators=(",", ":")).encode())
@@ -0,0 +1,169 @@
+import io
+import tokenize
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Sequence
+
+# Top-level statements starting with these continue the statement before them
+CONTINUATION_KEYWORDS = frozenset(["else", "elif", "except", "finally"])
+# Token types that don't start a logical line
+_NON_CODE_TOKENS = frozenset(
+    [
+        tokenize.COMMENT,
+        tokenize.NL,
+        tokenize.ENCODING,
+        tokenize.ENDMARKER,
+    ]
+)
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """
+    One or more consecutive top-level statements of a module, which can be
+    parsed and linted on their own.
+    """
+
+    # Line number of the chunk's first line in the module
+    start_line: int
+    # Its lines, each ending with a newline except maybe the module's last
+    text: str
+
+
+def split_lines(source_code: str) -> list[str]:
+    """
+    The lines of `source_code`, with their newlines. Unlike str.splitlines,
+    only splits on newlines, like Python does.
+    """
+    lines = source_code.split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def statement_starts(source_code: str) -> tuple[list[int], bool]:
+    """
+    The first lines of the top-level statements of `source_code`, and whether
+    all of it could be tokenized. Statements are only found up to the first
+    tokenize error. Decorators belong to the statement they decorate, and
+    else, elif, except and finally clauses to their compound statement.
+    """
+    starts = []
+    depth = 0
+    line_start = True
+    decorated = False
+    tokens = tokenize.generate_tokens(io.StringIO(source_code).readline)
+    try:
+        for token in tokens:
+            token_type = token.type
+            if token_type == tokenize.INDENT:
+                depth += 1
+            elif token_type == tokenize.DEDENT:
+                depth -= 1
+            elif token_type == tokenize.NEWLINE:
+                line_start = True
+            elif token_type not in _NON_CODE_TOKENS and line_start:
+                line_start = False
+                if depth == 0:
+                    if not decorated and token.string not in CONTINUATION_KEYWORDS:
+                        starts.append(token.start[0])
+                    decorated = token.string == "@"
+    except (tokenize.TokenError, SyntaxError):
+        return starts, False
+    return starts, True
+
+
+def _chunks(lines: Sequence[str], starts: Sequence[int], first_line: int) -> list:
+    # Chunks of `lines`, which are the module's from `first_line` on, split
+    # before the lines in `starts`, which are relative to `lines`. Lines
+    # before the first statement go with it.
+    bounds = [1] + [start for start in starts if start > 1] + [len(lines) + 1]
+    return [
+        Chunk(first_line + start - 1, "".join(lines[start - 1 : end - 1]))
+        for start, end in zip(bounds, bounds[1:])
+        if end > start
+    ]
+
+
+def split_module(source_code: str) -> list[Chunk]:
+    """
+    Splits `source_code` into one chunk per top-level statement. Everything
+    from the first statement that can't be tokenized on, e.g. because of an
+    unclosed bracket, is one chunk.
+    """
+    starts, _ = statement_starts(source_code)
+    return _chunks(split_lines(source_code), starts, 1)
+
+
+def merge_chunks(chunks: Sequence[Chunk], min_lines: int) -> list[Chunk]:
+    """
+    Merges runs of consecutive `chunks` into chunks of at least `min_lines`
+    lines each, except maybe the last one.
+    """
+    merged = []
+    start = 0
+    for end in range(1, len(chunks) + 1):
+        if (
+            end == len(chunks)
+            or chunks[end].start_line - chunks[start].start_line >= min_lines
+        ):
+            text = "".join(chunk.text for chunk in chunks[start:end])
+            merged.append(Chunk(chunks[start].start_line, text))
+            start = end
+    return merged
+
+
+def update_chunks(
+    chunks: Sequence[Chunk], old_lines: Sequence[str], new_lines: Sequence[str]
+) -> list[Chunk]:
+    """
+    The chunks of the module `new_lines`, given the `chunks` of the module
+    `old_lines` it was edited from. Only the statements around the edited
+    lines are tokenized again. Chunks before them are kept as they are, and
+    chunks after them are moved by the number of lines added or removed.
+    """
+    if not chunks:
+        return split_module("".join(new_lines))
+    prefix = 0
+    for old_line, new_line in zip(old_lines, new_lines):
+        if old_line != new_line:
+            break
+        prefix += 1
+    if prefix == len(old_lines) == len(new_lines):
+        return list(chunks)
+    suffix = 0
+    max_suffix = min(len(old_lines), len(new_lines)) - prefix
+    while (
+        suffix < max_suffix and old_lines[-suffix - 1] == new_lines[-suffix - 1]
+    ):
+        suffix += 1
+
+    starts = [chunk.start_line for chunk in chunks]
+    # The chunk with the first edited line, and the one before it, which the
+    # edit may have continued, e.g. by adding an else clause
+    first = max(bisect_right(starts, prefix + 1) - 2, 0)
+    # The first chunk that's all unedited, and the one after it, as the edit
+    # may continue into it, e.g. by adding a decorator
+    last = bisect_left(starts, len(old_lines) - suffix + 1) + 1
+    shift = len(new_lines) - len(old_lines)
+    region_start = chunks[first].start_line
+    if last < len(chunks):
+        region_end = chunks[last].start_line - 1 + shift
+        region = new_lines[region_start - 1 : region_end]
+        region_starts, complete = statement_starts("".join(region))
+        if complete:
+            return (
+                list(chunks[:first])
+                + _chunks(region, region_starts, region_start)
+                + [
+                    Chunk(chunk.start_line + shift, chunk.text)
+                    for chunk in chunks[last:]
+                ]
+            )
+    # The edit left a statement open, e.g. an unclosed bracket, so it may run
+    # up to the end of the module
+    region = new_lines[region_start - 1 :]
+    region_starts, _ = statement_starts("".join(region))
+    return list(chunks[:first]) + _chunks(region, region_starts, region_start)
@@ -0,0 +1,198 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import tempfile
+from dataclasses import replace
+from typing import Iterator, Optional, Sequence
+
+from cstlint.backends import BACKENDS
+from cstlint.cache import ResultCache
+from cstlint.cache import rules_fingerprint
+from cstlint.registry import RULES
+from cstlint.runner import FileResult
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.runner import lint_file
+from cstlint.runner import lint_files
+from cstlint.tree_cache import TreeCache
+
+# Requests and responses are a single line of JSON each, one per connection.
+#   request:  {"path": str, "source": str | null, "with_lines": bool,
+#              "rules": [str], "backend": str, "cache_dir": str | null}
+#   response: {"result": FileResult.to_dict()} or {"error": str}
+# When "source" is set it is linted instead of reading "path" from disk.
+# Files are linted with the client's rules, backend and cache directory, or
+# without a cache if "cache_dir" is null. Every other lint option is the one
+# the daemon was started with.
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "cstlint.sock")
+    # A directory of its own, as the temporary directory is shared with other
+    # users, see serve()
+    return os.path.join(tempfile.gettempdir(), f"cstlint-{os.getuid()}", "cstlint.sock")
+
+
+def _is_owned(path: str) -> bool:
+    # Whether `path` belongs to the current user, rather than to someone else
+    # who created it first to receive the sources sent to the daemon
+    return os.stat(path).st_uid == os.getuid()
+
+
+class LintRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            options = self.server.options_for(request)
+            if request.get("source") is not None:
+                result = lint_data(
+                    request["path"], request["source"].encode("utf-8"), options
+                )
+            else:
+                result = lint_file(request["path"], options)
+            response = {"result": result.to_dict()}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class LintServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, options: LintOptions = LintOptions()):
+        self.options = options
+        # Caches by directory, rules and backend, so that they're only set up
+        # once for each kind of client
+        self.caches: dict[tuple, tuple[ResultCache, TreeCache]] = {}
+        if options.cache is not None and options.tree_cache is not None:
+            key = (options.cache.cache_dir, options.rules, options.backend)
+            self.caches[key] = (options.cache, options.tree_cache)
+        super().__init__(socket_path, LintRequestHandler)
+
+    def options_for(self, request: dict) -> LintOptions:
+        """The daemon's options, with those of the client that sent `request`."""
+        rules = tuple(request.get("rules", self.options.rules))
+        backend = request.get("backend", self.options.backend)
+        unknown = [code for code in rules if code not in RULES]
+        if unknown:
+            raise ValueError(f"Unknown rules {', '.join(unknown)}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}")
+        options = replace(
+            self.options,
+            rules=rules,
+            backend=backend,
+            with_lines=request.get("with_lines", False),
+            cache=None,
+            tree_cache=None,
+        )
+        cache_dir = request.get("cache_dir")
+        if cache_dir is not None:
+            key = (cache_dir, rules, backend)
+            caches = self.caches.get(key)
+            if caches is None:
+                caches = (
+                    ResultCache(cache_dir, rules_fingerprint(rules, backend)),
+                    TreeCache(cache_dir),
+                )
+                self.caches[key] = caches
+            options = replace(options, cache=caches[0], tree_cache=caches[1])
+        return options
+
+
+def _is_daemon_running(socket_path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def serve(socket_path: str, options: LintOptions = LintOptions()) -> None:
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+    if socket_dir and not _is_owned(socket_dir):
+        raise RuntimeError(f"{socket_dir} belongs to another user")
+    if os.path.exists(socket_path):
+        if not _is_owned(socket_path):
+            raise RuntimeError(f"{socket_path} belongs to another user")
+        if _is_daemon_running(socket_path):
+            raise RuntimeError(
+                f"A cstlint daemon is already listening on {socket_path}"
+            )
+        # Left behind by a daemon that didn't shut down cleanly
+        os.unlink(socket_path)
+
+    server = LintServer(socket_path, options)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def request_lint(
+    socket_path: str,
+    path: str,
+    source: Optional[str] = None,
+    options: LintOptions = LintOptions(),
+) -> Optional[FileResult]:
+    """
+    Ask the daemon listening on `socket_path` to lint one file with the
+    rules, backend, cache and `with_lines` of `options`.
+
+    Returns None if no daemon is reachable, or the socket belongs to another
+    user, so the caller can fall back to linting in-process.
+    """
+    request = {
+        "path": path if source is not None else os.path.abspath(path),
+        "source": source,
+        "with_lines": options.with_lines,
+        "rules": list(options.rules),
+        "backend": options.backend,
+        "cache_dir": options.cache.cache_dir if options.cache is not None else None,
+    }
+    try:
+        if not _is_owned(socket_path):
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as response_file:
+                response = json.loads(response_file.readline())
+    except (OSError, ValueError):
+        return None
+
+    if "error" in response:
+        raise RuntimeError(f"cstlint daemon failed on {path}: {response['error']}")
+    result = FileResult.from_dict(response["result"])
+    result.path = path
+    return result
+
+
+def lint_files_with_daemon(
+    socket_path: str,
+    paths: Sequence[str],
+    jobs: int = 1,
+    options: LintOptions = LintOptions(),
+) -> Iterator[FileResult]:
+    """
+    Forward each file to the daemon, falling back to linting the remaining
+    files in-process as soon as the daemon can't be reached.
+    """
+    for idx, path in enumerate(paths):
+        result = request_lint(socket_path, path, options=options)
+        if result is None:
+            yield from lint_files(paths[idx:], jobs, options)
+            return
+        yield result
@@ -0,0 +1,365 @@
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from typing import Iterator, Optional, Sequence
+
+import libcst as cst
+from cstlint.imports import ImportAliases
+from cstlint.imports import ModuleImports
+from cstlint.patterns import NO_IMPORTS
+from cstlint.patterns import PatternTable
+from cstlint.profiling import FileProfile
+from cstlint.profiling import profile_phase
+from cstlint.registry import DEFAULT_RULE_CODES
+from cstlint.registry import load_rules
+from cstlint.style_violation import StyleViolation
+from cstlint.tree_cache import CachedTree
+from cstlint.tree_cache import TreeCache
+from cstlint.visitors import LintMetadataWrapper
+from cstlint.visitors import StyleViolationsVisitor
+from cstlint.visitors import import_bindings
+from libcst.metadata import CodePosition
+from libcst.metadata import CodeRange
+from libcst.metadata import PositionProvider
+
+DEFAULT_RULES = load_rules(DEFAULT_RULE_CODES)
+
+
+class RuleDispatcher(cst.CSTVisitor):
+    """
+    Runs several StyleViolationsVisitors in a single traversal of the tree.
+
+    Each node is only handed to the rules that define a visit_*/leave_* handler
+    for its type. A rule whose visit_* returns False stops receiving callbacks
+    for that node's subtree, exactly as if it had been run on its own.
+
+    The PATTERNS of all rules are compiled into one PatternTable, so nodes of
+    types without patterns cost a single dict lookup, however many rules
+    there are. Patterns on qualified names are resolved through `imports`.
+    """
+
+    # (rule classes, handler name) -> [(rule index, unbound handler)]
+    _HANDLER_CACHE: dict[tuple[tuple[type, ...], str], list] = {}
+    # rule classes -> PatternTable of their patterns
+    _PATTERN_CACHE: dict[tuple[type, ...], PatternTable] = {}
+
+    def __init__(
+        self,
+        visitors: Sequence[StyleViolationsVisitor],
+        imports: ImportAliases = NO_IMPORTS,
+    ):
+        super().__init__()
+        self.visitors = list(visitors)
+        self.imports = imports
+        self._rule_types = tuple(type(visitor) for visitor in self.visitors)
+        # Node that made each rule stop descending, if any
+        self._skipped_at: list[Optional[cst.CSTNode]] = [None] * len(self.visitors)
+        self._num_skipped = 0
+        self._patterns = self._PATTERN_CACHE.get(self._rule_types)
+        if self._patterns is None:
+            self._patterns = PatternTable(
+                [rule_type.PATTERNS for rule_type in self._rule_types]
+            )
+            self._PATTERN_CACHE[self._rule_types] = self._patterns
+        self._matchers = self._patterns.matchers
+
+    def get_inherited_dependencies(self):
+        dependencies = set()
+        for visitor in self.visitors:
+            dependencies.update(visitor.get_inherited_dependencies())
+        return frozenset(dependencies)
+
+    @contextmanager
+    def resolve(self, wrapper: cst.MetadataWrapper) -> Iterator[None]:
+        with ExitStack() as stack:
+            for visitor in self.visitors:
+                stack.enter_context(visitor.resolve(wrapper))
+            yield
+
+    def _handlers(self, name: str) -> list:
+        key = (self._rule_types, name)
+        handlers = self._HANDLER_CACHE.get(key)
+        if handlers is None:
+            handlers = []
+            for idx, rule_type in enumerate(self._rule_types):
+                # Stop at CSTVisitor, which ships no-op stubs for every node type
+                for klass in rule_type.__mro__:
+                    if klass is cst.CSTVisitor:
+                        break
+                    handler = vars(klass).get(name)
+                    if handler is not None:
+                        handlers.append((idx, handler))
+                        break
+            self._HANDLER_CACHE[key] = handlers
+        return handlers
+
+    def _match_patterns(self, node: cst.CSTNode, matchers: list) -> None:
+        for idx, message in self._patterns.match(node, matchers, self.imports):
+            if self._num_skipped and self._skipped_at[idx] is not None:
+                continue
+            visitor = self.visitors[idx]
+            visitor.add_violation(visitor.VIOLATION_ERROR_CODE, node, message)
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        type_name = type(node).__name__
+        matchers = self._matchers.get(type_name)
+        if matchers is not None:
+            self._match_patterns(node, matchers)
+        for idx, handler in self._handlers(f"visit_{type_name}"):
+            if self._num_skipped and self._skipped_at[idx] is not None:
+                continue
+            if handler(self.visitors[idx], node) is False:
+                self._skipped_at[idx] = node
+                self._num_skipped += 1
+        return True
+
+    def on_leave(self, original_node: cst.CSTNode) -> None:
+        for idx, handler in self._handlers(f"leave_{type(original_node).__name__}"):
+            skipped_at = self._skipped_at[idx]
+            if skipped_at is None or skipped_at is original_node:
+                handler(self.visitors[idx], original_node)
+
+        if self._num_skipped:
+            for idx, skipped_at in enumerate(self._skipped_at):
+                if skipped_at is original_node:
+                    self._skipped_at[idx] = None
+                    self._num_skipped -= 1
+
+    def on_visit_attribute(self, node: cst.CSTNode, attribute: str) -> None:
+        name = f"visit_{type(node).__name__}_{attribute}"
+        for idx, handler in self._handlers(name):
+            if self._num_skipped and self._skipped_at[idx] is not None:
+                continue
+            handler(self.visitors[idx], node)
+
+    def on_leave_attribute(self, original_node: cst.CSTNode, attribute: str) -> None:
+        name = f"leave_{type(original_node).__name__}_{attribute}"
+        for idx, handler in self._handlers(name):
+            if self._num_skipped and self._skipped_at[idx] is not None:
+                continue
+            handler(self.visitors[idx], original_node)
+
+
+class ProfilingRuleDispatcher(RuleDispatcher):
+    """A RuleDispatcher that records the time each rule spends in its handlers."""
+
+    def __init__(
+        self,
+        visitors: Sequence[StyleViolationsVisitor],
+        profile: FileProfile,
+        imports: ImportAliases = NO_IMPORTS,
+    ):
+        super().__init__(visitors, imports)
+        self.profile = profile
+        self._timed_handlers: dict[str, list] = {}
+
+    def _handlers(self, name: str) -> list:
+        handlers = self._timed_handlers.get(name)
+        if handlers is None:
+            handlers = []
+            for idx, handler in super()._handlers(name):
+                rule_name = self._rule_types[idx].__name__
+                handlers.append((idx, partial(self._call_timed, rule_name, handler)))
+            self._timed_handlers[name] = handlers
+        return handlers
+
+    @contextmanager
+    def resolve(self, wrapper: cst.MetadataWrapper) -> Iterator[None]:
+        # Resolve the declared dependencies, such as the function index, up
+        # front so they're recorded on their own rather than as a rule's time
+        dependencies = self.get_inherited_dependencies()
+        if dependencies:
+            with self.profile.phase("index"):
+                wrapper.resolve_many(dependencies)
+        with super().resolve(wrapper):
+            yield
+
+    def _match_patterns(self, node: cst.CSTNode, matchers: list) -> None:
+        # Each rule's patterns are matched on their own rather than through the
+        # shared table, so that their time is recorded as the rule's
+        type_name = type(node).__name__
+        for idx, visitor in enumerate(self.visitors):
+            if not visitor.PATTERNS or self._skipped_at[idx] is not None:
+                continue
+            table = visitor.pattern_table()
+            rule_matchers = table.matchers.get(type_name)
+            if rule_matchers is None:
+                continue
+            with self.profile.rule(self._rule_types[idx].__name__):
+                for _, message in table.match(node, rule_matchers, self.imports):
+                    visitor.add_violation(visitor.VIOLATION_ERROR_CODE, node, message)
+
+    def _call_timed(self, rule_name, handler, visitor, node):
+        with self.profile.rule(rule_name):
+            return handler(visitor, node)
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        self.profile.nodes += 1
+        return super().on_visit(node)
+
+
+class ProfilingMetadataWrapper(LintMetadataWrapper):
+    """Records metadata resolution, which rules trigger lazily, as its own phase."""
+
+    def __init__(self, module: cst.Module, profile: FileProfile):
+        super().__init__(module, unsafe_skip_copy=True)
+        self.profile = profile
+
+    def resolve(self, provider):
+        with self.profile.phase("metadata"):
+            return super().resolve(provider)
+
+
+class CachedPositions(Mapping):
+    """
+    PositionProvider's metadata as stored in a CachedTree. CodeRanges are only
+    built for the nodes that are looked up, which for most files is none.
+    """
+
+    def __init__(self, nodes: Sequence[cst.CSTNode], positions: array):
+        self._nodes = nodes
+        self._positions = positions
+        self._index: Optional[dict[cst.CSTNode, int]] = None
+
+    def __getitem__(self, node: cst.CSTNode) -> CodeRange:
+        if self._index is None:
+            self._index = {node: idx for idx, node in enumerate(self._nodes)}
+        start = 4 * self._index[node]
+        line, column, end_line, end_column = self._positions[start : start + 4]
+        return CodeRange(
+            CodePosition(line, column), CodePosition(end_line, end_column)
+        )
+
+    def __iter__(self) -> Iterator[cst.CSTNode]:
+        return iter(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+def _cached_tree(wrapper: LintMetadataWrapper) -> CachedTree:
+    tree = CachedTree(wrapper.module)
+    code_ranges = wrapper.resolved(PositionProvider)
+    if code_ranges is not None:
+        tree.position_nodes = tuple(code_ranges)
+        for code_range in code_ranges.values():
+            tree.positions.extend(
+                (
+                    code_range.start.line,
+                    code_range.start.column,
+                    code_range.end.line,
+                    code_range.end.column,
+                )
+            )
+    return tree
+
+
+def lint_module(
+    wrapper: cst.MetadataWrapper,
+    rules: Sequence[type] = DEFAULT_RULES,
+    profile: Optional[FileProfile] = None,
+    counts: Optional[Counter] = None,
+    imports: ImportAliases = NO_IMPORTS,
+) -> list[StyleViolation]:
+    """
+    The violations of `rules` in the wrapped module. If `counts` is given, the
+    violations are counted into it by error code instead, and none returned.
+    `imports` resolves the names the module uses for rules with IMPORTS.
+    """
+    visitors = [rule() for rule in rules]
+    for visitor in visitors:
+        visitor.counts = counts
+        visitor.imports = imports
+    if profile is None:
+        wrapper.visit(RuleDispatcher(visitors, imports))
+    else:
+        wrapper.visit(ProfilingRuleDispatcher(visitors, profile, imports))
+    return [violation for visitor in visitors for violation in visitor.violations]
+
+
+def rules_for_source(
+    code: str,
+    rules: Sequence[type],
+    triggers: Optional[Mapping[str, Sequence[str]]] = None,
+) -> list[type]:
+    """
+    The rules whose triggers appear in `code`, in their original order.
+    `triggers` are more triggers by error code, see registry.rules_for_source.
+    """
+    if not triggers:
+        return [rule for rule in rules if rule.may_match(code)]
+    return [
+        rule
+        for rule in rules
+        if rule.may_match(code)
+        or any(
+            trigger in code
+            for trigger in triggers.get(rule.VIOLATION_ERROR_CODE.error_code, ())
+        )
+    ]
+
+
+def module_aliases(
+    tree: cst.Module, imports: Optional[ModuleImports] = None
+) -> ImportAliases:
+    """The ImportAliases of `tree`, a module that `imports` are known for."""
+    if imports is None:
+        imports = ModuleImports()
+    return imports.aliases(partial(import_bindings, tree.body))
+
+
+def lint_source(
+    code: str,
+    rules: Sequence[type] = DEFAULT_RULES,
+    profile: Optional[FileProfile] = None,
+    tree_cache: Optional[TreeCache] = None,
+    counts: Optional[Counter] = None,
+    imports: Optional[ModuleImports] = None,
+) -> list[StyleViolation]:
+    # Skip the parse entirely if no rule could possibly fire
+    with profile_phase(profile, "prefilter"):
+        rules = rules_for_source(code, rules, imports and imports.triggers)
+    if not rules:
+        return []
+
+    cached = None
+    if tree_cache is not None:
+        with profile_phase(profile, "cache"):
+            key = tree_cache.key(code.encode())
+            cached = tree_cache.get(key)
+    if cached is None:
+        with profile_phase(profile, "parse"):
+            tree = cst.parse_module(code)
+    else:
+        tree = cached.module
+
+    if profile is None:
+        # A freshly parsed tree has no shared nodes, so the wrapper's defensive
+        # deep copy isn't needed. Neither has an unpickled one.
+        wrapper = LintMetadataWrapper(tree, unsafe_skip_copy=True)
+    else:
+        wrapper = ProfilingMetadataWrapper(tree, profile)
+    if cached is not None and cached.position_nodes:
+        wrapper.preload(
+            PositionProvider, CachedPositions(cached.position_nodes, cached.positions)
+        )
+
+    aliases = NO_IMPORTS
+    if any(rule.IMPORTS for rule in rules):
+        with profile_phase(profile, "imports"):
+            aliases = module_aliases(tree, imports)
+
+    with profile_phase(profile, "traverse"):
+        violations = lint_module(wrapper, rules, profile, counts, aliases)
+
+    # Positions are only resolved for files with violations. Entries cached
+    # without them are updated the first time they are needed.
+    if tree_cache is not None and (
+        cached is None
+        or (not cached.position_nodes and wrapper.resolved(PositionProvider))
+    ):
+        with profile_phase(profile, "cache"):
+            tree_cache.set(key, _cached_tree(wrapper))
+    return violations
@@ -0,0 +1,66 @@
+import os
+from fnmatch import fnmatch
+from typing import Iterable, Sequence
+
+DEFAULT_INCLUDE = ("*.py",)
+DEFAULT_EXCLUDE = (
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".venv",
+    "venv",
+    "__pycache__",
+    "*.egg-info",
+    ".eggs",
+)
+
+
+def matches_any(path: str, patterns: Iterable[str]) -> bool:
+    name = os.path.basename(path)
+    return any(fnmatch(name, pattern) or fnmatch(path, pattern) for pattern in patterns)
+
+
+def expand_paths(
+    paths: Sequence[str],
+    include: Sequence[str] = DEFAULT_INCLUDE,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE,
+) -> list[str]:
+    """
+    Expand files and directories into a de-duplicated list of files.
+
+    Files named explicitly are always kept unless they match an exclude pattern.
+    Directories are walked recursively, in sorted order, and only files matching
+    an include pattern are kept. Patterns are matched against both the base name
+    and the path as given, so `build` and `src/generated/*.py` both work.
+    """
+    candidates = []
+    for path in paths:
+        if not os.path.isdir(path):
+            if not matches_any(path, exclude):
+                candidates.append(path)
+            continue
+
+        dir_files = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [
+                d for d in dirs if not matches_any(os.path.join(root, d), exclude)
+            ]
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                if matches_any(file_path, include) and not matches_any(
+                    file_path, exclude
+                ):
+                    dir_files.append(file_path)
+        candidates.extend(sorted(dir_files))
+
+    found = []
+    seen = set()
+    for path in candidates:
+        normalized = os.path.normpath(path)
+        if normalized not in seen:
+            seen.add(normalized)
+            found.append(normalized)
+
+    return found
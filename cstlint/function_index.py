@@ -0,0 +1,173 @@
+import ast
+from dataclasses import dataclass
+from typing import Iterator, Optional, Sequence, Union
+
+import libcst as cst
+
+# Maps each statement to the FunctionInfo of the function it's in. See
+# FunctionIndexProvider for the exact contents.
+AstFunctionIndex = dict[ast.AST, "FunctionInfo"]
+AstFunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+
+@dataclass(frozen=True, eq=False)
+class FunctionInfo:
+    """
+    A function definition, as seen by the rules. Parameter names are kept in
+    frozensets, so rules can check names against functions of any size.
+    """
+
+    name: str
+    # Positional-or-keyword parameters, the ones most rules care about
+    params: frozenset[str]
+    posonly_params: frozenset[str] = frozenset()
+    kwonly_params: frozenset[str] = frozenset()
+    star_arg: Optional[str] = None
+    star_kwarg: Optional[str] = None
+    # Number of functions the definition is nested in
+    depth: int = 0
+    # Class whose body the function is defined in, for methods
+    enclosing_class: Optional[str] = None
+    # Function the definition is nested in, if any
+    parent: Optional["FunctionInfo"] = None
+
+    @property
+    def all_params(self) -> frozenset[str]:
+        names = self.params | self.posonly_params | self.kwonly_params
+        return names | {name for name in (self.star_arg, self.star_kwarg) if name}
+
+
+class FunctionIndexProvider(cst.BaseMetadataProvider[FunctionInfo]):
+    """
+    Indexes the functions of a module, for rules that need to know which
+    function a node is in.
+
+    FunctionDef nodes map to the function they define, every other statement,
+    compound or simple, to the innermost function it's in. Module level
+    statements have no value.
+
+    Functions can only be defined by statements, so the index is built by
+    walking statement blocks alone, which is much cheaper than a full
+    traversal. Declare it in METADATA_DEPENDENCIES: the wrapper builds it once
+    per module, before the traversal, and shares it between all rules.
+    """
+
+    def _gen_impl(self, module: cst.Module) -> None:
+        self._index_block(module.body, None, None)
+
+    def _index_block(
+        self,
+        statements: Sequence[cst.CSTNode],
+        function: Optional[FunctionInfo],
+        class_name: Optional[str],
+    ) -> None:
+        for statement in statements:
+            if isinstance(statement, cst.FunctionDef):
+                info = _cst_function_info(statement, function, class_name)
+                self.set_metadata(statement, info)
+                self._index_block(statement.body.body, info, None)
+                continue
+
+            if function is not None:
+                self.set_metadata(statement, function)
+            if isinstance(statement, cst.SimpleStatementLine):
+                self._index_block(statement.body, function, class_name)
+            elif isinstance(statement, cst.ClassDef):
+                self._index_block(statement.body.body, function, statement.name.value)
+            elif isinstance(statement, cst.BaseCompoundStatement):
+                for suite in _cst_clauses(statement):
+                    self._index_block(suite.body, function, class_name)
+
+
+def _cst_function_info(
+    node: cst.FunctionDef,
+    parent: Optional[FunctionInfo],
+    class_name: Optional[str],
+) -> FunctionInfo:
+    params = node.params
+    star_arg = None
+    if isinstance(params.star_arg, cst.Param):
+        star_arg = params.star_arg.name.value
+    return FunctionInfo(
+        name=node.name.value,
+        params=frozenset(param.name.value for param in params.params),
+        posonly_params=frozenset(param.name.value for param in params.posonly_params),
+        kwonly_params=frozenset(param.name.value for param in params.kwonly_params),
+        star_arg=star_arg,
+        star_kwarg=params.star_kwarg.name.value if params.star_kwarg else None,
+        depth=0 if parent is None else parent.depth + 1,
+        enclosing_class=class_name,
+        parent=parent,
+    )
+
+
+def _cst_clauses(statement: cst.BaseCompoundStatement) -> Iterator[cst.BaseSuite]:
+    if isinstance(statement, cst.Match):
+        for case in statement.cases:
+            yield case.body
+        return
+
+    yield statement.body
+    if isinstance(statement, (cst.Try, cst.TryStar)):
+        for handler in statement.handlers:
+            yield handler.body
+    if isinstance(statement, (cst.If, cst.For, cst.While, cst.Try, cst.TryStar)):
+        if isinstance(statement.orelse, cst.If):
+            yield from _cst_clauses(statement.orelse)
+        elif statement.orelse is not None:
+            yield statement.orelse.body
+    if isinstance(statement, (cst.Try, cst.TryStar)) and statement.finalbody:
+        yield statement.finalbody.body
+
+
+def build_ast_function_index(tree: ast.Module) -> AstFunctionIndex:
+    """The equivalent of FunctionIndexProvider for the ast backend."""
+    index: AstFunctionIndex = {}
+    _index_ast_block(index, tree.body, None, None)
+    return index
+
+
+def _index_ast_block(
+    index: AstFunctionIndex,
+    statements: list[ast.stmt],
+    function: Optional[FunctionInfo],
+    class_name: Optional[str],
+) -> None:
+    for statement in statements:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            info = _ast_function_info(statement, function, class_name)
+            index[statement] = info
+            _index_ast_block(index, statement.body, info, None)
+            continue
+
+        if function is not None:
+            index[statement] = function
+        if isinstance(statement, ast.ClassDef):
+            _index_ast_block(index, statement.body, function, statement.name)
+            continue
+        # Compound statements, whose blocks are all lists of statements
+        fields = vars(statement)
+        for name in ("body", "orelse", "finalbody"):
+            _index_ast_block(index, fields.get(name, []), function, class_name)
+        for name in ("handlers", "cases"):
+            for clause in fields.get(name, []):
+                _index_ast_block(index, clause.body, function, class_name)
+
+
+def _ast_function_info(
+    node: AstFunctionNode,
+    parent: Optional[FunctionInfo],
+    class_name: Optional[str],
+) -> FunctionInfo:
+    args = node.args
+    return FunctionInfo(
+        name=node.name,
+        params=frozenset(arg.arg for arg in args.args),
+        posonly_params=frozenset(arg.arg for arg in args.posonlyargs),
+        kwonly_params=frozenset(arg.arg for arg in args.kwonlyargs),
+        star_arg=args.vararg.arg if args.vararg else None,
+        star_kwarg=args.kwarg.arg if args.kwarg else None,
+        depth=0 if parent is None else parent.depth + 1,
+        enclosing_class=class_name,
+        parent=parent,
+    )
@@ -0,0 +1,164 @@
+import os
+import re
+import subprocess
+from bisect import bisect_right
+from typing import Iterable, Optional, Sequence
+
+from cstlint.files import matches_any
+from cstlint.style_violation import StyleViolation
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+# Escapes in the quoted paths of diffs: octal bytes, or C escapes of a single
+# character
+QUOTED_PATH_ESCAPE = re.compile(rb"\\([0-7]{3}|.)")
+PATH_ESCAPES = {
+    b"a": b"\a",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+    b"v": b"\v",
+}
+
+
+class GitError(Exception):
+    pass
+
+
+def _git(args: Sequence[str], cwd: Optional[str] = None) -> str:
+    try:
+        completed = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError as e:
+        raise GitError("git is not installed") from e
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.strip() or f"git {' '.join(args)} failed") from e
+    return completed.stdout
+
+
+def _unescape(match: re.Match) -> bytes:
+    escape = match.group(1)
+    if len(escape) == 3:
+        return bytes([int(escape, 8)])
+    return PATH_ESCAPES.get(escape, escape)
+
+
+def unquote_path(path: str) -> str:
+    """
+    The path git writes as `path` in diffs. Paths with special characters,
+    and with non-ASCII ones unless core.quotePath is off, are quoted.
+    """
+    if not (len(path) >= 2 and path.startswith('"') and path.endswith('"')):
+        return path
+    raw = QUOTED_PATH_ESCAPE.sub(_unescape, path[1:-1].encode("utf-8"))
+    return raw.decode("utf-8", "surrogateescape")
+
+
+def parse_diff(diff: str) -> dict[str, list[tuple[int, int]]]:
+    """
+    Parse `git diff --unified=0` output into the inclusive line ranges added or
+    changed in each file, keyed by the path relative to the repository root.
+    The new versions of files must have the prefix `b/`.
+    """
+    changed = {}
+    current = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            # Paths with spaces are followed by a tab
+            target = unquote_path(line[4:].rstrip("\t"))
+            current = None if target == "/dev/null" else target[len("b/") :]
+            if current is not None:
+                changed.setdefault(current, [])
+            continue
+
+        match = HUNK_HEADER.match(line)
+        if match and current is not None:
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            # Pure deletions add no lines in the new version of the file
+            if count:
+                changed[current].append((start, start + count - 1))
+
+    return changed
+
+
+def changed_lines(
+    base: str, cwd: Optional[str] = None
+) -> dict[str, list[tuple[int, int]]]:
+    """
+    Changed line ranges of every file touched since `base`, keyed by path
+    relative to `cwd`. Deleted files are left out.
+    """
+    root = _git(["rev-parse", "--show-toplevel"], cwd=cwd).strip()
+    # Whatever the user's configuration, paths are prefixed with a/ and b/,
+    # and only quoted if they have special characters
+    diff = _git(
+        [
+            "-c",
+            "core.quotePath=false",
+            "diff",
+            "--src-prefix=a/",
+            "--dst-prefix=b/",
+            "--no-color",
+            "--no-ext-diff",
+            "--no-renames",
+            "--unified=0",
+            "--diff-filter=AM",
+            base,
+            "--",
+        ],
+        cwd=root,
+    )
+    return {
+        os.path.relpath(os.path.join(root, path), cwd or os.getcwd()): ranges
+        for path, ranges in parse_diff(diff).items()
+    }
+
+
+def changed_files(
+    changed: dict[str, list[tuple[int, int]]],
+    paths: Sequence[str],
+    include: Iterable[str],
+    exclude: Iterable[str],
+) -> list[str]:
+    """
+    The changed files that match `include`, don't match `exclude` and, if any
+    `paths` are given, are one of them or inside one of them.
+    """
+    roots = [os.path.abspath(path) for path in paths]
+    selected = []
+    for path in sorted(changed):
+        if not matches_any(path, include) or matches_any(path, exclude):
+            continue
+        if any(matches_any(part, exclude) for part in path.split(os.sep)[:-1]):
+            continue
+        if roots:
+            abs_path = os.path.abspath(path)
+            if not any(
+                abs_path == root or abs_path.startswith(root + os.sep) for root in roots
+            ):
+                continue
+        selected.append(path)
+    return selected
+
+
+def filter_to_changed_lines(
+    violations: Iterable[StyleViolation], ranges: Sequence[tuple[int, int]]
+) -> list[StyleViolation]:
+    """Keep the violations whose code range overlaps a changed line range."""
+    # git hunks never overlap, so the only candidate is the last range that
+    # starts at or before the violation's last line.
+    ranges = sorted(ranges)
+    starts = [start for start, _ in ranges]
+    kept = []
+    for violation in violations:
+        if violation.error_code.is_file_error:
+            kept.append(violation)
+            continue
+
+        idx = bisect_right(starts, violation.end_line)
+        if idx and ranges[idx - 1][1] >= violation.line_number:
+            kept.append(violation)
+    return kept
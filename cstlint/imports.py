@@ -0,0 +1,457 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache, partial
+from multiprocessing import Pool
+from typing import Callable, Iterable, Mapping, Optional, Sequence
+
+from cstlint.cache import DiskCache
+from cstlint.registry import RULES
+
+# Rules resolve the names a module uses through its imports, so that e.g.
+# `e` after `from builtins import eval as e` is found to be `builtins.eval`.
+# Names imported from other modules of the project are resolved further with
+# an ImportIndex of all of them, built once per run and cached per file. Like
+# the rest of what runs before any file is parsed, this module doesn't import
+# libcst.
+
+# Bump when the on-disk entry format changes
+IMPORT_CACHE_FORMAT_VERSION = 1
+# Entries are a few hundred bytes per file
+DEFAULT_MAX_IMPORT_CACHE_SIZE = 64 * 1024 * 1024
+# Names are followed through at most this many modules re-exporting them
+MAX_REEXPORTS = 16
+
+# An import at the top level of a module: the name it binds, the dotted name
+# of what it binds it to, and the level of relative imports, 0 for absolute
+# ones. `from .compat import s as attrs` is ("attrs", "compat.s", 1).
+Binding = tuple[str, str, int]
+
+
+def ast_bindings(statements: Sequence[ast.stmt]) -> list[Binding]:
+    """
+    The bindings of the imports in `statements`, a module's body, including
+    conditional ones, e.g. in try or if blocks. Imports in functions and
+    classes aren't, and neither are star imports.
+    """
+    bindings = []
+    for statement in statements:
+        if isinstance(statement, ast.Import):
+            for alias in statement.names:
+                if alias.asname is None:
+                    # `import a.b` binds a
+                    name = alias.name.partition(".")[0]
+                    bindings.append((name, name, 0))
+                else:
+                    bindings.append((alias.asname, alias.name, 0))
+        elif isinstance(statement, ast.ImportFrom):
+            for alias in statement.names:
+                if alias.name == "*":
+                    continue
+                target = alias.name
+                if statement.module is not None:
+                    target = f"{statement.module}.{alias.name}"
+                bindings.append((alias.asname or alias.name, target, statement.level))
+        elif not isinstance(
+            statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        ):
+            # Compound statements, whose blocks are all lists of statements
+            fields = vars(statement)
+            for name in ("body", "orelse", "finalbody"):
+                bindings.extend(ast_bindings(fields.get(name, [])))
+            for name in ("handlers", "cases"):
+                for clause in fields.get(name, []):
+                    bindings.extend(ast_bindings(clause.body))
+    return bindings
+
+
+def chunk_bindings(texts: Iterable[str]) -> list[Binding]:
+    """
+    The bindings of a module split into top-level statements, see
+    cstlint.chunks. Only statements that mention imports are parsed.
+    """
+    bindings = []
+    for text in texts:
+        if "import" not in text:
+            continue
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError):
+            continue
+        bindings.extend(ast_bindings(tree.body))
+    return bindings
+
+
+def ast_dotted_name(node: ast.AST) -> Optional[str]:
+    """`a.b.c` for Name and Attribute nodes, None for any other expression."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = ast_dotted_name(node.value)
+        return None if value is None else f"{value}.{node.attr}"
+    return None
+
+
+def absolute_bindings(
+    bindings: Iterable[Binding], module: Optional[str] = None, is_package: bool = False
+) -> dict[str, str]:
+    """
+    Names bound by `bindings` in `module` to the absolute dotted names of what
+    they're bound to. Relative imports are dropped if the module isn't known.
+    Later bindings of a name replace earlier ones.
+    """
+    resolved = {}
+    for name, target, level in bindings:
+        if level:
+            if module is None:
+                continue
+            package = module.split(".")
+            if not is_package:
+                package.pop()
+            if level - 1 >= len(package):
+                # Beyond the top-level package
+                continue
+            target = ".".join([*package[: len(package) - level + 1], target])
+        resolved[name] = target
+    return resolved
+
+
+@lru_cache(maxsize=None)
+def _is_package(directory: str) -> bool:
+    return os.path.isfile(os.path.join(directory, "__init__.py"))
+
+
+def module_name(path: str) -> Optional[tuple[str, bool]]:
+    """
+    The dotted name of the module at `path`, going by the __init__.py files of
+    the directories it's in, and whether it's a package. None if it can't be
+    imported under any name.
+    """
+    directory, file_name = os.path.split(os.path.abspath(path))
+    stem, extension = os.path.splitext(file_name)
+    if extension != ".py" or not stem.isidentifier():
+        return None
+    is_package = stem == "__init__"
+    parts = [] if is_package else [stem]
+    while _is_package(directory):
+        directory, package = os.path.split(directory)
+        if not package.isidentifier():
+            return None
+        parts.append(package)
+    if not parts:
+        return None
+    return ".".join(reversed(parts)), is_package
+
+
+def refers_to(name: str, targets: Iterable[str]) -> bool:
+    """Whether `name` is one of `targets`, or a module that contains one."""
+    return any(target == name or target.startswith(f"{name}.") for target in targets)
+
+
+def _resolve_exports(name: str, exports: Mapping[str, str]) -> str:
+    # The longest prefix of `name` that's exported decides what it is
+    parts = name.split(".")
+    for end in range(len(parts), 0, -1):
+        target = exports.get(".".join(parts[:end]))
+        if target is not None:
+            return ".".join([target, *parts[end:]])
+    return name
+
+
+class ImportAliases:
+    """
+    Resolves the names used in a module to the qualified names of what they
+    refer to, from the module's imports and what other modules of the
+    project export.
+    """
+
+    def __init__(
+        self,
+        bindings: Optional[Mapping[str, str]] = None,
+        exports: Optional[Mapping[str, str]] = None,
+    ):
+        # Names bound by the module's imports -> absolute dotted names
+        self.bindings = bindings or {}
+        self.exports = exports or {}
+        self._resolved: dict[str, str] = {}
+
+    def qualified_name(self, dotted_name: str) -> str:
+        """
+        E.g. `builtins.eval` for `e` after `from builtins import eval as e`.
+        Names that aren't imported are taken literally, bare ones as builtins.
+        """
+        resolved = self._resolved.get(dotted_name)
+        if resolved is None:
+            head, dot, rest = dotted_name.partition(".")
+            target = self.bindings.get(head)
+            if target is None:
+                resolved = dotted_name if dot else f"builtins.{dotted_name}"
+            else:
+                resolved = _resolve_exports(target + dot + rest, self.exports)
+            self._resolved[dotted_name] = resolved
+        return resolved
+
+
+@dataclass(frozen=True)
+class ProjectImports:
+    """
+    What rules need to know about the other modules of a project, see
+    ImportIndex.project_imports. Small enough to be sent to every worker.
+    """
+
+    # Qualified names in the project that refer to one of the names the
+    # enabled rules look for, or a module containing one, and what they refer
+    # to outside of the project
+    exports: dict[str, str] = field(default_factory=dict)
+    # Rule code -> the last parts of the exports it looks for, one of which
+    # every module referring to them contains
+    triggers: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    # Of the exports, for keys of results that depend on them
+    digest: str = ""
+
+
+@dataclass(frozen=True)
+class ModuleImports:
+    """What's known about a module's imports before it's parsed."""
+
+    # Dotted name of the module, for relative imports
+    module: Optional[str] = None
+    is_package: bool = False
+    project: Optional[ProjectImports] = None
+    # The module's bindings, if they're known already, e.g. for parts of it.
+    # Otherwise they're read from its tree.
+    bindings: Optional[tuple[Binding, ...]] = None
+
+    @classmethod
+    def for_path(
+        cls, path: Optional[str], project: Optional[ProjectImports]
+    ) -> Optional["ModuleImports"]:
+        """The imports of the module at `path`, if there's a project index."""
+        if project is None:
+            return None
+        name = module_name(path) if path is not None else None
+        if name is None:
+            return cls(project=project)
+        return cls(name[0], name[1], project)
+
+    def with_bindings(self, bindings: Iterable[Binding]) -> "ModuleImports":
+        return ModuleImports(
+            self.module, self.is_package, self.project, tuple(bindings)
+        )
+
+    @property
+    def cache_context(self) -> str:
+        """What results depend on besides the module's source."""
+        if self.project is None:
+            return ""
+        return f"{self.module}\n{self.is_package}\n{self.project.digest}"
+
+    def aliases(self, read_bindings: Callable[[], Sequence[Binding]]) -> ImportAliases:
+        """The module's ImportAliases, calling `read_bindings` if need be."""
+        bindings = self.bindings
+        if bindings is None:
+            bindings = read_bindings()
+        exports = self.project.exports if self.project is not None else None
+        return ImportAliases(
+            absolute_bindings(bindings, self.module, self.is_package), exports
+        )
+
+    @cached_property
+    def triggers(self) -> dict[str, tuple[str, ...]]:
+        """
+        Rule code -> names other than the rule's TRIGGERS that the module
+        refers to what it looks for by. The names it imports them under only
+        need to be known when the module is linted in parts, whose imports
+        are in other parts.
+        """
+        triggers = {}
+        if self.project is not None:
+            for code, names in self.project.triggers.items():
+                triggers[code] = list(names)
+        if self.bindings:
+            aliases = self.aliases(tuple)
+            for name in aliases.bindings:
+                qualified_name = aliases.qualified_name(name)
+                for code, spec in RULES.items():
+                    if spec.imports and refers_to(qualified_name, spec.imports):
+                        triggers.setdefault(code, []).append(name)
+        return {code: tuple(names) for code, names in triggers.items()}
+
+
+def import_fingerprint() -> str:
+    # Bindings only depend on the grammar, not on the rules
+    return "\n".join(
+        [
+            f"format={IMPORT_CACHE_FORMAT_VERSION}",
+            f"python={sys.version_info[0]}.{sys.version_info[1]}",
+        ]
+    )
+
+
+class ImportCache(DiskCache):
+    """
+    The bindings of each file, keyed by content alone. Relative imports are
+    kept relative, so entries don't depend on where the file is.
+    """
+
+    SUFFIX = ".json"
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_IMPORT_CACHE_SIZE):
+        super().__init__(
+            os.path.join(cache_dir, "imports"), import_fingerprint(), max_size
+        )
+
+    def get(self, key: str) -> Optional[list[Binding]]:
+        data = self._read(key)
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            return None
+        return [tuple(binding) for binding in entry["bindings"]]
+
+    def set(self, key: str, bindings: Sequence[Binding]) -> None:
+        entry = {"bindings": bindings}
+        self._write(key, json.dumps(entry, separators=(",", ":")).encode())
+
+
+def read_bindings(path: str, cache: Optional[ImportCache] = None) -> list[Binding]:
+    """The bindings of the file at `path`, none if it can't be read or parsed."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return []
+    key = cache.key(data) if cache else None
+    bindings = cache.get(key) if cache else None
+    if bindings is None:
+        try:
+            # Decoded like the file would be imported
+            bindings = ast_bindings(ast.parse(data).body)
+        except (SyntaxError, ValueError, RecursionError):
+            bindings = []
+        if cache:
+            cache.set(key, bindings)
+    return bindings
+
+
+class ImportIndex:
+    """
+    The bindings of every module of a project, by module name.
+
+    Build it with build_import_index(). Rules don't use it directly: it's
+    reduced to the ProjectImports of the enabled rules first.
+    """
+
+    def __init__(self, modules: Mapping[str, Mapping[str, str]]):
+        self.modules = modules
+        self._resolved: dict[str, str] = {}
+
+    def resolve(self, name: str) -> str:
+        """
+        What the dotted `name` refers to, after following it through the
+        modules of the project that import it from elsewhere. Names of the
+        project that aren't imports resolve to themselves.
+        """
+        resolved = self._resolved.get(name)
+        if resolved is not None:
+            return resolved
+        original = name
+        for _ in range(MAX_REEXPORTS):
+            parts = name.split(".")
+            # The longest prefix that's a module of the project binds the part
+            # after it, if anything does
+            for end in range(len(parts) - 1, 0, -1):
+                bindings = self.modules.get(".".join(parts[:end]))
+                if bindings is not None:
+                    break
+            else:
+                break
+            target = bindings.get(parts[end])
+            if target is None:
+                break
+            target = ".".join([target, *parts[end + 1 :]])
+            if target == name:
+                break
+            name = target
+        self._resolved[original] = name
+        return name
+
+    def project_imports(self, codes: Sequence[str]) -> ProjectImports:
+        """What the rules with `codes` need to know about the project."""
+        targets = {code: RULES[code].imports for code in codes if RULES[code].imports}
+        exports = {}
+        # Bindings of modules of the project to modules of the project
+        module_aliases = []
+        for module, bindings in self.modules.items():
+            for name, target in bindings.items():
+                resolved = self.resolve(target)
+                if any(refers_to(resolved, names) for names in targets.values()):
+                    exports[f"{module}.{name}"] = resolved
+                elif resolved in self.modules:
+                    module_aliases.append((f"{module}.{name}", resolved))
+
+        # An export of a module is also one of every module that imports it,
+        # under the name it's imported as
+        for _ in range(MAX_REEXPORTS):
+            prefixes = {
+                ".".join(key.split(".")[:end])
+                for key in exports
+                for end in range(1, key.count(".") + 1)
+            }
+            added = {}
+            for alias, module in module_aliases:
+                if module not in prefixes:
+                    continue
+                for key, target in exports.items():
+                    if key.startswith(f"{module}."):
+                        alias_key = alias + key[len(module) :]
+                        if alias_key not in exports:
+                            added[alias_key] = target
+            if not added:
+                break
+            exports.update(added)
+
+        triggers = {}
+        for key, target in sorted(exports.items()):
+            for code, names in targets.items():
+                if refers_to(target, names):
+                    triggers.setdefault(code, set()).add(key.rpartition(".")[2])
+        digest = hashlib.sha256(
+            json.dumps(sorted(exports.items())).encode()
+        ).hexdigest()
+        return ProjectImports(
+            exports,
+            {code: tuple(sorted(names)) for code, names in triggers.items()},
+            digest,
+        )
+
+
+def build_import_index(
+    paths: Sequence[str], jobs: int = 1, cache: Optional[ImportCache] = None
+) -> ImportIndex:
+    """
+    Index the imports of the modules at `paths`, parsing files in `jobs`
+    processes. Files whose bindings are in `cache` aren't parsed again, so
+    only files that changed since the last run are.
+    """
+    read = partial(read_bindings, cache=cache)
+    jobs = min(jobs, len(paths))
+    if jobs > 1:
+        with Pool(processes=jobs) as pool:
+            # A few chunks per worker, like runner.chunk_size
+            chunks = max(1, len(paths) // (jobs * 4))
+            bindings = pool.map(read, paths, chunks)
+    else:
+        bindings = [read(path) for path in paths]
+
+    modules = {}
+    for path, path_bindings in zip(paths, bindings):
+        name = module_name(path)
+        if name is not None and name[0] not in modules:
+            modules[name[0]] = absolute_bindings(path_bindings, *name)
+    return ImportIndex(modules)
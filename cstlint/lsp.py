@@ -0,0 +1,431 @@
+import json
+import threading
+import time
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import BinaryIO, Callable, Optional
+
+from cstlint.chunks import Chunk
+from cstlint.chunks import split_lines
+from cstlint.chunks import update_chunks
+from cstlint.imports import Binding
+from cstlint.imports import ModuleImports
+from cstlint.imports import chunk_bindings
+from cstlint.registry import RULES
+from cstlint.registry import split_rules
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_source_code
+from cstlint.style_violation import StyleViolation
+
+# A language server speaking JSON-RPC over a pair of streams, see
+# https://microsoft.github.io/language-server-protocol/. Every message is a
+# Content-Length header, an empty line and a JSON body.
+
+# Seconds without edits to a document before it's linted, so that typing
+# doesn't lint every keystroke
+DEBOUNCE_DELAY = 0.2
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Message types of window/logMessage
+LOG_ERROR = 1
+
+# Diagnostic severities
+ERROR = 1
+WARNING = 2
+
+# Text document sync kinds
+FULL_SYNC = 1
+
+# Position encodings. Violations' columns count code points, clients count
+# UTF-16 code units unless they support UTF-32.
+UTF_16 = "utf-16"
+UTF_32 = "utf-32"
+
+
+def read_message(stream: BinaryIO) -> Optional[dict]:
+    """Reads one message, or returns None at the end of the stream."""
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    if length is None:
+        raise ValueError("Message without a Content-Length header")
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body)
+
+
+def write_message(stream: BinaryIO, message: dict) -> None:
+    body = json.dumps(message).encode("utf-8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    stream.flush()
+
+
+def to_position(
+    line_number: int, column: int, lines: Optional[list[str]] = None
+) -> dict:
+    """
+    The LSP position of a violation's line and column. If the `lines` of the
+    document are given, the column is converted to UTF-16 code units.
+    """
+    # Lines are 0-based in LSP, columns already are
+    line = line_number - 1
+    if lines is not None and 0 <= line < len(lines):
+        # Characters beyond the BMP take two code units
+        column += sum(1 for char in lines[line][:column] if char > "\uffff")
+    return {"line": line, "character": column}
+
+
+def to_diagnostic(violation: StyleViolation, lines: Optional[list[str]] = None) -> dict:
+    error_code = violation.error_code
+    message = error_code.error_message
+    if violation.message:
+        message += f" {violation.message}"
+    return {
+        "range": {
+            "start": to_position(violation.line_number, violation.column_number, lines),
+            "end": to_position(violation.end_line, violation.end_column, lines),
+        },
+        "severity": ERROR if error_code.is_file_error else WARNING,
+        "code": error_code.error_code,
+        "source": "cstlint",
+        "message": message,
+    }
+
+
+class IncrementalLinter:
+    """
+    Lints the versions of one module as it's edited.
+
+    The module is split into its top-level statements, and the violations of
+    each are kept. A new version is only split again around the lines that
+    changed, and only statements whose text changed are linted again. The
+    violations of the others are moved to their new lines. Rules that are
+    MODULE_WIDE lint the whole module every time. Rules with IMPORTS resolve
+    names through the imports of all statements, and every statement is
+    linted again when those change.
+    """
+
+    def __init__(self, options: LintOptions = LintOptions()):
+        local, module_wide = split_rules(options.rules)
+        self.options = replace(options, rules=local)
+        self.module_options = replace(options, rules=module_wide)
+        self.lines: list[str] = []
+        self.chunks: list[Chunk] = []
+        # Violations of the current chunks by their text, with lines relative
+        # to the chunk
+        self.chunk_violations: dict[str, list[StyleViolation]] = {}
+        # Bindings of the module's imports, and of each chunk by its text
+        self.bindings: tuple[Binding, ...] = ()
+        self.chunk_bindings: dict[str, tuple[Binding, ...]] = {}
+        self._uses_imports = any(RULES[code].imports for code in local)
+
+    def _update_bindings(self) -> None:
+        bindings = []
+        by_chunk = {}
+        for chunk in self.chunks:
+            found = self.chunk_bindings.get(chunk.text)
+            if found is None:
+                found = tuple(chunk_bindings([chunk.text]))
+            by_chunk[chunk.text] = found
+            bindings.extend(found)
+        self.chunk_bindings = by_chunk
+        if tuple(bindings) != self.bindings:
+            # Any chunk may use what's imported
+            self.bindings = tuple(bindings)
+            self.chunk_violations = {}
+
+    def lint(
+        self, source_code: str, is_stale: Optional[Callable[[], bool]] = None
+    ) -> Optional[list[StyleViolation]]:
+        """
+        The violations of `source_code`, the module's new version. Gives up
+        and returns None if `is_stale` returns true before a chunk is linted,
+        e.g. because there's a newer version already. Chunks linted so far
+        are still reused by the next version.
+        """
+        lines = split_lines(source_code)
+        self.chunks = update_chunks(self.chunks, self.lines, lines)
+        self.lines = lines
+        imports = None
+        if self._uses_imports:
+            self._update_bindings()
+            imports = ModuleImports(bindings=self.bindings)
+        chunk_violations: dict[str, list[StyleViolation]] = {}
+        violations = []
+        for chunk in self.chunks:
+            relative = chunk_violations.get(chunk.text)
+            if relative is None:
+                relative = self.chunk_violations.get(chunk.text)
+            if relative is None:
+                if is_stale is not None and is_stale():
+                    self.chunk_violations.update(chunk_violations)
+                    return None
+                relative = lint_source_code(chunk.text, self.options, imports)
+            chunk_violations[chunk.text] = relative
+            violations.extend(
+                violation.shifted(chunk.start_line - 1) for violation in relative
+            )
+        self.chunk_violations = chunk_violations
+        if self.module_options.rules:
+            # Syntax errors are reported by the chunk they're in already
+            violations.extend(
+                violation
+                for violation in lint_source_code(source_code, self.module_options)
+                if not violation.error_code.is_file_error
+            )
+        return violations
+
+
+@dataclass
+class Document:
+    uri: str
+    version: int
+    text: str
+    linter: IncrementalLinter
+
+
+class LanguageServer:
+    """
+    Publishes the violations of open documents as diagnostics.
+
+    Documents are linted by a background thread once they haven't changed
+    for `debounce` seconds. Linting a version is abandoned as soon as a newer
+    one arrives, and only the latest version's diagnostics are published.
+    Only full document sync is supported: clients send the whole text on
+    every change, which is then diffed by lines.
+    """
+
+    def __init__(
+        self,
+        input: BinaryIO,
+        output: BinaryIO,
+        options: LintOptions = LintOptions(),
+        debounce: float = DEBOUNCE_DELAY,
+    ):
+        self.input = input
+        self.output = output
+        # Chunks aren't worth caching on disk, their results are kept in memory
+        self.options = replace(options, cache=None, tree_cache=None)
+        self.debounce = debounce
+        # Negotiated by initialize
+        self.position_encoding = UTF_16
+        self.documents: dict[str, Document] = {}
+        # When each document with unlinted changes is due to be linted
+        self.due: dict[str, float] = {}
+        # Guards the documents, and wakes up the linter thread
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.shutdown_requested = False
+        self.stopped = False
+        self.requests = {
+            "initialize": self.initialize,
+            "shutdown": self.shutdown,
+        }
+        self.notifications = {
+            "textDocument/didOpen": self.did_open,
+            "textDocument/didChange": self.did_change,
+            "textDocument/didClose": self.did_close,
+        }
+
+    def serve(self) -> int:
+        """Handles messages until the exit notification, returns the exit code."""
+        linter = threading.Thread(target=self._lint_due_documents, daemon=True)
+        linter.start()
+        try:
+            while True:
+                try:
+                    message = read_message(self.input)
+                except ValueError as e:
+                    self.send_error(None, PARSE_ERROR, str(e))
+                    continue
+                if message is None:
+                    break
+                if isinstance(message, dict) and message.get("method") == "exit":
+                    break
+                self.handle(message)
+        finally:
+            with self.condition:
+                self.stopped = True
+                self.condition.notify()
+            linter.join()
+        return 0 if self.shutdown_requested else 1
+
+    def handle(self, message: dict) -> None:
+        if not isinstance(message, dict):
+            self.send_error(None, INVALID_REQUEST, "Messages must be JSON objects")
+            return
+        method = message.get("method")
+        params = message.get("params") or {}
+        if method is None:
+            # A response, the server doesn't send requests
+            return
+        if "id" not in message:
+            # Others, like $/cancelRequest, can be ignored: requests are
+            # answered right away, and lint runs are cancelled by new versions.
+            # Notifications can't be answered, so their errors are logged.
+            handler = self.notifications.get(method)
+            if handler is not None:
+                try:
+                    handler(params)
+                except Exception as e:
+                    self.log_error(f"{method} failed: {type(e).__name__}: {e}")
+            return
+
+        request_id = message["id"]
+        handler = self.requests.get(method)
+        if self.shutdown_requested:
+            self.send_error(request_id, INVALID_REQUEST, "Shutdown was requested")
+        elif handler is None:
+            self.send_error(request_id, METHOD_NOT_FOUND, f"Unsupported {method}")
+        else:
+            try:
+                result = handler(params)
+            except (KeyError, TypeError, AttributeError) as e:
+                # Params without the fields, or of the types, they should have
+                error = f"Invalid params: {type(e).__name__}: {e}"
+                self.send_error(request_id, INVALID_PARAMS, error)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self.send_error(request_id, INTERNAL_ERROR, error)
+            else:
+                self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def send(self, message: dict) -> None:
+        with self.write_lock:
+            write_message(self.output, message)
+
+    def send_error(self, request_id, code: int, message: str) -> None:
+        error = {"code": code, "message": message}
+        self.send({"jsonrpc": "2.0", "id": request_id, "error": error})
+
+    def log_error(self, message: str) -> None:
+        params = {"type": LOG_ERROR, "message": message}
+        self.send({"jsonrpc": "2.0", "method": "window/logMessage", "params": params})
+
+    def initialize(self, params: dict) -> dict:
+        general = (params.get("capabilities") or {}).get("general") or {}
+        if UTF_32 in (general.get("positionEncodings") or ()):
+            # Columns can be sent as they are
+            self.position_encoding = UTF_32
+        return {
+            "capabilities": {
+                "positionEncoding": self.position_encoding,
+                "textDocumentSync": {"openClose": True, "change": FULL_SYNC},
+            },
+            "serverInfo": {"name": "cstlint"},
+        }
+
+    def shutdown(self, params: dict) -> None:
+        self.shutdown_requested = True
+
+    def did_open(self, params: dict) -> None:
+        text_document = params["textDocument"]
+        uri = text_document["uri"]
+        with self.condition:
+            self.documents[uri] = Document(
+                uri,
+                text_document["version"],
+                text_document["text"],
+                IncrementalLinter(self.options),
+            )
+            self._schedule(uri)
+
+    def did_change(self, params: dict) -> None:
+        uri = params["textDocument"]["uri"]
+        with self.condition:
+            document = self.documents.get(uri)
+            if document is None or not params["contentChanges"]:
+                return
+            document.text = params["contentChanges"][-1]["text"]
+            document.version = params["textDocument"]["version"]
+            self._schedule(uri)
+
+    def did_close(self, params: dict) -> None:
+        uri = params["textDocument"]["uri"]
+        with self.condition:
+            self.documents.pop(uri, None)
+            self.due.pop(uri, None)
+            self.publish(uri, None, [])
+
+    def publish(
+        self,
+        uri: str,
+        version: Optional[int],
+        violations: list[StyleViolation],
+        text: str = "",
+    ) -> None:
+        lines = None
+        if self.position_encoding == UTF_16:
+            lines = split_lines(text)
+        params = {
+            "uri": uri,
+            "diagnostics": [
+                to_diagnostic(violation, lines) for violation in violations
+            ],
+        }
+        if version is not None:
+            params["version"] = version
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": params,
+            }
+        )
+
+    def _schedule(self, uri: str) -> None:
+        # Called with the condition held
+        self.due[uri] = time.monotonic() + self.debounce
+        self.condition.notify()
+
+    def _is_stale(self, document: Document, version: int) -> bool:
+        return (
+            self.stopped
+            or document.version != version
+            or self.documents.get(document.uri) is not document
+        )
+
+    def _next_due_document(self) -> Optional[Document]:
+        # Called with the condition held. Waits for a document to be due, or
+        # returns None once the server stops.
+        while not self.stopped:
+            now = time.monotonic()
+            timeout = None
+            for uri, due in self.due.items():
+                if due <= now:
+                    del self.due[uri]
+                    return self.documents[uri]
+                timeout = due - now if timeout is None else min(timeout, due - now)
+            self.condition.wait(timeout)
+        return None
+
+    def _lint_due_documents(self) -> None:
+        while True:
+            with self.condition:
+                document = self._next_due_document()
+                if document is None:
+                    return
+                version = document.version
+                text = document.text
+            is_stale = partial(self._is_stale, document, version)
+            violations = document.linter.lint(text, is_stale)
+            with self.condition:
+                # Published with the condition held, so that a document that
+                # was closed or changed meanwhile doesn't get old diagnostics
+                if violations is not None and not is_stale():
+                    self.publish(document.uri, version, violations, text)
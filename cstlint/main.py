@@ -1,48 +1,95 @@
 import argparse
+import json
 import sys
+from contextlib import ExitStack, nullcontext
+from dataclasses import replace
 
-import libcst as cst
-from cstlint.visitors import AttrDecoratorVisitor
-from cstlint.visitors import DangerousFunctionVisitor
-from cstlint.visitors import FunctionArgAssignVisitor
-from cstlint.visitors import LambdaVisitor
-from cstlint.visitors import MutableDefaultArgVisitor
-from cstlint.visitors import NestedFunctionVisitor
+from cstlint.backends import BACKENDS
+from cstlint.backends import DEFAULT_BACKEND
+from cstlint.baseline import Baseline
+from cstlint.cache import ResultCache
+from cstlint.cache import default_cache_dir
+from cstlint.cache import rules_fingerprint
+from cstlint.daemon import default_socket_path
+from cstlint.daemon import lint_files_with_daemon
+from cstlint.daemon import request_lint
+from cstlint.daemon import serve
+from cstlint.files import DEFAULT_EXCLUDE
+from cstlint.files import DEFAULT_INCLUDE
+from cstlint.files import expand_paths
+from cstlint.git_diff import GitError
+from cstlint.git_diff import changed_files
+from cstlint.git_diff import changed_lines
+from cstlint.git_diff import filter_to_changed_lines
+from cstlint.imports import ImportCache
+from cstlint.imports import build_import_index
+from cstlint.pipeline import QueuedStream
+from cstlint.profiling import ProfileReport
+from cstlint.registry import select_rules
+from cstlint.runner import FileResult
+from cstlint.runner import LintOptions
+from cstlint.runner import count_files
+from cstlint.runner import decode_source
+from cstlint.runner import default_jobs
+from cstlint.runner import lint_data
+from cstlint.runner import lint_files
+from cstlint.sharding import file_weights
+from cstlint.sharding import load_timings
+from cstlint.sharding import parse_shard
+from cstlint.sharding import select_shard
+from cstlint.supervisor import Supervisor
+from cstlint.tree_cache import TreeCache
+from cstlint.writers import DEFAULT_FORMAT
+from cstlint.writers import STATISTICS_WRITERS
+from cstlint.writers import WRITERS
+from cstlint.writers import TextWriter
+
+OUTPUT_BUFFER_SIZE = 1 << 16
 
 
 def find_and_print_style_violations(
     code: str, file_name: str, verbose: bool, quiet: bool = False
-) -> None:
-    tree = cst.parse_module(code)
-    visitors = [
-        DangerousFunctionVisitor(),
-        NestedFunctionVisitor(),
-        LambdaVisitor(),
-        FunctionArgAssignVisitor(),
-        AttrDecoratorVisitor(),
-        MutableDefaultArgVisitor(),
-    ]
-    wrapper = cst.MetadataWrapper(tree)
-    code_lines = code.split("\n")
-
-    for visitor in visitors:
-        wrapper.visit(visitor)
-
-    for visitor in visitors:
-        for violation in visitor.violations:
-            if quiet:
-                print(f"{file_name}:{violation.format()}")
-                sys.exit(1)
-            if verbose:
-                line = code_lines[violation.code_range.start.line - 1]
-                print(f"{file_name}:{violation.format()}: {line}")
-            else:
-                print(f"{file_name}:{violation.format()}")
+) -> int:
+    """Prints the violations in `code`. Returns 1 if there were any, else 0."""
+    from cstlint.engine import lint_source
+
+    result = FileResult(path=file_name, violations=lint_source(code))
+    if quiet:
+        del result.violations[1:]
+    if verbose:
+        result.collect_lines(code)
+    TextWriter(sys.stdout, with_lines=verbose).write_result(result)
+    return result.exit_code
+
+
+def print_source(path: str) -> None:
+    with open(path, "r") as file:
+        lines = file.readlines()
+
+    print("Source code:")
+    print("-" * 80)
+    for idx, line in enumerate(lines):
+        print("{:4d} | {}".format(idx + 1, line), end="")
+    print("-" * 80)
+
+
+def _comma_separated(value: str) -> tuple[str, ...]:
+    return tuple(part.strip() for part in value.split(",") if part.strip())
 
 
 def main() -> None:
+    if sys.argv[1:2] == ["merge"]:
+        from cstlint.merge import main as merge_main
+
+        sys.exit(merge_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser()
-    parser.add_argument("file", type=str, help="Path to the file to be checked")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=str,
+        help="Files or directories to be checked. Directories are searched recursively. Use - to read from stdin.",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -61,25 +108,416 @@ def main() -> None:
         default=False,
         help="Don't display anything and exit on first violation",
     )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        metavar="GLOB",
+        help=f"Only check files in directories matching this glob. Can be repeated. Defaults to {' '.join(DEFAULT_INCLUDE)}",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Skip files and directories matching this glob. Can be repeated.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of processes to lint with. 0 means one per CPU",
+    )
+    parser.add_argument(
+        "--split-modules",
+        type=int,
+        default=None,
+        metavar="LINES",
+        help="Split modules of at least LINES lines at top-level statements and lint the parts in parallel, with all --jobs",
+    )
+    parser.add_argument(
+        "--resolve-imports",
+        action="store_true",
+        default=False,
+        help="Index the imports of every module under the given paths, or the current directory, so that rules find names imported from project modules that re-export them",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Don't read or write cached results and parsed trees",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help=f"Directory to cache results in. Defaults to {default_cache_dir()}",
+    )
+    parser.add_argument(
+        "--stdin-filename",
+        type=str,
+        default="stdin",
+        help="File name to report when reading source from stdin",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        default=False,
+        help="Run as a daemon serving lint requests over a Unix socket",
+    )
+    parser.add_argument(
+        "--use-daemon",
+        action="store_true",
+        default=False,
+        help="Send files to a running daemon. Falls back to linting in-process if none is running",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help=f"Unix socket of the daemon. Defaults to {default_socket_path()}",
+    )
+    parser.add_argument(
+        "--lsp",
+        action="store_true",
+        default=False,
+        help="Run as a language server over stdin and stdout, publishing the violations of open files as diagnostics",
+    )
+    parser.add_argument(
+        "--diff",
+        type=str,
+        default=None,
+        metavar="BASE",
+        help="Only check files changed since the git revision BASE. Restricted to the given paths, if any",
+    )
+    parser.add_argument(
+        "--changed-lines-only",
+        action="store_true",
+        default=False,
+        help="With --diff, only report violations overlapping changed lines",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        default=DEFAULT_BACKEND,
+        help="Parser to run the rules on. ast is faster, cst is the reference implementation",
+    )
+    parser.add_argument(
+        "--select",
+        type=_comma_separated,
+        default=(),
+        metavar="CODES",
+        help="Comma separated error codes or prefixes of the rules to run, e.g. S1001,S1003. Defaults to all rules",
+    )
+    parser.add_argument(
+        "--ignore",
+        type=_comma_separated,
+        default=(),
+        metavar="CODES",
+        help="Comma separated error codes or prefixes of rules not to run",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default=DEFAULT_FORMAT,
+        help="Output format. jsonl writes one JSON object per violation, json a single report that `cstlint merge` can combine",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Write violations to FILE instead of stdout",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Print the time spent per phase, rule and file to stderr",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        default=False,
+        help="Also record peak memory with tracemalloc. Implies --profile, slows linting down",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Write the full profile as JSON to FILE. Implies --profile",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Give up on files that take longer than SECONDS to lint, reporting E0004. Lints every file in a supervised worker process",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="Kill workers whose resident memory exceeds MIB while linting a file, reporting E0005. Linux only. Lints every file in a supervised worker process",
+    )
+    parser.add_argument(
+        "--max-files-per-worker",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Replace supervised worker processes after N files",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        metavar="K/N",
+        help="Only check the K-th of N parts of the files, balanced by size. Combine the reports of all N runs with `cstlint merge`",
+    )
+    parser.add_argument(
+        "--shard-timings",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Balance shards by the time per file in FILE, written by --profile-output. Every shard must be given the same FILE",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Don't report violations recorded in FILE by --write-baseline. Violations a file has beyond them still are",
+    )
+    parser.add_argument(
+        "--write-baseline",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Record all violations found in FILE for --baseline instead of reporting them",
+    )
+    parser.add_argument(
+        "--statistics",
+        action="store_true",
+        default=False,
+        help="Only report the number of violations per error code. With --format json, also per directory and file",
+    )
     args = parser.parse_args()
+    profile = args.profile or args.profile_memory or bool(args.profile_output)
+    if not args.paths and not args.daemon and not args.lsp and not args.diff:
+        parser.error("at least one path is required")
+    if args.changed_lines_only and not args.diff:
+        parser.error("--changed-lines-only requires --diff")
+    if args.diff and args.paths == ["-"]:
+        # There's no file in the repository to diff
+        parser.error("--diff can't be used with stdin")
+    if args.resolve_imports and (args.daemon or args.lsp or args.use_daemon):
+        # The index would go stale as files change
+        parser.error("--resolve-imports can't be used with the daemon or --lsp")
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(f"--shard: {e}")
+        if args.paths == ["-"]:
+            parser.error("--shard can't be used with stdin")
+    if args.statistics and args.format not in STATISTICS_WRITERS:
+        parser.error(
+            f"--statistics supports --format {' or '.join(STATISTICS_WRITERS)}"
+        )
+    if args.statistics and (args.quiet or args.write_baseline):
+        parser.error("--statistics can't be combined with --quiet or --write-baseline")
+    if args.baseline and args.write_baseline:
+        parser.error("--baseline and --write-baseline can't be combined")
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = Baseline.load(args.baseline)
+        except (OSError, ValueError) as e:
+            parser.error(f"--baseline: {e}")
+    new_baseline = Baseline() if args.write_baseline else None
+    timings = None
+    if args.shard_timings:
+        try:
+            timings = load_timings(args.shard_timings)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            parser.error(f"--shard-timings: can't read {args.shard_timings}: {e!r}")
 
-    if args.file:
-        with open(args.file, "r") as file:
-            lines = file.readlines()
-            source_code = "".join(lines)
-
-        if args.show_source:
-            print("Source code:")
-            print("-" * 80)
-            for idx, line in enumerate(lines):
-                print("{:4d} | {}".format(idx + 1, line), end="")
-            print("-" * 80)
+    try:
+        rules = select_rules(args.select, args.ignore)
+    except ValueError as e:
+        parser.error(str(e))
 
-        find_and_print_style_violations(
-            source_code, args.file, args.verbose, args.quiet
+    cache = None
+    tree_cache = None
+    import_cache = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_dir()
+        cache = ResultCache(cache_dir, rules_fingerprint(rules, args.backend))
+        tree_cache = TreeCache(cache_dir)
+        if args.resolve_imports:
+            import_cache = ImportCache(cache_dir)
+    options = LintOptions(
+        rules=rules,
+        backend=args.backend,
+        with_lines=args.verbose,
+        cache=cache,
+        tree_cache=tree_cache,
+        profile=profile,
+        profile_memory=args.profile_memory,
+        timeout=args.timeout,
+        max_memory=args.max_memory * 2**20 if args.max_memory else None,
+        max_files_per_worker=args.max_files_per_worker,
+        split_threshold=args.split_modules,
+    )
+    include = args.include or DEFAULT_INCLUDE
+    exclude = DEFAULT_EXCLUDE + tuple(args.exclude)
+    if args.resolve_imports:
+        # All of the project, however few of its files are linted
+        project_paths = [path for path in args.paths if path != "-"] or ["."]
+        index = build_import_index(
+            expand_paths(project_paths, include, exclude),
+            args.jobs or default_jobs(),
+            import_cache,
         )
+        options = replace(options, imports=index.project_imports(rules))
+    socket_path = args.socket or default_socket_path()
+
+    if args.daemon:
+        serve(socket_path, options)
+        return
+    if args.lsp:
+        from cstlint.lsp import LanguageServer
+
+        server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer, options)
+        sys.exit(server.serve())
+
+    # The daemon lints with the client's rules, backend and cache, but with
+    # its own everything else. Runs that profile, supervise or split modules
+    # lint in-process.
+    use_daemon = (
+        args.use_daemon
+        and not profile
+        and not options.supervised
+        and options.split_threshold is None
+    )
+    # Source of the file read from stdin, for baselines
+    stdin_source = None
+    # Files to count the violations of without linting them in full, for
+    # --statistics runs that don't need the violations themselves
+    count_paths = None
+    if args.paths == ["-"]:
+        source_code = sys.stdin.buffer.read()
+        try:
+            stdin_source = decode_source(source_code)
+        except UnicodeError:
+            pass
+        result = None
+        if use_daemon:
+            # Requests carry text. Source that isn't UTF-8, and sources the
+            # daemon fails on, are linted in-process, which reports why.
+            try:
+                result = request_lint(
+                    socket_path,
+                    args.stdin_filename,
+                    source=source_code.decode("utf-8"),
+                    options=options,
+                )
+            except (UnicodeDecodeError, RuntimeError):
+                result = None
+        if result is None and options.supervised:
+            result = Supervisor(options).lint_data(args.stdin_filename, source_code)
+        if result is None:
+            result = lint_data(args.stdin_filename, source_code, options)
+        results = [result]
     else:
-        print("Please specify a file path using --file argument.")
+        if args.diff:
+            try:
+                changed = changed_lines(args.diff)
+            except GitError as e:
+                parser.error(f"--diff: {e}")
+            paths = changed_files(changed, args.paths, include, exclude)
+        else:
+            paths = expand_paths(args.paths, include, exclude)
+        if shard:
+            paths = select_shard(paths, shard, file_weights(paths, timings))
+        jobs = args.jobs or default_jobs()
+        if args.statistics and not (
+            args.changed_lines_only
+            or baseline is not None
+            or profile
+            or args.use_daemon
+        ):
+            count_paths = paths
+            results = ()
+        elif use_daemon:
+            results = lint_files_with_daemon(socket_path, paths, jobs, options)
+        else:
+            results = lint_files(paths, jobs, options)
+
+    exit_code = 0
+    cache_misses = 0
+    report = ProfileReport() if profile else None
+    if args.output:
+        output = open(args.output, "w", buffering=OUTPUT_BUFFER_SIZE)
+    else:
+        output = nullcontext(sys.stdout)
+    with output as stream, ExitStack() as stack:
+        # Violations are written from a background thread while linting goes
+        # on. --show-source prints between them, so it needs them in order.
+        if not args.show_source:
+            stream = stack.enter_context(QueuedStream(stream))
+        writers = STATISTICS_WRITERS if args.statistics else WRITERS
+        writer = writers[args.format](stream, with_lines=args.verbose, shard=shard)
+        with writer:
+            if count_paths is not None:
+                statistics = count_files(count_paths, jobs, options)
+                writer.statistics.merge(statistics)
+                exit_code = 1 if statistics.total() else 0
+            for result in results:
+                cache_misses += not result.cached
+                if report and result.profile:
+                    report.add(result.profile)
+                if args.show_source and args.paths != ["-"]:
+                    print_source(result.path)
+
+                if args.changed_lines_only:
+                    result.violations = filter_to_changed_lines(
+                        result.violations, changed[result.path]
+                    )
+                if baseline is not None:
+                    baseline.filter(result, stdin_source)
+                elif new_baseline is not None:
+                    new_baseline.add(result, stdin_source)
+
+                exit_code = max(exit_code, result.exit_code)
+                if args.quiet and result.violations:
+                    del result.violations[1:]
+                    writer.write_result(result)
+                    break
+                writer.write_result(result)
+
+    if new_baseline is not None:
+        new_baseline.save(args.write_baseline)
+        print(
+            f"Wrote {len(new_baseline)} violations to {args.write_baseline}",
+            file=sys.stderr,
+        )
+    if cache and cache_misses:
+        cache.prune()
+        tree_cache.prune()
+        if import_cache:
+            import_cache.prune()
+    if report:
+        report.print_summary(sys.stderr)
+        if args.profile_output:
+            with open(args.profile_output, "w") as file:
+                json.dump(report.to_dict(), file, indent=2)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
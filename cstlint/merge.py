@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+from contextlib import nullcontext
+from itertools import groupby
+from operator import itemgetter
+from typing import Optional, Sequence
+
+from cstlint.runner import FileResult
+from cstlint.sharding import format_shard
+from cstlint.sharding import parse_shard
+from cstlint.statistics import Statistics
+from cstlint.style_violation import StyleViolation
+from cstlint.writers import JSON_REPORT_VERSION
+from cstlint.writers import STATISTICS_REPORT_KIND
+from cstlint.writers import STATISTICS_REPORT_VERSION
+from cstlint.writers import STATISTICS_WRITERS
+from cstlint.writers import WRITERS
+
+# Order of violations in a merged report
+SORT_KEY = itemgetter("path", "line", "column", "code")
+
+
+class MergeError(Exception):
+    pass
+
+
+def is_statistics(report: dict) -> bool:
+    return report.get("kind") == STATISTICS_REPORT_KIND
+
+
+def load_report(path: str) -> dict:
+    """Reads a report written with --format json, with or without --statistics."""
+    try:
+        with open(path, "r") as file:
+            report = json.load(file)
+    except (OSError, ValueError) as e:
+        raise MergeError(f"Can't read {path}: {e}") from None
+    if not isinstance(report, dict):
+        raise MergeError(f"{path} isn't a report of --format json")
+    if is_statistics(report):
+        if report.get("version") != STATISTICS_REPORT_VERSION or not isinstance(
+            report.get("by_file"), dict
+        ):
+            raise MergeError(
+                f"{path} isn't a version {STATISTICS_REPORT_VERSION} report of "
+                "--statistics --format json"
+            )
+    elif report.get("version") != JSON_REPORT_VERSION or not isinstance(
+        report.get("violations"), list
+    ):
+        raise MergeError(
+            f"{path} isn't a version {JSON_REPORT_VERSION} report of --format json"
+        )
+    return report
+
+
+def check_shards(reports: Sequence[dict]) -> Optional[int]:
+    """
+    Checks that the reports are the shards of a single run, all of them and
+    each once, or else unsharded reports. Returns the number of shards, or
+    None if the reports are unsharded.
+    """
+    shards = [report.get("shard") for report in reports]
+    if all(shard is None for shard in shards):
+        return None
+    if None in shards:
+        raise MergeError("Can't merge sharded and unsharded reports")
+
+    parsed = [parse_shard(shard) for shard in shards]
+    counts = {count for _, count in parsed}
+    if len(counts) > 1:
+        raise MergeError(
+            f"Reports are shards of runs with different shard counts: {sorted(counts)}"
+        )
+    [count] = counts
+    indexes = [index for index, _ in parsed]
+    duplicates = sorted({index for index in indexes if indexes.count(index) > 1})
+    if duplicates:
+        shard_names = ", ".join(format_shard((index, count)) for index in duplicates)
+        raise MergeError(f"Shards given more than once: {shard_names}")
+    missing = sorted(set(range(1, count + 1)) - set(indexes))
+    if missing:
+        shard_names = ", ".join(format_shard((index, count)) for index in missing)
+        raise MergeError(f"Missing shards: {shard_names}")
+    return count
+
+
+def merge_reports(reports: Sequence[dict]) -> list[FileResult]:
+    """The violations of all reports as FileResults, sorted by path and position."""
+    records = sorted(
+        (record for report in reports for record in report["violations"]),
+        key=SORT_KEY,
+    )
+    results = []
+    for path, file_records in groupby(records, key=itemgetter("path")):
+        result = FileResult(path=path)
+        for record in file_records:
+            result.violations.append(StyleViolation.from_dict(record))
+            if "source" in record:
+                result.lines[record["line"]] = record["source"]
+        results.append(result)
+    return results
+
+
+def merge_statistics(reports: Sequence[dict]) -> Statistics:
+    """The counts of all statistics reports, summed up."""
+    statistics = Statistics()
+    for report in reports:
+        try:
+            statistics.merge(Statistics.from_dict(report))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise MergeError(f"Malformed statistics report: {e!r}") from None
+    return statistics
+
+
+def write_statistics(statistics: Statistics, args: argparse.Namespace) -> int:
+    output = open(args.output, "w") if args.output else nullcontext(sys.stdout)
+    with output as stream:
+        with STATISTICS_WRITERS[args.format](stream) as writer:
+            writer.statistics = statistics
+    return 1 if statistics.total() else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="cstlint merge",
+        description="Combine the --format json reports of the shards of a run",
+    )
+    parser.add_argument(
+        "reports",
+        nargs="+",
+        metavar="REPORT",
+        help="Reports written by cstlint --shard K/N --format json, all with or all without --statistics",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default="json",
+        help="Output format of the merged report",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Write the merged report to FILE instead of stdout",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        reports = [load_report(path) for path in args.reports]
+        if len({is_statistics(report) for report in reports}) > 1:
+            raise MergeError("Can't merge statistics and violation reports")
+        check_shards(reports)
+        if is_statistics(reports[0]):
+            if args.format not in STATISTICS_WRITERS:
+                raise MergeError(
+                    "Statistics reports can only be merged into --format "
+                    f"{' or '.join(STATISTICS_WRITERS)}"
+                )
+            return write_statistics(merge_statistics(reports), args)
+        results = merge_reports(reports)
+    except (MergeError, ValueError) as e:
+        print(f"cstlint merge: error: {e}", file=sys.stderr)
+        return 2
+
+    with_lines = any(result.lines for result in results)
+    exit_code = 0
+    output = open(args.output, "w") if args.output else nullcontext(sys.stdout)
+    with output as stream:
+        with WRITERS[args.format](stream, with_lines=with_lines) as writer:
+            for result in results:
+                exit_code = max(exit_code, result.exit_code)
+                writer.write_result(result)
+    return exit_code
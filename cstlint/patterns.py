@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from operator import attrgetter, itemgetter
+from typing import Any, Optional, Sequence
+
+from cstlint.imports import ImportAliases
+
+# Rules can state what they check as patterns instead of visitor code. The
+# engine compiles the patterns of all enabled rules into one PatternTable, so
+# that matching them costs one lookup per node, and a few more per node type
+# that has patterns, however many rules there are. This module doesn't import
+# libcst: patterns refer to node types by name.
+
+# For modules that import nothing
+NO_IMPORTS = ImportAliases()
+
+
+@dataclass(frozen=True)
+class Pattern:
+    """
+    Matches libcst nodes of type `node` by the value at `path`. The value has
+    to be a Name with one of `names` as its value, or a node of one of
+    `types`, or a Name or Attribute that refers to one of `qualified_names`
+    through the module's imports, e.g. `builtins.eval`. Without any of them,
+    any value that isn't None matches. Each match is one violation with
+    `message`, reported at the node.
+
+    `path` is a dotted attribute path from the node. A `*` iterates over a
+    sequence, each of whose items can match, e.g. `params.params.*.default`
+    for the defaults of a function's parameters. The node itself is matched
+    if it's empty.
+    """
+
+    # Name of the libcst node type, e.g. "Call"
+    node: str
+    path: str = ""
+    names: Optional[frozenset[str]] = None
+    types: Optional[frozenset[str]] = None
+    qualified_names: Optional[frozenset[str]] = None
+    message: str = ""
+
+    def __post_init__(self):
+        matched = (self.names, self.types, self.qualified_names)
+        if sum(values is not None for values in matched) > 1:
+            raise ValueError("Patterns match either names, types or qualified names")
+        if "*" in self.path.split(".")[:1]:
+            raise ValueError(f"Paths can't start with *: {self.path}")
+
+
+# Resolves the values at a path: an attrgetter per run of attributes, and None
+# where the path iterates
+Steps = tuple[Optional[attrgetter], ...]
+
+
+def _compile_path(path: str) -> Steps:
+    steps = []
+    attributes = []
+    for part in path.split(".") if path else ():
+        if part == "*":
+            steps.append(attrgetter(".".join(attributes)))
+            steps.append(None)
+            attributes = []
+        else:
+            attributes.append(part)
+    if attributes:
+        steps.append(attrgetter(".".join(attributes)))
+    return tuple(steps)
+
+
+def _resolve(steps: Steps, node: Any) -> list:
+    values = [node]
+    for step in steps:
+        if step is None:
+            values = [item for value in values for item in value]
+            continue
+        resolved = []
+        for value in values:
+            try:
+                resolved.append(step(value))
+            except AttributeError:
+                # The path doesn't exist on this shape of node
+                pass
+        values = resolved
+    return values
+
+
+def dotted_name(node: Any) -> Optional[str]:
+    """`a.b.c` for libcst Name and Attribute nodes, None for any other node."""
+    type_name = type(node).__name__
+    if type_name == "Name":
+        return node.value
+    if type_name == "Attribute":
+        value = dotted_name(node.value)
+        return None if value is None else f"{value}.{node.attr.value}"
+    return None
+
+
+class PathMatcher:
+    """The patterns that look at the same path of the same node type."""
+
+    def __init__(self, steps: Steps):
+        self.steps = steps
+        # Matches as (order, rule index, message), by what they match
+        self.by_name: dict[str, list[tuple]] = {}
+        self.by_type: dict[str, list[tuple]] = {}
+        self.by_qualified_name: dict[str, list[tuple]] = {}
+        self.always: list[tuple] = []
+
+    def add(self, pattern: Pattern, match: tuple) -> None:
+        if pattern.names is not None:
+            for name in pattern.names:
+                self.by_name.setdefault(name, []).append(match)
+        elif pattern.types is not None:
+            for type_name in pattern.types:
+                self.by_type.setdefault(type_name, []).append(match)
+        elif pattern.qualified_names is not None:
+            for name in pattern.qualified_names:
+                self.by_qualified_name.setdefault(name, []).append(match)
+        else:
+            self.always.append(match)
+
+    def matches(self, node: Any, imports: ImportAliases) -> list[tuple]:
+        found = []
+        for value in _resolve(self.steps, node):
+            if value is None:
+                continue
+            found.extend(self.always)
+            type_name = type(value).__name__
+            found.extend(self.by_type.get(type_name, ()))
+            if type_name == "Name":
+                found.extend(self.by_name.get(value.value, ()))
+            if self.by_qualified_name:
+                name = dotted_name(value)
+                if name is not None:
+                    qualified_name = imports.qualified_name(name)
+                    found.extend(self.by_qualified_name.get(qualified_name, ()))
+        return found
+
+
+class PatternTable:
+    """
+    The patterns of several rules, compiled into PathMatchers by node type.
+    Patterns on the same path share a dict from names or types to the
+    patterns matching them, so the name sets of all rules are merged into
+    one lookup.
+    """
+
+    def __init__(self, rules: Sequence[Sequence[Pattern]]):
+        self.matchers: dict[str, list[PathMatcher]] = {}
+        paths: dict[tuple[str, str], PathMatcher] = {}
+        order = 0
+        for rule_index, patterns in enumerate(rules):
+            for pattern in patterns:
+                key = (pattern.node, pattern.path)
+                matcher = paths.get(key)
+                if matcher is None:
+                    matcher = paths[key] = PathMatcher(_compile_path(pattern.path))
+                    self.matchers.setdefault(pattern.node, []).append(matcher)
+                matcher.add(pattern, (order, rule_index, pattern.message))
+                order += 1
+
+    def match(
+        self,
+        node: Any,
+        matchers: Sequence[PathMatcher],
+        imports: ImportAliases = NO_IMPORTS,
+    ) -> list[tuple]:
+        """
+        (rule index, message) of every match of `node`, which `matchers` are
+        the node type's, in the order of the rules and their patterns.
+        `imports` are the module's, for patterns on qualified names.
+        """
+        found = []
+        for matcher in matchers:
+            found.extend(matcher.matches(node, imports))
+        if len(found) > 1:
+            found.sort(key=itemgetter(0))
+        return [(rule_index, message) for _, rule_index, message in found]
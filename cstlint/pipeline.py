@@ -0,0 +1,186 @@
+import mmap
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence, TextIO, Union
+
+# Files at least this large are memory-mapped rather than read into a bytes
+# object, which saves a copy of them
+MMAP_THRESHOLD = 1024 * 1024
+# Reads in flight at once. Reads release the GIL, and on network file systems
+# most of their time is spent waiting.
+READ_THREADS = 8
+# How long a blocked prefetcher waits before checking whether it was closed
+CLOSE_POLL_INTERVAL = 0.1
+# Writes a QueuedStream holds before write() blocks
+OUTPUT_QUEUE_SIZE = 256
+
+# The content of a file: bytes, or for large files a read-only mmap, which
+# supports the same buffer protocol, slicing and find()
+FileData = Union[bytes, mmap.mmap]
+
+
+def read_file(path: str) -> FileData:
+    """The content of `path`. Raises OSError if it can't be read."""
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return file.read()
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # Start reading the whole file ahead of decoding it
+        mapped.madvise(mmap.MADV_WILLNEED)
+    except (AttributeError, OSError):
+        pass
+    return mapped
+
+
+def release_file(data: FileData) -> None:
+    """Unmaps `data` if it's an mmap, rather than waiting for it to be collected."""
+    if isinstance(data, mmap.mmap):
+        data.close()
+
+
+def prefetch_file(path: str) -> Optional[bytes]:
+    """
+    The content of `path` if it's small enough to send to a worker process,
+    else None, in which case the worker reads it itself. The OS is asked to
+    read large files into its cache meanwhile. Files that can't be read are
+    None as well, so that the worker reports the error.
+    """
+    try:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                return file.read()
+            try:
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            except (AttributeError, OSError):
+                pass
+    except OSError:
+        pass
+    return None
+
+
+class Prefetcher:
+    """
+    Reads files ahead of the files being linted, in a thread pool, so that
+    waiting for the disk overlaps with linting.
+
+    Iterating yields (path, content or error) in the order of `paths`, the
+    content as returned by `read`. Each file read holds one of `window` slots
+    until release() is called for it, so no more than `window` files are held
+    in memory however far behind linting falls.
+
+    The iterator can run in another thread than the one calling release(),
+    e.g. in a multiprocessing pool's task feeder. It must then be closed with
+    close() when the results stop being consumed, so that it doesn't wait for
+    slots forever.
+    """
+
+    def __init__(self, paths: Sequence[str], window: int, read=read_file):
+        self.paths = paths
+        self.window = max(window, 2)
+        self.read = read
+        self._slots = threading.Semaphore(self.window)
+        self._closed = False
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def close(self) -> None:
+        self._closed = True
+        self._slots.release(self.window)
+
+    def _read(self, path: str):
+        try:
+            return path, self.read(path)
+        except OSError as e:
+            return path, e
+
+    def __iter__(self) -> Iterator[tuple]:
+        pending = deque()
+        executor = ThreadPoolExecutor(READ_THREADS, thread_name_prefix="cstlint-read")
+        try:
+            for path in self.paths:
+                # Hand out what's been read while waiting for a slot. With
+                # nothing left to hand out, the slots are all held by files
+                # being linted, so wait for one of them to be done.
+                while True:
+                    if pending:
+                        acquired = self._slots.acquire(blocking=False)
+                    else:
+                        acquired = self._slots.acquire(timeout=CLOSE_POLL_INTERVAL)
+                    if self._closed:
+                        return
+                    if acquired:
+                        break
+                    if pending:
+                        yield pending.popleft().result()
+                pending.append(executor.submit(self._read, path))
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class QueuedStream:
+    """
+    Writes to `stream` from a background thread, so that a slow stream, e.g. a
+    pipe to a slow reader or a file on a network file system, doesn't hold up
+    linting. Errors writing are raised by the next call after them. close()
+    waits for everything to be written, but doesn't close `stream`.
+    """
+
+    def __init__(self, stream: TextIO, max_pending: int = OUTPUT_QUEUE_SIZE):
+        self.stream = stream
+        self._queue = queue.Queue(max_pending)
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(
+            target=self._drain, name="cstlint-write", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "QueuedStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _drain(self) -> None:
+        while True:
+            text = self._queue.get()
+            try:
+                if text is None:
+                    return
+                if self._error is None:
+                    self.stream.write(text)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, text: str) -> int:
+        self._raise_error()
+        self._queue.put(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self._queue.join()
+        self._raise_error()
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
@@ -0,0 +1,218 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import ContextManager, Iterable, Iterator, Optional, TextIO
+
+# Nothing in here runs unless profiling was asked for: callers pass profile=None
+# otherwise and every hook is skipped before it does any work.
+
+
+@dataclass
+class Timing:
+    # Time spent in the measured code itself, excluding measurements nested in
+    # it, so that the phases and rules of a file add up to its total.
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+    # Peak bytes allocated above the starting point, when tracemalloc is on
+    peak_memory: Optional[int] = None
+
+    def add(self, other: "Timing") -> None:
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.calls += other.calls
+        if other.peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, other.peak_memory)
+
+    def to_dict(self) -> dict:
+        return {
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "calls": self.calls,
+            "peak_memory": self.peak_memory,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Timing":
+        return cls(**data)
+
+
+@dataclass
+class _Frame:
+    wall: float
+    cpu: float
+    memory: int
+    child_wall: float = 0.0
+    child_cpu: float = 0.0
+    # Peak reached before a nested measurement reset tracemalloc's peak
+    lost_peak: int = 0
+
+
+@dataclass
+class FileProfile:
+    path: str
+    # Wall/CPU time of the whole file, including everything nested
+    total: Timing = field(default_factory=Timing)
+    # read, decode, cache, prefilter, parse, imports, index, traverse, metadata
+    phases: dict[str, Timing] = field(default_factory=dict)
+    # Keyed by rule name. calls is the number of nodes handed to the rule.
+    rules: dict[str, Timing] = field(default_factory=dict)
+    nodes: int = 0
+    _frames: list[_Frame] = field(default_factory=list, repr=False)
+
+    @contextmanager
+    def measure(
+        self,
+        timings: dict[str, Timing],
+        name: str,
+        inclusive: bool = False,
+        calls: int = 1,
+    ) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        memory = 0
+        if tracing:
+            memory, peak = tracemalloc.get_traced_memory()
+            if self._frames:
+                parent = self._frames[-1]
+                parent.lost_peak = max(parent.lost_peak, peak)
+            tracemalloc.reset_peak()
+        frame = _Frame(time.perf_counter(), time.process_time(), memory)
+        self._frames.append(frame)
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - frame.wall
+            cpu = time.process_time() - frame.cpu
+            self._frames.pop()
+            if self._frames:
+                self._frames[-1].child_wall += wall
+                self._frames[-1].child_cpu += cpu
+
+            timing = timings.setdefault(name, Timing())
+            timing.wall += wall if inclusive else wall - frame.child_wall
+            timing.cpu += cpu if inclusive else cpu - frame.child_cpu
+            timing.calls += calls
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], frame.lost_peak)
+                timing.peak_memory = max(timing.peak_memory or 0, peak - frame.memory)
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self.measure(self.phases, name)
+
+    def rule(self, name: str, calls: int = 1) -> ContextManager[None]:
+        return self.measure(self.rules, name, calls=calls)
+
+    def measure_total(self) -> ContextManager[None]:
+        return self.measure({"total": self.total}, "total", inclusive=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "total": self.total.to_dict(),
+            "phases": {name: t.to_dict() for name, t in self.phases.items()},
+            "rules": {name: t.to_dict() for name, t in self.rules.items()},
+            "nodes": self.nodes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FileProfile":
+        return cls(
+            path=data["path"],
+            total=Timing.from_dict(data["total"]),
+            phases={k: Timing.from_dict(v) for k, v in data["phases"].items()},
+            rules={k: Timing.from_dict(v) for k, v in data["rules"].items()},
+            nodes=data["nodes"],
+        )
+
+
+def profile_phase(profile: Optional[FileProfile], name: str) -> ContextManager:
+    if profile is None:
+        return nullcontext()
+    return profile.phase(name)
+
+
+class ProfileReport:
+    """Totals over the FileProfiles of a run."""
+
+    def __init__(self):
+        self.files: list[FileProfile] = []
+        self.total = Timing()
+        self.phases: dict[str, Timing] = {}
+        self.rules: dict[str, Timing] = {}
+        self.nodes = 0
+
+    def add(self, profile: FileProfile) -> None:
+        self.files.append(profile)
+        self.total.add(profile.total)
+        self.nodes += profile.nodes
+        for totals, timings in (
+            (self.phases, profile.phases),
+            (self.rules, profile.rules),
+        ):
+            for name, timing in timings.items():
+                totals.setdefault(name, Timing()).add(timing)
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total.to_dict(),
+            "phases": {name: t.to_dict() for name, t in self.phases.items()},
+            "rules": {name: t.to_dict() for name, t in self.rules.items()},
+            "nodes": self.nodes,
+            "files": [profile.to_dict() for profile in self.files],
+        }
+
+    def print_summary(self, file: TextIO, top: int = 10) -> None:
+        print(
+            f"Profile: {len(self.files)} files, {self.nodes} nodes, "
+            f"{self.total.wall:.3f}s wall, {self.total.cpu:.3f}s CPU",
+            file=file,
+        )
+        _print_table("Phase", "calls", _rows(self.phases), file, top)
+        # For rules, calls is the number of nodes handed to the rule
+        _print_table("Rule", "nodes", _rows(self.rules), file, top)
+        by_file = [
+            (profile.path, profile.total, profile.nodes) for profile in self.files
+        ]
+        _print_table("File", "nodes", by_file, file, top)
+
+
+def _rows(timings: dict[str, Timing]) -> list[tuple[str, Timing, int]]:
+    return [(name, timing, timing.calls) for name, timing in timings.items()]
+
+
+def _format_memory(peak_memory: Optional[int]) -> str:
+    if peak_memory is None:
+        return "-"
+    return f"{peak_memory / 1024:.0f}KiB"
+
+
+def _print_table(
+    title: str,
+    count_title: str,
+    rows: Iterable[tuple[str, Timing, int]],
+    file: TextIO,
+    top: int,
+) -> None:
+    rows = sorted(rows, key=_wall_of_row, reverse=True)
+    if not rows:
+        return
+    width = max(len(title), *(len(row[0]) for row in rows[:top]))
+    print(file=file)
+    print(
+        f"{title:<{width}}  {'wall':>9}  {'cpu':>9}  {count_title:>8}  "
+        f"{'peak mem':>10}",
+        file=file,
+    )
+    for name, timing, count in rows[:top]:
+        print(
+            f"{name:<{width}}  {timing.wall:>8.4f}s  {timing.cpu:>8.4f}s  "
+            f"{count:>8}  {_format_memory(timing.peak_memory):>10}",
+            file=file,
+        )
+    if len(rows) > top:
+        print(f"... {len(rows) - top} more", file=file)
+
+
+def _wall_of_row(row: tuple[str, Timing, int]) -> float:
+    return row[1].wall
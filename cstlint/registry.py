@@ -0,0 +1,113 @@
+import importlib
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class RuleSpec:
+    """
+    What is known about a rule without importing it.
+
+    Importing any rule imports libcst, which takes longer than linting a
+    typical file. Rules are therefore referred to by error code until a file
+    actually has to be parsed, and only the enabled ones are ever imported.
+    """
+
+    code: str
+    # module:ClassName of the StyleViolationsVisitor
+    path: str
+    # Must match the rule's TRIGGERS, so files can be skipped before loading it
+    triggers: Optional[tuple[str, ...]] = None
+    # Must match the rule's MODULE_WIDE. Such rules are never run on parts of
+    # a module, see runner.LintOptions.split_threshold
+    module_wide: bool = False
+    # Must match the rule's IMPORTS: qualified names of what it looks for,
+    # which modules can import under other names, see cstlint.imports
+    imports: tuple[str, ...] = ()
+
+    def may_match(self, source_code: str, extra_triggers: Sequence[str] = ()) -> bool:
+        if self.triggers is None:
+            return True
+        return any(trigger in source_code for trigger in self.triggers) or any(
+            trigger in source_code for trigger in extra_triggers
+        )
+
+    def load(self) -> type:
+        module_name, class_name = self.path.split(":")
+        return vars(importlib.import_module(module_name))[class_name]
+
+
+RULES = {
+    spec.code: spec
+    for spec in (
+        RuleSpec(
+            "S1001",
+            "cstlint.visitors:DangerousFunctionVisitor",
+            ("eval", "exec", "getattr", "setattr"),
+            imports=(
+                "builtins.eval",
+                "builtins.exec",
+                "builtins.getattr",
+                "builtins.setattr",
+            ),
+        ),
+        RuleSpec("S1002", "cstlint.visitors:NestedFunctionVisitor", ("def",)),
+        RuleSpec("S1003", "cstlint.visitors:LambdaVisitor", ("lambda",)),
+        RuleSpec("S1004", "cstlint.visitors:FunctionArgAssignVisitor", ("def",)),
+        RuleSpec(
+            "S1005",
+            "cstlint.visitors:AttrDecoratorVisitor",
+            ("attr",),
+            imports=("attr.s",),
+        ),
+        RuleSpec("S1006", "cstlint.visitors:MutableDefaultArgVisitor", ("def",)),
+    )
+}
+# Order matters: violations are reported grouped by rule in this order.
+DEFAULT_RULE_CODES = tuple(RULES)
+
+
+def select_rules(
+    select: Sequence[str] = (), ignore: Sequence[str] = ()
+) -> tuple[str, ...]:
+    """
+    Codes of the rules starting with any of the prefixes in `select` (all
+    rules if empty) and none of those in `ignore`.
+    """
+    for prefix in (*select, *ignore):
+        if not any(code.startswith(prefix) for code in RULES):
+            raise ValueError(f"No rule matches {prefix}")
+    return tuple(
+        code
+        for code in DEFAULT_RULE_CODES
+        if (not select or code.startswith(tuple(select)))
+        and not code.startswith(tuple(ignore))
+    )
+
+
+def rules_for_source(
+    source_code: str,
+    codes: Sequence[str],
+    triggers: Optional[Mapping[str, Sequence[str]]] = None,
+) -> list[str]:
+    """
+    Like engine.rules_for_source, without importing the rules. `triggers` are
+    more triggers by code, e.g. names the module imports rules' IMPORTS as.
+    """
+    triggers = triggers or {}
+    return [
+        code
+        for code in codes
+        if RULES[code].may_match(source_code, triggers.get(code, ()))
+    ]
+
+
+def split_rules(codes: Sequence[str]) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """The codes of rules that can run on parts of a module, and of the others."""
+    local = tuple(code for code in codes if not RULES[code].module_wide)
+    module_wide = tuple(code for code in codes if RULES[code].module_wide)
+    return local, module_wide
+
+
+def load_rules(codes: Sequence[str]) -> tuple[type, ...]:
+    return tuple(RULES[code].load() for code in codes)
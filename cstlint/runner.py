@@ -0,0 +1,629 @@
+import codecs
+import io
+import os
+import tokenize
+import traceback
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from functools import partial
+from multiprocessing import Pool
+from typing import Callable, Iterator, Optional, Sequence
+
+from cstlint.backends import BACKENDS
+from cstlint.backends import DEFAULT_BACKEND
+from cstlint.cache import ResultCache
+from cstlint.chunks import merge_chunks
+from cstlint.chunks import split_module
+from cstlint.files import expand_paths
+from cstlint.imports import ModuleImports
+from cstlint.imports import ProjectImports
+from cstlint.imports import chunk_bindings
+from cstlint.pipeline import FileData
+from cstlint.pipeline import Prefetcher
+from cstlint.pipeline import prefetch_file
+from cstlint.pipeline import read_file
+from cstlint.pipeline import release_file
+from cstlint.profiling import FileProfile
+from cstlint.profiling import profile_phase
+from cstlint.registry import DEFAULT_RULE_CODES
+from cstlint.registry import RULES
+from cstlint.registry import load_rules
+from cstlint.registry import rules_for_source
+from cstlint.registry import split_rules
+from cstlint.statistics import Statistics
+from cstlint.statistics import count_violations
+from cstlint.style_violation import StyleViolation
+from cstlint.suppression import has_noqa
+from cstlint.suppression import suppress_noqa
+from cstlint.tree_cache import TreeCache
+from cstlint.violation_error_codes import ViolationErrorCode
+
+
+# Files read ahead of the ones being linted, see Prefetcher
+PREFETCH_FILES = 64
+# Chunk size limit for pools fed by a Prefetcher, which has to hold every file
+# of the chunks being linted
+MAX_PREFETCH_CHUNK = 16
+# Modules linted in parts are split into this many parts per job, so that
+# parts that take longer than others even out
+SPLIT_PARTS_PER_JOB = 4
+# Upper bound on the lines of each part, which bounds the memory of parsing it
+MAX_SPLIT_PART_LINES = 20000
+
+
+@dataclass(frozen=True)
+class LintOptions:
+    # Error codes of the enabled rules, see cstlint.registry
+    rules: tuple[str, ...] = DEFAULT_RULE_CODES
+    backend: str = DEFAULT_BACKEND
+    # Collect the source of violating lines into FileResult.lines
+    with_lines: bool = False
+    cache: Optional[ResultCache] = None
+    # Parsed trees, reused when results can't be, e.g. after rule changes
+    tree_cache: Optional[TreeCache] = None
+    # Attach a FileProfile with per-phase and per-rule timings to every result
+    profile: bool = False
+    # Also record peak memory in profiles. Slows linting down noticeably.
+    profile_memory: bool = False
+    # Limits for supervised runs, see cstlint.supervisor. Setting any of them
+    # lints every file in a worker process that is killed when it exceeds them.
+    # Wall time in seconds per file
+    timeout: Optional[float] = None
+    # Resident memory in bytes per worker
+    max_memory: Optional[int] = None
+    # Files a worker lints before it's replaced by a fresh process
+    max_files_per_worker: Optional[int] = None
+    # Modules of at least this many lines are split at top-level statements,
+    # and the parts are linted in parallel, with every job. Rules that are
+    # MODULE_WIDE still lint the whole module. Profiled and supervised runs
+    # don't split modules.
+    split_threshold: Optional[int] = None
+    # What the modules of the project import from each other, so that rules
+    # find names that are imported from modules re-exporting them, see
+    # imports.build_import_index. Names imported from outside the project are
+    # resolved either way.
+    imports: Optional[ProjectImports] = None
+
+    @property
+    def supervised(self) -> bool:
+        return (
+            self.timeout is not None
+            or self.max_memory is not None
+            or self.max_files_per_worker is not None
+        )
+
+
+@dataclass
+class FileResult:
+    path: str
+    violations: list[StyleViolation] = field(default_factory=list)
+    # Source lines of violating lines, keyed by line number. Only filled in
+    # when the caller asks for them (e.g. --verbose).
+    lines: dict[int, str] = field(default_factory=dict)
+    # True if the violations came from the result cache
+    cached: bool = False
+    profile: Optional[FileProfile] = None
+
+    @property
+    def exit_code(self) -> int:
+        return 1 if self.violations else 0
+
+    def collect_lines(self, source_code: str) -> None:
+        code_lines = source_code.split("\n")
+        for violation in self.violations:
+            line_number = violation.line_number
+            self.lines[line_number] = code_lines[line_number - 1]
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "violations": [violation.to_dict() for violation in self.violations],
+            "lines": {str(line): text for line, text in self.lines.items()},
+            "cached": self.cached,
+            "profile": self.profile.to_dict() if self.profile else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FileResult":
+        return cls(
+            path=data["path"],
+            violations=[StyleViolation.from_dict(v) for v in data["violations"]],
+            lines={int(line): text for line, text in data["lines"].items()},
+            cached=data["cached"],
+            profile=(
+                FileProfile.from_dict(data["profile"]) if data.get("profile") else None
+            ),
+        )
+
+
+def _error_violation(
+    error_code: ViolationErrorCode, message: str, line: int = 1, column: int = 0
+) -> StyleViolation:
+    return StyleViolation(error_code, line, column, line, column, message)
+
+
+def _first_two_lines(data: FileData) -> bytes:
+    end = data.find(b"\n")
+    if end != -1:
+        end = data.find(b"\n", end + 1)
+    return data[:] if end == -1 else data[:end]
+
+
+def decode_source(data: FileData) -> str:
+    """
+    Decodes source like the interpreter does: as UTF-8, unless there's a BOM
+    or a coding cookie in the first two lines. Raises UnicodeError if it can't
+    be decoded.
+    """
+    encoding = "utf-8"
+    if data[:3] == codecs.BOM_UTF8 or b"coding" in _first_two_lines(data):
+        readline = io.BytesIO(_first_two_lines(data)).readline
+        try:
+            encoding, _ = tokenize.detect_encoding(readline)
+        except SyntaxError as e:
+            raise UnicodeError(str(e)) from None
+    # Same newline handling as reading the file in text mode
+    return str(data, encoding).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _lint_source_code(
+    source_code: str,
+    options: LintOptions,
+    profile: Optional[FileProfile] = None,
+    counts: Optional[Counter] = None,
+    imports: Optional[ModuleImports] = None,
+) -> list[StyleViolation]:
+    # With `counts`, the rules count their violations into it rather than
+    # returning them. Problems with the file are still returned.
+    # Checked here as well as by the backends, so that files no rule could
+    # match don't even import the rules
+    with profile_phase(profile, "prefilter"):
+        codes = rules_for_source(
+            source_code, options.rules, imports and imports.triggers
+        )
+    if not codes:
+        return []
+
+    try:
+        violations = BACKENDS[options.backend].lint(
+            source_code,
+            load_rules(codes),
+            profile,
+            options.tree_cache,
+            counts,
+            imports,
+        )
+    except SyntaxError as e:
+        return [
+            _error_violation(
+                ViolationErrorCode.SYNTAX_ERROR,
+                e.msg,
+                e.lineno or 1,
+                max((e.offset or 1) - 1, 0),
+            )
+        ]
+    except Exception as e:
+        # A rule tripping over an unexpected construct only fails that file
+        return [_crash_violation(e)]
+
+    with profile_phase(profile, "noqa"):
+        return suppress_noqa(source_code, violations)
+
+
+def _crash_violation(error: Exception) -> StyleViolation:
+    message = f"{type(error).__name__}: {error}"
+    frames = traceback.extract_tb(error.__traceback__)
+    if frames:
+        message += f" ({os.path.basename(frames[-1].filename)}:{frames[-1].lineno})"
+    return _error_violation(ViolationErrorCode.LINT_CRASH, message)
+
+
+def preload(options: LintOptions) -> None:
+    """Import the backend and rules `options` lint with, which lint_* do lazily."""
+    BACKENDS[options.backend].preload()
+    load_rules(options.rules)
+
+
+def lint_file(path: str, options: LintOptions = LintOptions()) -> FileResult:
+    if options.profile:
+        return _profiled(_lint_file, path, options)
+    return _lint_file(path, options)
+
+
+def _lint_file(
+    path: str, options: LintOptions, profile: Optional[FileProfile] = None
+) -> FileResult:
+    try:
+        with profile_phase(profile, "read"):
+            data = read_file(path)
+    except OSError as e:
+        return _read_error(path, e)
+
+    try:
+        return _lint_data(path, data, options, profile)
+    finally:
+        release_file(data)
+
+
+def _read_error(path: str, error: OSError) -> FileResult:
+    violation = _error_violation(ViolationErrorCode.READ_ERROR, str(error))
+    return FileResult(path=path, violations=[violation])
+
+
+def lint_data(
+    path: str, data: FileData, options: LintOptions = LintOptions()
+) -> FileResult:
+    if options.profile:
+        return _profiled(_lint_data, path, options, data)
+    return _lint_data(path, data, options)
+
+
+def lint_source_code(
+    source_code: str,
+    options: LintOptions = LintOptions(),
+    imports: Optional[ModuleImports] = None,
+) -> list[StyleViolation]:
+    """
+    Lint source code that's already decoded, without the result cache.
+    `imports` are what's known about its imports, e.g. when it's part of a
+    module.
+    """
+    return _lint_source_code(source_code, options, imports=imports)
+
+
+def _profiled(lint_function, path: str, options: LintOptions, *args) -> FileResult:
+    if options.profile_memory and not tracemalloc.is_tracing():
+        # Started once per process and left on, so that pool workers trace too
+        tracemalloc.start()
+    profile = FileProfile(path)
+    with profile.measure_total():
+        result = lint_function(path, *args, options, profile)
+    result.profile = profile
+    return result
+
+
+def _lint_data(
+    path: str,
+    data: FileData,
+    options: LintOptions,
+    profile: Optional[FileProfile] = None,
+    lint_source: Callable = _lint_source_code,
+) -> FileResult:
+    cache = options.cache
+    imports = ModuleImports.for_path(path, options.imports)
+    with profile_phase(profile, "cache"):
+        key = cache.key(data, _cache_context(imports)) if cache else None
+        violations = cache.get(key) if cache else None
+    result = FileResult(path=path, cached=violations is not None)
+    source_code = None
+
+    if violations is None:
+        try:
+            with profile_phase(profile, "decode"):
+                source_code = decode_source(data)
+        except UnicodeError as e:
+            error = _error_violation(ViolationErrorCode.READ_ERROR, str(e))
+            return FileResult(path=path, violations=[error])
+
+        violations = lint_source(source_code, options, profile, imports=imports)
+        crashed = any(
+            violation.error_code is ViolationErrorCode.LINT_CRASH
+            for violation in violations
+        )
+        # Crashes can come down to the environment, e.g. a MemoryError or a
+        # RecursionError, so they're retried rather than cached
+        if cache and not crashed:
+            with profile_phase(profile, "cache"):
+                cache.set(key, violations)
+
+    result.violations = violations
+    if options.with_lines and violations:
+        if source_code is None:
+            source_code = decode_source(data)
+        result.collect_lines(source_code)
+    return result
+
+
+def _cache_context(imports: Optional[ModuleImports]) -> str:
+    return imports.cache_context if imports is not None else ""
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def chunk_size(num_files: int, jobs: int) -> int:
+    # A few chunks per worker keeps IPC overhead low while still balancing
+    # out files that take much longer than average.
+    return max(1, num_files // (jobs * 4))
+
+
+def _lint_prefetched(task: tuple, options: LintOptions) -> FileResult:
+    path, data = task
+    if data is None:
+        # Large or unreadable, see prefetch_file
+        return lint_file(path, options)
+    return lint_data(path, data, options)
+
+
+def _lint_part(
+    task: tuple, options: LintOptions, imports: Optional[ModuleImports] = None
+) -> list[StyleViolation]:
+    start_line, source_code, rules = task
+    violations = _lint_source_code(
+        source_code, replace(options, rules=rules), imports=imports
+    )
+    return [violation.shifted(start_line - 1) for violation in violations]
+
+
+def _rule_index(order: dict, violation: StyleViolation) -> int:
+    return order[violation.error_code.error_code]
+
+
+def _lint_split_source(
+    source_code: str,
+    options: LintOptions,
+    profile: Optional[FileProfile] = None,
+    pool: Optional[Pool] = None,
+    jobs: int = 1,
+    imports: Optional[ModuleImports] = None,
+) -> list[StyleViolation]:
+    # Lints `source_code` in parts if it's long enough, with the same results
+    # as linting it whole
+    num_lines = source_code.count("\n") + 1
+    if num_lines < options.split_threshold:
+        return _lint_source_code(source_code, options, profile, imports=imports)
+
+    local, module_wide = split_rules(
+        rules_for_source(source_code, options.rules, imports and imports.triggers)
+    )
+    tasks = [(1, source_code, module_wide)] if module_wide else []
+    part_imports = imports
+    if local:
+        chunks = split_module(source_code)
+        if any(RULES[code].imports for code in local):
+            # Most of a module's imports are in parts other than the ones
+            # using them
+            part_imports = (imports or ModuleImports()).with_bindings(
+                chunk_bindings(chunk.text for chunk in chunks)
+            )
+        part_lines = min(
+            max(num_lines // (jobs * SPLIT_PARTS_PER_JOB), 1), MAX_SPLIT_PART_LINES
+        )
+        tasks.extend(
+            (part.start_line, part.text, local)
+            for part in merge_chunks(chunks, part_lines)
+        )
+    # Parts are in memory already, and their trees aren't worth caching
+    part_options = replace(options, cache=None, tree_cache=None, with_lines=False)
+    lint_part = partial(_lint_part, options=part_options, imports=part_imports)
+    violations = []
+    for part_violations in (
+        map(lint_part, tasks) if pool is None else pool.imap(lint_part, tasks)
+    ):
+        if any(violation.error_code.is_file_error for violation in part_violations):
+            # Where a whole-file run reports a syntax error depends on all of
+            # the module, and a crash fails all of it
+            return _lint_source_code(source_code, options, profile, imports=imports)
+        violations.extend(part_violations)
+    # Grouped by rule like whole-file results, each group is in order already
+    order = {code: index for index, code in enumerate(options.rules)}
+    violations.sort(key=partial(_rule_index, order))
+    return violations
+
+
+def _lint_files_split(
+    paths: Sequence[str], jobs: int, options: LintOptions
+) -> Iterator[FileResult]:
+    # A module has at most as many lines as bytes, so only files at least
+    # split_threshold bytes long are read to find out whether to split them.
+    # Those are linted first, one at a time with every job, then the rest as
+    # usual.
+    candidates = [
+        path
+        for path in dict.fromkeys(paths)
+        if _file_size(path) >= options.split_threshold
+    ]
+    large = {}
+    pool = Pool(processes=jobs) if jobs > 1 and candidates else None
+    try:
+        lint_source = partial(_lint_split_source, pool=pool, jobs=jobs)
+        for path in candidates:
+            try:
+                data = read_file(path)
+            except OSError as e:
+                large[path] = _read_error(path, e)
+                continue
+            try:
+                large[path] = _lint_data(path, data, options, None, lint_source)
+            finally:
+                release_file(data)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    others = lint_files(
+        [path for path in paths if path not in large],
+        jobs,
+        replace(options, split_threshold=None),
+    )
+    for path in paths:
+        yield large[path] if path in large else next(others)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def lint_files(
+    paths: Sequence[str], jobs: int = 1, options: LintOptions = LintOptions()
+) -> Iterator[FileResult]:
+    """
+    Lint `paths`, yielding one FileResult per path in the same order as `paths`.
+
+    With jobs > 1 the files are linted in a process pool, since parsing is CPU
+    bound and holds the GIL. Supervised runs always lint in worker processes.
+
+    Files are read ahead by a Prefetcher while others are linted, and a
+    bounded number of them are held until their results are consumed. In a
+    pool, they're read by the parent and sent to the workers, except for large
+    files, which workers map themselves. Profiled runs read each file as it's
+    linted, so that reads are timed.
+    """
+    if options.supervised and paths:
+        from cstlint.supervisor import lint_files_supervised
+
+        yield from lint_files_supervised(paths, jobs, options)
+        return
+    if options.split_threshold is not None and not options.profile:
+        yield from _lint_files_split(paths, jobs, options)
+        return
+
+    jobs = min(jobs, len(paths))
+    if jobs <= 1 and options.profile:
+        for path in paths:
+            yield lint_file(path, options)
+        return
+
+    if jobs <= 1:
+        prefetcher = Prefetcher(paths, PREFETCH_FILES)
+        for path, data in prefetcher:
+            if isinstance(data, OSError):
+                result = _read_error(path, data)
+            else:
+                result = lint_data(path, data, options)
+                release_file(data)
+            prefetcher.release()
+            yield result
+        return
+
+    if options.profile:
+        tasks = [(path, None) for path in paths]
+        chunks = chunk_size(len(paths), jobs)
+        prefetcher = None
+    else:
+        # Pool.imap only sends full chunks, which have to fit in the window
+        chunks = min(chunk_size(len(paths), jobs), MAX_PREFETCH_CHUNK)
+        prefetcher = Prefetcher(
+            paths, PREFETCH_FILES + 2 * jobs * chunks, read=prefetch_file
+        )
+        tasks = prefetcher
+    with Pool(processes=jobs) as pool:
+        try:
+            for result in pool.imap(
+                partial(_lint_prefetched, options=options), tasks, chunks
+            ):
+                if prefetcher is not None:
+                    prefetcher.release()
+                yield result
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+
+
+def iter_violations(
+    paths: Sequence[str], jobs: int = 1, options: LintOptions = LintOptions()
+) -> Iterator[tuple[str, StyleViolation]]:
+    """
+    Lint files and directories, yielding (path, violation) pairs as soon as
+    each file is done. Files are reported in the order expand_paths() returns
+    them, violations within a file in rule order.
+    """
+    for result in lint_files(expand_paths(paths), jobs, options):
+        for violation in result.violations:
+            yield result.path, violation
+
+
+def count_file(path: str, options: LintOptions = LintOptions()) -> Counter:
+    """
+    The number of violations in `path` by error code. Unlike lint_file, no
+    StyleViolations are built and no positions computed, except for files with
+    noqa comments, which need them. Cached results are used, but new ones
+    aren't cached, since there are no violations to cache.
+    """
+    try:
+        data = read_file(path)
+    except OSError:
+        return Counter([ViolationErrorCode.READ_ERROR.error_code])
+    try:
+        return count_data(data, options, path)
+    finally:
+        release_file(data)
+
+
+def count_data(
+    data: FileData, options: LintOptions = LintOptions(), path: Optional[str] = None
+) -> Counter:
+    """
+    Like count_file, for a file's content. `path` is needed to resolve
+    relative imports with LintOptions.imports.
+    """
+    cache = options.cache
+    imports = ModuleImports.for_path(path, options.imports)
+    if cache:
+        violations = cache.get(cache.key(data, _cache_context(imports)))
+        if violations is not None:
+            return count_violations(violations)
+    try:
+        source_code = decode_source(data)
+    except UnicodeError:
+        return Counter([ViolationErrorCode.READ_ERROR.error_code])
+
+    counts = Counter()
+    if has_noqa(source_code):
+        violations = _lint_source_code(source_code, options, imports=imports)
+    else:
+        violations = _lint_source_code(
+            source_code, options, counts=counts, imports=imports
+        )
+    counts.update(count_violations(violations))
+    return counts
+
+
+def _count_files(paths: Sequence[str], options: LintOptions) -> Statistics:
+    statistics = Statistics()
+    prefetcher = Prefetcher(paths, PREFETCH_FILES)
+    for path, data in prefetcher:
+        if isinstance(data, OSError):
+            counts = Counter([ViolationErrorCode.READ_ERROR.error_code])
+        else:
+            counts = count_data(data, options, path)
+            release_file(data)
+        prefetcher.release()
+        statistics.add(path, counts)
+    return statistics
+
+
+def count_files(
+    paths: Sequence[str], jobs: int = 1, options: LintOptions = LintOptions()
+) -> Statistics:
+    """
+    Violation counts of `paths`, see count_file. With jobs > 1, each worker
+    process sums up the counts of a chunk of files, so that only one small
+    Statistics per chunk is sent back rather than a result per file.
+    Supervised runs and runs that split modules count the results of
+    lint_files instead.
+    """
+    if (options.supervised or options.split_threshold is not None) and paths:
+        statistics = Statistics()
+        for result in lint_files(paths, jobs, options):
+            statistics.add(result.path, count_violations(result.violations))
+        return statistics
+
+    jobs = min(jobs, len(paths))
+    if jobs <= 1:
+        return _count_files(paths, options)
+
+    size = chunk_size(len(paths), jobs)
+    chunks = [paths[start : start + size] for start in range(0, len(paths), size)]
+    statistics = Statistics()
+    with Pool(processes=jobs) as pool:
+        for chunk_statistics in pool.imap_unordered(
+            partial(_count_files, options=options), chunks
+        ):
+            statistics.merge(chunk_statistics)
+    return statistics
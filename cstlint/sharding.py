@@ -0,0 +1,91 @@
+import heapq
+import json
+import os
+from typing import Optional, Sequence
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parses "K/N", the K-th of N shards, counting from 1. Raises ValueError if
+    it's malformed or out of range.
+    """
+    index, _, count = value.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Expected K/N, e.g. 1/4, got {value!r}") from None
+    if not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f"Shard {value} is out of range, K must be from 1 to N")
+    return shard
+
+
+def format_shard(shard: tuple[int, int]) -> str:
+    return f"{shard[0]}/{shard[1]}"
+
+
+def load_timings(path: str) -> dict[str, float]:
+    """Wall time per file from a --profile-output report."""
+    with open(path, "r") as file:
+        report = json.load(file)
+    return {
+        os.path.normpath(profile["path"]): profile["total"]["wall"]
+        for profile in report["files"]
+    }
+
+
+def file_weights(
+    paths: Sequence[str], timings: Optional[dict[str, float]] = None
+) -> list[float]:
+    """
+    Expected cost of linting each of `paths`: the recorded time where there is
+    one, else the file size. Sizes are scaled by the seconds per byte of the
+    files with timings, so both kinds of weights can be mixed.
+    """
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.path.getsize(path))
+        except OSError:
+            sizes.append(0)
+    if not timings:
+        return [float(size) for size in sizes]
+
+    known = [
+        (timings[path], size) for path, size in zip(paths, sizes) if path in timings
+    ]
+    known_size = sum(size for _, size in known)
+    known_seconds = sum(seconds for seconds, _ in known)
+    seconds_per_byte = known_seconds / known_size if known_size else 1.0
+    return [
+        timings.get(path, size * seconds_per_byte) for path, size in zip(paths, sizes)
+    ]
+
+
+def select_shard(
+    paths: Sequence[str],
+    shard: tuple[int, int],
+    weights: Optional[Sequence[float]] = None,
+) -> list[str]:
+    """
+    The paths of the K-th of N shards, `shard` being (K, N).
+
+    Files are assigned heaviest first, each to the shard with the least weight
+    so far, ties broken by path and shard number. Every shard computes the
+    same split as long as it sees the same paths and weights, so all shards
+    must be given the same timings file, if any. Paths keep their original
+    order within a shard.
+    """
+    index, count = shard
+    if weights is None:
+        weights = file_weights(paths)
+    sort_keys = [(-weight, path) for path, weight in zip(paths, weights)]
+    order = sorted(range(len(paths)), key=sort_keys.__getitem__)
+    # (total weight, shard number) of every shard
+    loads = [(0.0, number) for number in range(1, count + 1)]
+    selected = []
+    for idx in order:
+        load, number = heapq.heappop(loads)
+        if number == index:
+            selected.append(idx)
+        heapq.heappush(loads, (load + weights[idx], number))
+    return [paths[idx] for idx in sorted(selected)]
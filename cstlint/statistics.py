@@ -0,0 +1,96 @@
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, TextIO
+
+from cstlint.style_violation import StyleViolation
+from cstlint.violation_error_codes import ViolationErrorCode
+
+
+def count_violations(violations: Iterable[StyleViolation]) -> Counter:
+    return Counter(violation.error_code.error_code for violation in violations)
+
+
+@dataclass
+class Statistics:
+    """
+    Violation counts by error code, per file, directory and overall.
+
+    Only the counts of each file are stored, the rest is summed up from them
+    on demand. Statistics of different sets of files, e.g. those linted by
+    different workers, can be merged.
+    """
+
+    # Counts by error code of the files with violations
+    files: dict[str, Counter] = field(default_factory=dict)
+    # All files that were checked, with or without violations
+    num_files: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Statistics":
+        """Reads the statistics back from to_dict()."""
+        files = {path: Counter(counts) for path, counts in data["by_file"].items()}
+        return cls(files, data["files_checked"])
+
+    def add(self, path: str, counts: Counter) -> None:
+        self.num_files += 1
+        if counts:
+            self.files.setdefault(path, Counter()).update(counts)
+
+    def merge(self, other: "Statistics") -> None:
+        self.num_files += other.num_files
+        for path, counts in other.files.items():
+            self.files.setdefault(path, Counter()).update(counts)
+
+    def by_code(self) -> Counter:
+        total = Counter()
+        for counts in self.files.values():
+            total.update(counts)
+        return total
+
+    def by_directory(self) -> dict[str, Counter]:
+        """Counts of every directory, including those of its subdirectories."""
+        directories: dict[str, Counter] = {}
+        for path, counts in self.files.items():
+            directory = os.path.dirname(path)
+            while True:
+                directories.setdefault(directory or ".", Counter()).update(counts)
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+        return directories
+
+    def total(self) -> int:
+        return sum(sum(counts.values()) for counts in self.files.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "files_checked": self.num_files,
+            "files_with_violations": len(self.files),
+            "total": self.total(),
+            "by_code": _sorted_counts(self.by_code()),
+            "by_directory": {
+                directory: _sorted_counts(counts)
+                for directory, counts in sorted(self.by_directory().items())
+            },
+            "by_file": {
+                path: _sorted_counts(counts)
+                for path, counts in sorted(self.files.items())
+            },
+        }
+
+    def print_summary(self, file: TextIO) -> None:
+        """Counts by error code, like flake8 --statistics."""
+        for code, count in sorted(self.by_code().items()):
+            message = ViolationErrorCode.from_error_code(code).error_message
+            print(f"{code}  {count:>8}  {message}", file=file)
+        print(
+            f"{self.total()} violations in {len(self.files)} of "
+            f"{self.num_files} files",
+            file=file,
+        )
+
+
+def _sorted_counts(counts: Counter) -> dict[str, int]:
+    return dict(sorted(counts.items()))
@@ -1,22 +1,162 @@
+import sys
 from dataclasses import dataclass
+from typing import Optional
 
 from cstlint.violation_error_codes import ViolationErrorCode
-from libcst._position import CodeRange
 
 
-@dataclass
+@dataclass(frozen=True)
+class CodePosition:
+    line: int
+    column: int
+
+
+@dataclass(frozen=True)
+class CodeRange:
+    # Same shape as libcst's CodeRange, so that violations can be created and
+    # read back from the cache without importing libcst
+    start: CodePosition
+    end: CodePosition
+
+    @classmethod
+    def from_positions(
+        cls, start: tuple[int, int], end: tuple[int, int]
+    ) -> "CodeRange":
+        return cls(CodePosition(*start), CodePosition(*end))
+
+
+def _restore_violation(error_code: str, *fields) -> "StyleViolation":
+    return StyleViolation(ViolationErrorCode.from_error_code(error_code), *fields)
+
+
 class StyleViolation:
-    error_code: ViolationErrorCode
-    code_range: CodeRange
-    message: str = ""
+    """
+    A violation found at a range of a file.
+
+    Full-repo runs can keep a lot of these around and send them between
+    processes, so they are kept small: positions are plain ints and the
+    message is stored as a shared template plus its arguments, only formatted
+    when it is output.
+    """
+
+    __slots__ = (
+        "error_code",
+        "line_number",
+        "column_number",
+        "end_line",
+        "end_column",
+        "message_template",
+        "message_args",
+    )
+
+    def __init__(
+        self,
+        error_code: ViolationErrorCode,
+        line_number: int = 0,
+        column_number: int = 0,
+        end_line: int = 0,
+        end_column: int = 0,
+        message_template: str = "",
+        message_args: tuple = (),
+        *,
+        code_range: Optional[CodeRange] = None,
+        message: Optional[str] = None,
+    ):
+        # Violations used to be created as StyleViolation(error_code,
+        # code_range, message), which callers outside of cstlint may still do
+        if isinstance(line_number, CodeRange):
+            code_range = line_number
+            message = column_number or message
+        if code_range is not None:
+            line_number, column_number = code_range.start.line, code_range.start.column
+            end_line, end_column = code_range.end.line, code_range.end.column
+        if message is not None:
+            message_template, message_args = message, ()
+        self.error_code = error_code
+        self.line_number = line_number
+        self.column_number = column_number
+        self.end_line = end_line
+        self.end_column = end_column
+        self.message_template = message_template
+        self.message_args = message_args
+
+    @classmethod
+    def from_code_range(
+        cls, error_code: ViolationErrorCode, code_range: CodeRange, message: str = ""
+    ) -> "StyleViolation":
+        return cls(
+            error_code,
+            code_range.start.line,
+            code_range.start.column,
+            code_range.end.line,
+            code_range.end.column,
+            message,
+        )
 
     @property
-    def column_number(self):
-        return self.code_range.start.column
+    def code_range(self) -> CodeRange:
+        return CodeRange.from_positions(
+            (self.line_number, self.column_number), (self.end_line, self.end_column)
+        )
+
+    def shifted(self, lines: int) -> "StyleViolation":
+        """The same violation, `lines` further down the file."""
+        return StyleViolation(
+            self.error_code,
+            self.line_number + lines,
+            self.column_number,
+            self.end_line + lines,
+            self.end_column,
+            self.message_template,
+            self.message_args,
+        )
 
     @property
-    def line_number(self):
-        return self.code_range.start.line
+    def message(self) -> str:
+        if not self.message_args:
+            return self.message_template
+        return self.message_template.format(*self.message_args)
+
+    def _fields(self) -> tuple:
+        return (
+            self.error_code,
+            self.line_number,
+            self.column_number,
+            self.end_line,
+            self.end_column,
+            self.message,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StyleViolation):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __repr__(self) -> str:
+        return (
+            f"StyleViolation({self.error_code.error_code}, "
+            f"{self.line_number}:{self.column_number}-"
+            f"{self.end_line}:{self.end_column}, {self.message!r})"
+        )
+
+    def __reduce__(self):
+        # The error code instead of the enum member, whose pickled value
+        # includes its whole description
+        return (
+            _restore_violation,
+            (
+                self.error_code.error_code,
+                self.line_number,
+                self.column_number,
+                self.end_line,
+                self.end_column,
+                self.message_template,
+                self.message_args,
+            ),
+        )
 
     def format(self):
         error_code = self.error_code.error_code
@@ -24,13 +164,36 @@ class StyleViolation:
         formatted_message = (
             f"{self.line_number}:{self.column_number}: {error_code}: {error_message}"
         )
-        if self.message:
-            formatted_message += f" {self.message}"
+        message = self.message
+        if message:
+            formatted_message += f" {message}"
 
         return formatted_message
 
+    def to_dict(self) -> dict:
+        return {
+            "code": self.error_code.error_code,
+            "line": self.line_number,
+            "column": self.column_number,
+            "end_line": self.end_line,
+            "end_column": self.end_column,
+            "message": self.message,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StyleViolation":
+        return cls(
+            ViolationErrorCode.from_error_code(data["code"]),
+            data["line"],
+            data["column"],
+            data["end_line"],
+            data["end_column"],
+            # Most messages repeat across files, so share one copy of each
+            sys.intern(data["message"]),
+        )
+
     def log_message(self, source_code: str) -> str:
-        start_line = self.code_range.start.line
+        start_line = self.line_number
         violating_code_line = source_code[start_line - 1]
         return "".join(
             [
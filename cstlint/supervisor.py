@@ -0,0 +1,248 @@
+import mmap
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from typing import Iterator, Optional, Sequence
+
+from cstlint.runner import FileResult
+from cstlint.runner import LintOptions
+from cstlint.runner import _error_violation
+from cstlint.runner import lint_data
+from cstlint.runner import lint_file
+from cstlint.runner import preload
+from cstlint.violation_error_codes import ViolationErrorCode
+
+# How often running workers are checked against the time and memory limits
+POLL_INTERVAL = 0.02
+# A worker that still holds this much of its memory budget after a file is
+# replaced before it starts on the next one, rather than killed halfway through
+RECYCLE_MEMORY_FRACTION = 0.5
+CRASH_JOIN_TIMEOUT = 1.0
+
+
+def worker_rss(pid: int) -> Optional[int]:
+    """Resident memory of process `pid` in bytes, None where /proc isn't there."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as file:
+            return int(file.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# A path, and its content if it isn't to be read from disk
+Task = tuple[str, Optional[bytes]]
+
+
+def _serve_files(conn: Connection, options: LintOptions) -> None:
+    # Runs in the worker. Imports are done before reporting ready, so that
+    # they're not billed to the first file's timeout. Then lint tasks until
+    # told to stop with None.
+    preload(options)
+    conn.send(None)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        path, data = task
+        if data is None:
+            conn.send(lint_file(path, options))
+        else:
+            conn.send(lint_data(path, data, options))
+
+
+@dataclass
+class _Worker:
+    process: Process
+    conn: Connection
+    # Set once the worker has sent its ready message
+    ready: bool = False
+    files_done: int = 0
+    # Index and path of the file being linted, if any
+    task: Optional[tuple[int, str]] = None
+    started: float = 0.0
+
+
+class Supervisor:
+    """
+    Lints files in worker processes under per-file limits.
+
+    Each worker lints one file at a time. A worker that runs past the timeout
+    or grows beyond max_memory is killed, its file reported as E0004 or E0005
+    and the worker replaced. A worker that dies on its own, e.g. on a segfault
+    or at the hands of the OOM killer, gets its file reported as E0003. Either
+    way the run carries on with the other files.
+
+    Workers are also recycled after max_files_per_worker files, or when they
+    hold on to a good part of their memory budget after a file, so that memory
+    leaked or fragmented by one file isn't billed to the next.
+
+    The memory limit is enforced by polling workers' resident memory, which
+    is only available on Linux. Allocations faster than the poll interval can
+    overshoot it briefly.
+    """
+
+    def __init__(self, options: LintOptions, jobs: int = 1):
+        self.options = options
+        self.jobs = max(jobs, 1)
+        self._workers: dict[Connection, _Worker] = {}
+        # Where workers are forked, they start with everything imported
+        preload(options)
+
+    def _spawn(self) -> None:
+        conn, child_conn = Pipe()
+        process = Process(
+            target=_serve_files, args=(child_conn, self.options), daemon=True
+        )
+        process.start()
+        # Only the worker keeps its end open, so its death reads as EOF here
+        child_conn.close()
+        self._workers[conn] = _Worker(process, conn)
+
+    def _stop(self, worker: _Worker, kill: bool = False) -> None:
+        del self._workers[worker.conn]
+        if kill:
+            worker.process.kill()
+        else:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                worker.process.kill()
+        worker.conn.close()
+        worker.process.join()
+
+    def _start(self, worker: _Worker) -> None:
+        try:
+            worker.conn.recv()
+        except (EOFError, OSError):
+            # Not a file's fault, and replacing the worker would fail the same
+            # way
+            raise RuntimeError(
+                f"Lint worker failed to start (exit code {worker.process.exitcode})"
+            ) from None
+        worker.ready = True
+
+    def _replace(self, worker: _Worker, kill: bool, respawn: bool) -> None:
+        self._stop(worker, kill)
+        if respawn:
+            self._spawn()
+
+    def _limit_violation(self, worker: _Worker, now: float) -> Optional[FileResult]:
+        options = self.options
+        if options.timeout is not None and now - worker.started > options.timeout:
+            error_code = ViolationErrorCode.TIMEOUT
+            message = f"Linting took longer than {options.timeout:g}s"
+        elif options.max_memory is not None and (
+            worker_rss(worker.process.pid) or 0
+        ) > options.max_memory:
+            error_code = ViolationErrorCode.MEMORY_LIMIT
+            message = f"Worker used more than {options.max_memory // 2**20} MiB"
+        else:
+            return None
+        return FileResult(
+            path=worker.task[1], violations=[_error_violation(error_code, message)]
+        )
+
+    def _crash_result(self, worker: _Worker) -> FileResult:
+        # The connection only breaks once the worker is gone, or about to be
+        worker.process.join(CRASH_JOIN_TIMEOUT)
+        exit_code = worker.process.exitcode
+        if exit_code is not None and exit_code < 0:
+            reason = f"killed by {signal.Signals(-exit_code).name}"
+        else:
+            reason = f"exit code {exit_code}"
+        message = f"Worker died while linting the file ({reason})"
+        return FileResult(
+            path=worker.task[1],
+            violations=[_error_violation(ViolationErrorCode.LINT_CRASH, message)],
+        )
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        options = self.options
+        if (
+            options.max_files_per_worker is not None
+            and worker.files_done >= options.max_files_per_worker
+        ):
+            return True
+        if options.max_memory is None:
+            return False
+        rss = worker_rss(worker.process.pid) or 0
+        return rss > options.max_memory * RECYCLE_MEMORY_FRACTION
+
+    def lint_files(self, paths: Sequence[str]) -> Iterator[FileResult]:
+        """Like runner.lint_files: one FileResult per path, in order."""
+        return self._run([(path, None) for path in paths])
+
+    def lint_data(self, path: str, data: bytes) -> FileResult:
+        """Like runner.lint_data, in a worker."""
+        [result] = self._run([(path, data)])
+        return result
+
+    def _run(self, tasks: Sequence[Task]) -> Iterator[FileResult]:
+        pending = deque(enumerate(tasks))
+        done: dict[int, FileResult] = {}
+        next_idx = 0
+        for _ in range(min(self.jobs, len(tasks))):
+            self._spawn()
+
+        try:
+            while next_idx < len(tasks):
+                for worker in list(self._workers.values()):
+                    if worker.ready and worker.task is None and pending:
+                        idx, task = pending.popleft()
+                        worker.task = (idx, task[0])
+                        worker.started = time.monotonic()
+                        try:
+                            worker.conn.send(task)
+                        except OSError:
+                            done[worker.task[0]] = self._crash_result(worker)
+                            self._replace(worker, kill=True, respawn=True)
+
+                waiting = [
+                    conn
+                    for conn, worker in self._workers.items()
+                    if worker.task or not worker.ready
+                ]
+                for conn in wait(waiting, POLL_INTERVAL):
+                    worker = self._workers[conn]
+                    if not worker.ready:
+                        self._start(worker)
+                        continue
+                    idx = worker.task[0]
+                    try:
+                        done[idx] = conn.recv()
+                    except (EOFError, OSError):
+                        done[idx] = self._crash_result(worker)
+                        self._replace(worker, kill=True, respawn=bool(pending))
+                        continue
+                    worker.task = None
+                    worker.files_done += 1
+                    if self._should_recycle(worker):
+                        self._replace(worker, kill=False, respawn=bool(pending))
+
+                now = time.monotonic()
+                for worker in list(self._workers.values()):
+                    if worker.task is None:
+                        continue
+                    result = self._limit_violation(worker, now)
+                    if result is not None:
+                        done[worker.task[0]] = result
+                        self._replace(worker, kill=True, respawn=bool(pending))
+
+                while next_idx in done:
+                    yield done.pop(next_idx)
+                    next_idx += 1
+        finally:
+            for worker in list(self._workers.values()):
+                self._stop(worker, kill=worker.task is not None)
+
+
+def lint_files_supervised(
+    paths: Sequence[str], jobs: int = 1, options: LintOptions = LintOptions()
+) -> Iterator[FileResult]:
+    return Supervisor(options, jobs).lint_files(paths)
@@ -0,0 +1,149 @@
+import io
+import re
+import tokenize
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from cstlint.style_violation import StyleViolation
+
+# flake8's syntax: `# noqa` suppresses every violation on the line,
+# `# noqa: S1001,S1003` only those whose codes start with one of the codes,
+# which are matched case-insensitively like the rest of the comment
+NOQA_PATTERN = re.compile(
+    r"#\s*noqa(?::[\s]?(?P<codes>[A-Z]+[0-9]+(?:[,\s]+[A-Z]+[0-9]+)*))?",
+    re.IGNORECASE,
+)
+# Token types that don't start a logical line
+_NON_CODE_TOKENS = frozenset(
+    [
+        tokenize.COMMENT,
+        tokenize.NL,
+        tokenize.NEWLINE,
+        tokenize.INDENT,
+        tokenize.DEDENT,
+        tokenize.ENCODING,
+        tokenize.ENDMARKER,
+    ]
+)
+
+
+@dataclass
+class SourceScan:
+    # Line number to the codes suppressed on it, None meaning all of them. A
+    # comment applies to every line of the logical line it's on, so a `noqa`
+    # after a multi-line statement covers all of it.
+    noqa: dict[int, Optional[tuple[str, ...]]] = field(default_factory=dict)
+    # First line of each stretch of lines with the same enclosing function or
+    # class, and its qualified name, e.g. "Class.method", "" at module level
+    scope_lines: list[int] = field(default_factory=list)
+    scope_names: list[str] = field(default_factory=list)
+
+    def scope(self, line_number: int) -> str:
+        idx = bisect_right(self.scope_lines, line_number) - 1
+        return self.scope_names[idx] if idx >= 0 else ""
+
+    def is_suppressed(self, violation: StyleViolation) -> bool:
+        if violation.line_number not in self.noqa:
+            return False
+        codes = self.noqa[violation.line_number]
+        return codes is None or violation.error_code.error_code.startswith(codes)
+
+
+def _noqa_codes(match: re.Match) -> Optional[tuple[str, ...]]:
+    codes = match.group("codes")
+    return tuple(re.split(r"[,\s]+", codes.upper())) if codes else None
+
+
+def scan_source(source_code: str) -> SourceScan:
+    """
+    Collects noqa comments and the enclosing scope of every line in a single
+    pass over the tokens of `source_code`. Source that can't be tokenized gives
+    whatever was collected up to the error.
+    """
+    scan = SourceScan()
+    # Enclosing defs and classes, with the indent depth of their bodies
+    scopes: list[tuple[str, int]] = []
+    depth = 0
+    # The def or class keyword was just read, so the next name is its name
+    expect_name = False
+    # Name of the def or class whose header is being read
+    header_name = None
+    # Name of the def or class whose header just ended, if its body is next
+    body_name = None
+    # First line of the logical line being read, and its noqa comment, if any
+    logical_start = None
+    logical_noqa = None
+
+    tokens = tokenize.generate_tokens(io.StringIO(source_code).readline)
+    try:
+        for token in tokens:
+            token_type = token.type
+            row = token.start[0]
+            if token_type == tokenize.COMMENT:
+                match = NOQA_PATTERN.search(token.string)
+                if match is not None and logical_start is None:
+                    # A comment on a line of its own
+                    scan.noqa[row] = _noqa_codes(match)
+                elif match is not None:
+                    logical_noqa = match
+            elif token_type == tokenize.NEWLINE:
+                if logical_noqa is not None:
+                    codes = _noqa_codes(logical_noqa)
+                    for line in range(logical_start, token.end[0] + 1):
+                        scan.noqa[line] = codes
+                logical_start = None
+                logical_noqa = None
+                body_name = header_name
+                header_name = None
+            elif token_type == tokenize.INDENT:
+                depth += 1
+                if body_name is not None:
+                    scopes.append((body_name, depth))
+                    scan.scope_lines.append(row)
+                    scan.scope_names.append(".".join(name for name, _ in scopes))
+                    body_name = None
+            elif token_type == tokenize.DEDENT:
+                depth -= 1
+                if scopes and scopes[-1][1] > depth:
+                    while scopes and scopes[-1][1] > depth:
+                        scopes.pop()
+                    scan.scope_lines.append(row)
+                    scan.scope_names.append(".".join(name for name, _ in scopes))
+            elif token_type not in _NON_CODE_TOKENS:
+                # Anything but an INDENT after a header means a one-line body
+                body_name = None
+                if logical_start is None:
+                    logical_start = row
+                if token_type != tokenize.NAME:
+                    continue
+                if expect_name:
+                    header_name = token.string
+                    expect_name = False
+                elif token.string in ("def", "class"):
+                    expect_name = True
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return scan
+
+
+def has_noqa(source_code: str) -> bool:
+    """Cheap check for whether scan_source could find any noqa comments."""
+    return NOQA_PATTERN.search(source_code) is not None
+
+
+def suppress_noqa(
+    source_code: str, violations: Sequence[StyleViolation]
+) -> list[StyleViolation]:
+    """
+    The violations not suppressed by a noqa comment. Problems with the file
+    itself, like syntax errors, can't be suppressed.
+    """
+    if not violations or not has_noqa(source_code):
+        return list(violations)
+    scan = scan_source(source_code)
+    return [
+        violation
+        for violation in violations
+        if violation.error_code.is_file_error or not scan.is_suppressed(violation)
+    ]
@@ -0,0 +1,83 @@
+import gc
+import os
+import pickle
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Optional
+
+from cstlint.cache import DiskCache
+from cstlint.cache import _package_version
+
+# Bump when the on-disk entry format changes
+TREE_CACHE_FORMAT_VERSION = 1
+# Trees take up about 4 times the size of their source, compressed
+DEFAULT_MAX_TREE_CACHE_SIZE = 1024 * 1024 * 1024
+# Fast compression: entries are read far more often than written
+COMPRESSION_LEVEL = 1
+
+
+def tree_fingerprint() -> str:
+    # Trees only depend on the parser, not on the rules
+    return "\n".join(
+        [
+            f"format={TREE_CACHE_FORMAT_VERSION}",
+            f"libcst={_package_version('libcst')}",
+            f"python={sys.version_info[0]}.{sys.version_info[1]}",
+        ]
+    )
+
+
+@dataclass
+class CachedTree:
+    # A libcst Module, which isn't imported here so that creating a TreeCache
+    # doesn't import libcst
+    module: Any
+    # Nodes whose positions were resolved when the tree was cached, if any, and
+    # their line, column, end line and end column: 4 ints per node. Pickled
+    # along with the module, so the nodes are the module's own.
+    position_nodes: tuple = ()
+    positions: array = field(default_factory=partial(array, "I"))
+
+
+class TreeCache(DiskCache):
+    """
+    Parsed modules keyed by source, libcst and Python version, so that unlike
+    the ResultCache, entries survive changes to the rules.
+
+    Entries are compressed pickles, which load several times faster than
+    parsing the source again. Loading an entry unpickles it, so the cache
+    directory must be as trusted as the code being linted.
+    """
+
+    SUFFIX = ".pickle.z"
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_TREE_CACHE_SIZE):
+        super().__init__(os.path.join(cache_dir, "trees"), tree_fingerprint(), max_size)
+
+    def get(self, key: str) -> Optional[CachedTree]:
+        data = self._read(key)
+        if data is None:
+            return None
+        # Unpickling allocates a node at a time, which would set off the cyclic
+        # garbage collector over and over. Trees have no cycles to collect.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.loads(zlib.decompress(data))
+        except Exception:
+            # Truncated or otherwise unreadable entries are just misses
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def set(self, key: str, tree: CachedTree) -> None:
+        try:
+            data = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Very deeply nested expressions are left uncached
+            return
+        self._write(key, zlib.compress(data, COMPRESSION_LEVEL))
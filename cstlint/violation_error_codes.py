@@ -25,10 +25,24 @@ class ViolationErrorCode(Enum):
     ATTR_DECORATOR = ("S1005", "Incorrect usage of @attr.s decorator detected.")
     MUTABLE_DEFAULT_ARG = ("S1006", "Use of mutable default argument is discouraged.")
 
+    # Problems with the file itself rather than its style
+    SYNTAX_ERROR = ("E0001", "File could not be parsed.")
+    READ_ERROR = ("E0002", "File could not be read.")
+    LINT_CRASH = ("E0003", "Linting the file crashed.")
+    TIMEOUT = ("E0004", "Linting the file timed out.")
+    MEMORY_LIMIT = ("E0005", "Linting the file exceeded the memory limit.")
+
     def __init__(self, code, message):
         self.code = code
         self.message = message
 
+    @classmethod
+    def from_error_code(cls, error_code: str) -> "ViolationErrorCode":
+        try:
+            return _BY_ERROR_CODE[error_code]
+        except KeyError:
+            raise ValueError(f"Unknown error code: {error_code}") from None
+
     @property
     def error_code(self):
         return self.value[0]
@@ -36,3 +50,10 @@ class ViolationErrorCode(Enum):
     @property
     def error_message(self) -> str:
         return self.value[1]
+
+    @property
+    def is_file_error(self) -> bool:
+        return self.error_code.startswith("E")
+
+
+_BY_ERROR_CODE = {member.error_code: member for member in ViolationErrorCode}
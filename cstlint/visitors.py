@@ -1,49 +1,167 @@
 from abc import ABC
-from dataclasses import dataclass
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional, Sequence
 
-import attr
 import libcst as cst
+from cstlint.function_index import FunctionIndexProvider
+from cstlint.function_index import FunctionInfo
+from cstlint.function_index import _cst_clauses
+from cstlint.imports import Binding
+from cstlint.imports import ImportAliases
+from cstlint.imports import absolute_bindings
+from cstlint.patterns import NO_IMPORTS
+from cstlint.patterns import Pattern
+from cstlint.patterns import PatternTable
+from cstlint.patterns import dotted_name
 from cstlint.style_violation import StyleViolation
 from cstlint.violation_error_codes import ViolationErrorCode
-from libcst import matchers as m
+from libcst.metadata import BatchableMetadataProvider
 from libcst.metadata import PositionProvider
 
+# Message templates, shared with the ast rules. Violations keep the template
+# and its arguments, and only format them when they are output.
+NESTED_FUNCTION_MESSAGE = "Function '{}' is defined within function '{}'."
+ARG_AUG_ASSIGN_MESSAGE = "Assigning to argument: '{}'"
+ARG_ASSIGN_MESSAGE = "Assigning to function argument: '{}'."
+MISSING_AUTO_ATTRIBS_MESSAGE = "Missing auto_attribs keyword."
+KEYWORD_NOT_ALLOWED_MESSAGE = "{} is not an allowed keyword."
+AUTO_ATTRIBS_NOT_TRUE_MESSAGE = "auto_attribs must be True."
+KW_ONLY_NOT_TRUE_MESSAGE = "kw_only must be True."
+REPR_NOT_FALSE_MESSAGE = "repr must be False."
 
-@dataclass
-class FunctionInfo:
-    name: str
-    arg_names: list[str]
-
-    def contains_arg(self, arg: str) -> bool:
-        return arg in self.args
+DANGEROUS_FUNCTIONS = frozenset(["eval", "exec", "getattr", "setattr"])
+MUTABLE_LITERALS = frozenset(["List", "Dict", "Set"])
 
 
 def extract_values_from_assign_target(target: cst.AssignTarget) -> list[str]:
-    # TODO: maybe a better way to extract the underlying
-    # var name/value out of an AssignTarget node
-    if isinstance(target.target, cst.Name):
-        return [target.target.value]
-    elif isinstance(target.target, cst.Subscript):
-        return [target.target.value.value]
-    elif isinstance(target.target, cst.Attribute):
-        return [target.target.value.value]
-    elif isinstance(target.target, cst.Tuple):
-        return [elem.value.value for elem in target.target.elements]
-
-    return None
-    # Probably missing some cases here
-    # raise ValueError(f"Unsupported assign target type: {target}")
+    # The names of the variables assigned to, or whose items or attributes
+    # are. Other targets, e.g. lists or attributes of calls, yield no names.
+    target = target.target
+    if isinstance(target, cst.Name):
+        return [target.value]
+    elif isinstance(target, (cst.Subscript, cst.Attribute)):
+        if isinstance(target.value, cst.Name):
+            return [target.value.value]
+    elif isinstance(target, cst.Tuple):
+        # Starred elements' values are what they unpack into
+        return [
+            elem.value.value
+            for elem in target.elements
+            if isinstance(elem.value, cst.Name)
+        ]
+
+    return []
+
+
+def import_bindings(statements: Sequence[cst.CSTNode]) -> list[Binding]:
+    """The equivalent of imports.ast_bindings for a libcst module's body."""
+    bindings = []
+    for statement in statements:
+        if isinstance(statement, cst.Import):
+            for alias in statement.names:
+                name = dotted_name(alias.name)
+                if alias.asname is None:
+                    head = name.partition(".")[0]
+                    bindings.append((head, head, 0))
+                else:
+                    bindings.append((alias.asname.name.value, name, 0))
+        elif isinstance(statement, cst.ImportFrom):
+            if isinstance(statement.names, cst.ImportStar):
+                continue
+            module = None
+            if statement.module is not None:
+                module = dotted_name(statement.module)
+            for alias in statement.names:
+                name = dotted_name(alias.name)
+                target = name if module is None else f"{module}.{name}"
+                bound = name if alias.asname is None else alias.asname.name.value
+                bindings.append((bound, target, len(statement.relative)))
+        elif isinstance(statement, cst.SimpleStatementLine):
+            bindings.extend(import_bindings(statement.body))
+        elif isinstance(statement, cst.BaseCompoundStatement) and not isinstance(
+            statement, (cst.FunctionDef, cst.ClassDef)
+        ):
+            for suite in _cst_clauses(statement):
+                bindings.extend(import_bindings(suite.body))
+    return bindings
+
+
+class LintMetadataWrapper(cst.MetadataWrapper):
+    """
+    libcst's resolver follows every round of providers with a batched traversal
+    of the whole module, even when none of them is batchable and the traversal
+    has nothing to do. The providers the rules use aren't batchable, so they're
+    generated directly instead.
+    """
+
+    def resolve_many(self, providers):
+        for provider in providers:
+            if (
+                provider not in self._metadata
+                and not issubclass(provider, BatchableMetadataProvider)
+                and not provider.METADATA_DEPENDENCIES
+                and provider.gen_cache is None
+            ):
+                self._metadata[provider] = provider()._gen(self)
+        return super().resolve_many(providers)
+
+    def preload(self, provider: type, metadata: Mapping) -> None:
+        """Use `metadata` as `provider`'s, e.g. when it was cached."""
+        self._metadata[provider] = metadata
+
+    def resolved(self, provider: type) -> Optional[Mapping]:
+        """`provider`'s metadata if something resolved it, without resolving it."""
+        return self._metadata.get(provider)
+
+
+# Compiled patterns of each rule, see StyleViolationsVisitor.pattern_table
+_PATTERN_TABLES: dict[type, PatternTable] = {}
 
 
 class StyleViolationsVisitor(cst.CSTVisitor, ABC):
-    METADATA_DEPENDENCIES = (PositionProvider,)
+    # Positions aren't a declared dependency: computing them takes a codegen
+    # pass over the whole module, which only files with violations need. See
+    # get_node_line_info().
+    METADATA_DEPENDENCIES = ()
+    # Substrings of which at least one has to appear in the source for the rule
+    # to possibly report anything. None means the rule always has to run.
+    TRIGGERS: Optional[tuple[str, ...]] = None
+    # Whether the rule needs the whole module, e.g. to resolve names imported
+    # at its top. Others only look at one top-level statement at a time, and
+    # can be run on each separately.
+    MODULE_WIDE = False
+    # Checks stated as patterns rather than visit_* handlers, see
+    # cstlint.patterns. Run on their own, rules match their own patterns. A
+    # RuleDispatcher matches the patterns of all its rules together.
+    PATTERNS: tuple[Pattern, ...] = ()
+    # Qualified names of what the rule looks for, which modules can import
+    # under other names. Must match the rule's RuleSpec.imports.
+    IMPORTS: tuple[str, ...] = ()
 
     def __init__(self):
         super().__init__()
         self.violations = []
+        # When set, violations are only counted here by error code, without
+        # resolving positions or building StyleViolations
+        self.counts: Optional[Counter] = None
+        # Resolves the names the module uses to what it imports them from
+        self.imports: ImportAliases = NO_IMPORTS
+        self._wrapper: Optional[cst.MetadataWrapper] = None
+
+    @contextmanager
+    def resolve(self, wrapper: cst.MetadataWrapper) -> Iterator[None]:
+        with super().resolve(wrapper):
+            self._wrapper = wrapper
+            try:
+                yield
+            finally:
+                self._wrapper = None
 
     def get_node_line_info(self, node: cst.CSTNode) -> tuple[int, int, int, int]:
-        code_range = self.get_metadata(PositionProvider, node)
+        # The wrapper caches resolved providers, so positions are computed at
+        # most once per module, shared by all rules, and only on first use.
+        code_range = self._wrapper.resolve(PositionProvider)[node]
         return (
             code_range.start.line,
             code_range.start.column,
@@ -51,167 +169,143 @@ class StyleViolationsVisitor(cst.CSTVisitor, ABC):
             code_range.end.column,
         )
 
+    def add_violation(
+        self,
+        error_code: ViolationErrorCode,
+        node: cst.CSTNode,
+        message_template: str = "",
+        *message_args: str,
+    ) -> None:
+        if self.counts is not None:
+            self.counts[error_code.error_code] += 1
+            return
+        self.violations.append(
+            StyleViolation(
+                error_code,
+                *self.get_node_line_info(node),
+                message_template,
+                message_args,
+            )
+        )
+
+    @classmethod
+    def pattern_table(cls) -> PatternTable:
+        """The rule's own patterns, compiled."""
+        table = _PATTERN_TABLES.get(cls)
+        if table is None:
+            table = _PATTERN_TABLES[cls] = PatternTable([cls.PATTERNS])
+        return table
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        if self.PATTERNS:
+            table = self.pattern_table()
+            matchers = table.matchers.get(type(node).__name__)
+            if matchers is not None:
+                for _, message in table.match(node, matchers, self.imports):
+                    self.add_violation(self.VIOLATION_ERROR_CODE, node, message)
+        return super().on_visit(node)
+
+    @classmethod
+    def may_match(cls, source_code: str) -> bool:
+        if cls.TRIGGERS is None:
+            return True
+        return any(trigger in source_code for trigger in cls.TRIGGERS)
+
     @classmethod
     def parse_and_evaluate_violations(cls, source_code: str) -> list[StyleViolation]:
         tree = cst.parse_module(source_code)
-        wrapper = cst.MetadataWrapper(tree)
+        wrapper = LintMetadataWrapper(tree, unsafe_skip_copy=True)
         visitor = cls()
+        if cls.IMPORTS:
+            visitor.imports = ImportAliases(
+                absolute_bindings(import_bindings(tree.body))
+            )
         wrapper.visit(visitor)
         return visitor.violations
 
 
 class DangerousFunctionVisitor(StyleViolationsVisitor):
     VIOLATION_ERROR_CODE = ViolationErrorCode.DANGEROUS_FUNCTION
-
-    def visit_Call(self, node: cst.Call):
-        code_range = self.get_metadata(PositionProvider, node)
-
-        if isinstance(node.func, cst.Name) and node.func.value in [
-            "eval",
-            "exec",
-            "getattr",
-            "setattr",
-        ]:
-            self.violations.append(
-                StyleViolation(
-                    error_code=self.VIOLATION_ERROR_CODE,
-                    code_range=code_range,
-                )
-            )
+    TRIGGERS = ("eval", "exec", "getattr", "setattr")
+    IMPORTS = tuple(sorted(f"builtins.{name}" for name in DANGEROUS_FUNCTIONS))
+    PATTERNS = (Pattern("Call", "func", qualified_names=frozenset(IMPORTS)),)
 
 
 class NestedFunctionVisitor(StyleViolationsVisitor):
     VIOLATION_ERROR_CODE = ViolationErrorCode.NESTED_FUNCTION
-
-    def __init__(self):
-        super().__init__()
-        self.function_stack = []
+    METADATA_DEPENDENCIES = (FunctionIndexProvider,)
+    TRIGGERS = ("def",)
 
     def visit_FunctionDef(self, node: cst.FunctionDef):
-        code_range = self.get_metadata(PositionProvider, node)
-
-        if len(self.function_stack) > 0:
-            parent_func = self.function_stack[-1]
-            self.violations.append(
-                StyleViolation(
-                    error_code=self.VIOLATION_ERROR_CODE,
-                    code_range=code_range,
-                    message=f"Function '{node.name.value}' is defined within function '{parent_func.name.value}'.",
-                )
+        function = self.get_metadata(FunctionIndexProvider, node)
+        if function.parent is not None:
+            self.add_violation(
+                self.VIOLATION_ERROR_CODE,
+                node,
+                NESTED_FUNCTION_MESSAGE,
+                function.name,
+                function.parent.name,
             )
 
-        self.function_stack.append(node)
-
-    def leave_FunctionDef(self, node: cst.FunctionDef):
-        self.function_stack.pop()
-
 
 class FunctionArgAssignVisitor(StyleViolationsVisitor):
     VIOLATION_ERROR_CODE = ViolationErrorCode.FUNCTION_ARG_ASSIGN
+    METADATA_DEPENDENCIES = (FunctionIndexProvider,)
+    TRIGGERS = ("def",)
 
-    def __init__(self):
-        super().__init__()
-        self.function_stack = []
+    def _current_function(self, node: cst.CSTNode) -> Optional[FunctionInfo]:
+        function = self.get_metadata(FunctionIndexProvider, node, None)
+        if function is None or function.name in ("__init__", "__new__"):
+            return None
+        return function
 
-    # TODO: not very DRY but not that much time so I'll leave it as is
     def visit_AugAssign(self, node: cst.AugAssign) -> None:
-        if not self.function_stack:
-            return
-        if self.function_stack[-1].name in ["__init__", "__new__"]:
+        current_function = self._current_function(node)
+        if current_function is None:
             return
 
-        code_range = self.get_metadata(PositionProvider, node)
-        current_function = self.function_stack[-1]
-        assign_targets = extract_values_from_assign_target(node)
-
-        for assign_target in assign_targets:
-            if assign_target in current_function.arg_names:
-                self.violations.append(
-                    StyleViolation(
-                        error_code=self.VIOLATION_ERROR_CODE,
-                        code_range=code_range,
-                        message=f"Assigning to argument: '{assign_target}'",
-                    )
+        for assign_target in extract_values_from_assign_target(node):
+            if assign_target in current_function.params:
+                self.add_violation(
+                    self.VIOLATION_ERROR_CODE,
+                    node,
+                    ARG_AUG_ASSIGN_MESSAGE,
+                    assign_target,
                 )
 
     def visit_Assign_targets(self, node: cst.Assign):
         """
         Detect if a variable being assigned to as one of the arguments
         """
-        if not self.function_stack:
-            return
-
-        if self.function_stack[-1].name in ["__init__", "__new__"]:
+        current_function = self._current_function(node)
+        if current_function is None:
             return
 
-        code_range = self.get_metadata(PositionProvider, node)
-        current_function = self.function_stack[-1]
-
         for target in node.targets:
             assign_targets = extract_values_from_assign_target(target)
             for assign_target in assign_targets:
-                if assign_target in current_function.arg_names:
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=self.VIOLATION_ERROR_CODE,
-                            code_range=code_range,
-                            message=f"Assigning to function argument: '{assign_target}'.",
-                        )
+                if assign_target in current_function.params:
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE,
+                        node,
+                        ARG_ASSIGN_MESSAGE,
+                        assign_target,
                     )
 
-    def visit_FunctionDef(self, node: cst.FunctionDef):
-        fn_args = []
-        for param in node.params.params:
-            fn_args.append(param.name.value)
-
-        fn_info = FunctionInfo(
-            name=node.name.value,
-            arg_names=fn_args,
-        )
-
-        self.function_stack.append(fn_info)
-
-    def leave_FunctionDef(self, node: cst.FunctionDef):
-        self.function_stack.pop()
-
 
 class LambdaVisitor(StyleViolationsVisitor):
     VIOLATION_ERROR_CODE = ViolationErrorCode.LAMBDA
-
-    def visit_Lambda(self, node: cst.Lambda):
-        code_range = self.get_metadata(PositionProvider, node)
-        self.violations.append(
-            StyleViolation(
-                error_code=self.VIOLATION_ERROR_CODE,
-                code_range=code_range,
-            )
-        )
+    TRIGGERS = ("lambda",)
+    PATTERNS = (Pattern("Lambda"),)
 
 
 class MutableDefaultArgVisitor(StyleViolationsVisitor):
     VIOLATION_ERROR_CODE = ViolationErrorCode.MUTABLE_DEFAULT_ARG
-
-    def visit_FunctionDef(self, node: cst.FunctionDef):
-        for param in node.params.params:
-            if param.default is not None:
-                if isinstance(param.default, (cst.List, cst.Dict, cst.Set)):
-                    code_range = self.get_metadata(PositionProvider, node)
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=self.VIOLATION_ERROR_CODE,
-                            code_range=code_range,
-                        )
-                    )
-
-                # Alternatively, using matchers for more complex checks
-                elif m.matches(param.default, m.List() | m.Dict() | m.Set()):
-                    code_range = self.get_metadata(PositionProvider, param.default)
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=self.VIOLATION_ERROR_CODE,
-                            code_range=code_range,
-                        )
-                    )
+    TRIGGERS = ("def",)
+    # Not keyword-only or positional-only parameters
+    PATTERNS = (
+        Pattern("FunctionDef", "params.params.*.default", types=MUTABLE_LITERALS),
+    )
 
 
 class AttrDecoratorVisitor(StyleViolationsVisitor):
@@ -231,66 +325,58 @@ class AttrDecoratorVisitor(StyleViolationsVisitor):
     - repr (if present) must be False
     """
 
+    VIOLATION_ERROR_CODE = ViolationErrorCode.ATTR_DECORATOR
+    TRIGGERS = ("attr",)
+    IMPORTS = ("attr.s",)
+
     def _validate_attrs_args(self):
         pass
 
     def visit_ClassDef_decorators(self, node: cst.Call):
-        code_range = self.get_metadata(PositionProvider, node)
-
         for decorator in node.decorators:
-            decorator_name = decorator.decorator.func.value
-            if decorator_name.value != "attr":
+            # A bare @attr.s is a call without arguments
+            call = decorator.decorator
+            args = ()
+            if isinstance(call, cst.Call):
+                args = call.args
+                call = call.func
+            name = dotted_name(call)
+            if name is None or self.imports.qualified_name(name) != "attr.s":
                 continue
 
-            assert decorator.decorator.func.attr.value == "s"
-            decorator_kws = {kw.keyword.value for kw in decorator.decorator.args}
+            keywords = [arg for arg in args if arg.keyword is not None]
+            decorator_kws = {arg.keyword.value for arg in keywords}
             if "auto_attribs" not in decorator_kws:
-                self.violations.append(
-                    StyleViolation(
-                        error_code=ViolationErrorCode.ATTR_DECORATOR,
-                        code_range=code_range,
-                        message="Missing auto_attribs keyword.",
-                    )
+                self.add_violation(
+                    self.VIOLATION_ERROR_CODE, node, MISSING_AUTO_ATTRIBS_MESSAGE
                 )
 
-            for arg in decorator.decorator.args:
+            for arg in keywords:
+                value = arg.value.value if isinstance(arg.value, cst.Name) else None
                 if arg.keyword.value not in [
                     "auto_attribs",
                     "frozen",
                     "kw_only",
                     "repr",
                 ]:
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=ViolationErrorCode.ATTR_DECORATOR,
-                            code_range=code_range,
-                            message=f"{arg.keyword.value} is not an allowed keyword.",
-                        )
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE,
+                        node,
+                        KEYWORD_NOT_ALLOWED_MESSAGE,
+                        arg.keyword.value,
                     )
 
-                if arg.keyword.value == "auto_attribs" and arg.value.value != "True":
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=ViolationErrorCode.ATTR_DECORATOR,
-                            code_range=code_range,
-                            message="auto_attribs must be True.",
-                        )
+                if arg.keyword.value == "auto_attribs" and value != "True":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, AUTO_ATTRIBS_NOT_TRUE_MESSAGE
                     )
 
-                if arg.keyword.value == "kw_only" and arg.value.value != "True":
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=ViolationErrorCode.ATTR_DECORATOR,
-                            code_range=code_range,
-                            message="kw_only must be True.",
-                        )
+                if arg.keyword.value == "kw_only" and value != "True":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, KW_ONLY_NOT_TRUE_MESSAGE
                     )
 
-                if arg.keyword.value == "repr" and arg.value.value != "False":
-                    self.violations.append(
-                        StyleViolation(
-                            error_code=ViolationErrorCode.ATTR_DECORATOR,
-                            code_range=code_range,
-                            message="repr must be False.",
-                        )
+                if arg.keyword.value == "repr" and value != "False":
+                    self.add_violation(
+                        self.VIOLATION_ERROR_CODE, node, REPR_NOT_FALSE_MESSAGE
                     )
@@ -0,0 +1,275 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Optional, TextIO
+
+from cstlint.runner import FileResult
+from cstlint.sharding import format_shard
+from cstlint.statistics import Statistics
+from cstlint.statistics import count_violations
+from cstlint.style_violation import StyleViolation
+from cstlint.violation_error_codes import ViolationErrorCode
+
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+# Bump when the layout of JsonWriter's reports changes
+JSON_REPORT_VERSION = 1
+# Reports of JsonStatisticsWriter are told apart by their kind, and have a
+# version of their own
+STATISTICS_REPORT_KIND = "statistics"
+STATISTICS_REPORT_VERSION = 1
+
+
+class ViolationWriter(ABC):
+    """
+    Writes the violations of FileResults to a stream as the results come in.
+
+    Nothing is kept after a result is written. The output for a file is
+    formatted as a whole and written with a single write() call, leaving the
+    buffering to the stream.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        with_lines: bool = False,
+        shard: Optional[tuple[int, int]] = None,
+    ):
+        self.stream = stream
+        # Include the source of violating lines, from FileResult.lines
+        self.with_lines = with_lines
+        # (K, N) when the files are the K-th of N shards, see cstlint.sharding
+        self.shard = shard
+
+    def __enter__(self) -> "ViolationWriter":
+        self.begin()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.end()
+
+    def begin(self) -> None:
+        pass
+
+    def write_result(self, result: FileResult) -> None:
+        if result.violations:
+            self.stream.write("".join(self.format_result(result)))
+
+    @abstractmethod
+    def format_result(self, result: FileResult) -> list[str]:
+        pass
+
+    def end(self) -> None:
+        self.stream.flush()
+
+
+class TextWriter(ViolationWriter):
+    """path:line:column: code: message, one violation per line."""
+
+    def format_result(self, result: FileResult) -> list[str]:
+        if self.with_lines:
+            return [
+                f"{result.path}:{violation.format()}: "
+                f"{result.lines.get(violation.line_number, '')}\n"
+                for violation in result.violations
+            ]
+        return [
+            f"{result.path}:{violation.format()}\n" for violation in result.violations
+        ]
+
+
+class JsonLinesWriter(ViolationWriter):
+    """One JSON object per violation, with the fields of StyleViolation.to_dict."""
+
+    def format_result(self, result: FileResult) -> list[str]:
+        return [
+            json.dumps(self._json_violation(result, violation)) + "\n"
+            for violation in result.violations
+        ]
+
+    def _json_violation(self, result: FileResult, violation: StyleViolation) -> dict:
+        data = {"path": result.path, **violation.to_dict()}
+        if self.with_lines:
+            data["source"] = result.lines.get(violation.line_number, "")
+        return data
+
+
+class JsonWriter(JsonLinesWriter):
+    """
+    A single JSON document, {"version": 1, "shard": "K/N" or null,
+    "violations": [...]}, the violations as written by JsonLinesWriter. The
+    reports of all shards of a run can be combined by `cstlint merge`.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        with_lines: bool = False,
+        shard: Optional[tuple[int, int]] = None,
+    ):
+        super().__init__(stream, with_lines, shard)
+        self._num_violations = 0
+
+    def begin(self) -> None:
+        header = json.dumps(
+            {
+                "version": JSON_REPORT_VERSION,
+                "shard": format_shard(self.shard) if self.shard else None,
+            }
+        )
+        self.stream.write(header[:-1] + ', "violations": [\n')
+
+    def format_result(self, result: FileResult) -> list[str]:
+        lines = []
+        for violation in result.violations:
+            separator = ",\n" if self._num_violations else ""
+            self._num_violations += 1
+            data = self._json_violation(result, violation)
+            lines.append(separator + json.dumps(data))
+        return lines
+
+    def end(self) -> None:
+        self.stream.write("\n]}\n")
+        super().end()
+
+
+class SarifWriter(ViolationWriter):
+    """
+    A SARIF 2.1.0 log with a single run, as understood by code scanning
+    services. The rules are known up front, so the log is streamed: the header
+    is written by begin(), results as they come in and the closing brackets by
+    end().
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        with_lines: bool = False,
+        shard: Optional[tuple[int, int]] = None,
+    ):
+        super().__init__(stream, with_lines, shard)
+        self._rule_indexes = {
+            error_code: idx for idx, error_code in enumerate(ViolationErrorCode)
+        }
+        self._num_results = 0
+
+    def begin(self) -> None:
+        rules = [
+            {
+                "id": error_code.error_code,
+                "name": error_code.name,
+                "shortDescription": {"text": error_code.error_message},
+            }
+            for error_code in ViolationErrorCode
+        ]
+        run = {"tool": {"driver": {"name": "cstlint", "rules": rules}}}
+        if self.shard:
+            # Tells apart the logs of the shards of a run
+            run["automationDetails"] = {
+                "id": f"cstlint/shard-{self.shard[0]}-of-{self.shard[1]}"
+            }
+        header = json.dumps(
+            {"version": SARIF_VERSION, "$schema": SARIF_SCHEMA, "runs": [run]}
+        )
+        # Reopen the run object to stream its results into it
+        self.stream.write(header[: -len("}]}")] + ', "results": [\n')
+
+    def format_result(self, result: FileResult) -> list[str]:
+        lines = []
+        for violation in result.violations:
+            separator = ",\n" if self._num_results else ""
+            self._num_results += 1
+            data = self._sarif_result(result.path, violation)
+            if self.with_lines and violation.line_number in result.lines:
+                region = data["locations"][0]["physicalLocation"]["region"]
+                region["snippet"] = {"text": result.lines[violation.line_number]}
+            lines.append(separator + json.dumps(data))
+        return lines
+
+    def _sarif_result(self, path: str, violation: StyleViolation) -> dict:
+        error_code = violation.error_code
+        message = error_code.error_message
+        if violation.message_template:
+            message += f" {violation.message}"
+        return {
+            "ruleId": error_code.error_code,
+            "ruleIndex": self._rule_indexes[error_code],
+            "level": "error" if error_code.is_file_error else "warning",
+            "message": {"text": message},
+            "locations": [
+                {
+                    "physicalLocation": {
+                        "artifactLocation": {"uri": path.replace(os.sep, "/")},
+                        # SARIF columns are 1-based
+                        "region": {
+                            "startLine": violation.line_number,
+                            "startColumn": violation.column_number + 1,
+                            "endLine": violation.end_line,
+                            "endColumn": violation.end_column + 1,
+                        },
+                    }
+                }
+            ],
+        }
+
+    def end(self) -> None:
+        self.stream.write("\n]}]}\n")
+        super().end()
+
+
+class StatisticsWriter(ViolationWriter):
+    """
+    Counts violations by error code instead of writing them, and writes the
+    counts once all results are in. Counts from runner.count_files can be
+    added to self.statistics directly.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        with_lines: bool = False,
+        shard: Optional[tuple[int, int]] = None,
+    ):
+        super().__init__(stream, with_lines, shard)
+        self.statistics = Statistics()
+
+    def write_result(self, result: FileResult) -> None:
+        self.statistics.add(result.path, count_violations(result.violations))
+
+    def format_result(self, result: FileResult) -> list[str]:
+        return []
+
+    def write_statistics(self) -> None:
+        self.statistics.print_summary(self.stream)
+
+    def end(self) -> None:
+        self.write_statistics()
+        super().end()
+
+
+class JsonStatisticsWriter(StatisticsWriter):
+    """
+    The counts per error code, directory and file as a JSON document,
+    {"kind": "statistics", "version": 1, "shard": "K/N" or null, ...}. The
+    reports of all shards of a run can be combined by `cstlint merge`.
+    """
+
+    def write_statistics(self) -> None:
+        data = {
+            "kind": STATISTICS_REPORT_KIND,
+            "version": STATISTICS_REPORT_VERSION,
+            "shard": format_shard(self.shard) if self.shard else None,
+            **self.statistics.to_dict(),
+        }
+        self.stream.write(json.dumps(data, indent=2) + "\n")
+
+
+WRITERS = {
+    "text": TextWriter,
+    "json": JsonWriter,
+    "jsonl": JsonLinesWriter,
+    "sarif": SarifWriter,
+}
+DEFAULT_FORMAT = "text"
+# Used for --statistics, by --format
+STATISTICS_WRITERS = {"text": StatisticsWriter, "json": JsonStatisticsWriter}
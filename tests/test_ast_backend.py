@@ -0,0 +1,72 @@
+import unittest
+
+from cstlint.ast_visitors import AST_RULES
+from cstlint.backends import AstBackend
+from cstlint.backends import CstBackend
+from cstlint.engine import DEFAULT_RULES
+from tests import test_attr_decorator_visitor
+from tests import test_dangerous_function_visitor
+from tests import test_function_args_assign_visitor
+from tests import test_lambda_visitor
+from tests import test_mutable_default_arg_visitor
+from tests import test_nested_functions_visitor
+
+
+EXTRA_SOURCES = [
+    # Columns are counted in characters, not UTF-8 bytes
+    "é = 'ü'; eval('é')\nf = lambda: 'ñ'\n",
+    # Decorators are visited before the body by libcst, but after it by ast
+    "@register(lambda: 0)\ndef f(x):\n    x = lambda: exec('')\n",
+    "async def outer(a, /, b=[], *, c={}):\n    b += 1\n    async def inner():\n        c = 2\n",
+    "def f(x, y):\n    x, *y = 1, 2, 3\n    x.attr = 1\n    y[0] = 2\n",
+    "def __init__(self, x):\n    x = 1\n",
+    "class A:\n    def f(self, x={1}):\n        x = (eval)('x')\n",
+    "@attr.s(auto_attribs=False, kw_only=False, repr=True, other=1)\nclass A:\n    pass\n",
+    "def f(x):\n    class B:\n        x = 1\n    return (lambda: (lambda: x))\n",
+    # Targets that assign to no argument, or only to items or attributes of one
+    "def f(a, b):\n    [a, b] = 1, 2\n    g().x = 1\n    a.b.c = 3\n    *a, (b) = 4, 5\n",
+    "import attr as a\n@a.s(auto_attribs=(True), repr=False if x else True)\nclass A:\n    pass\n",
+]
+
+SOURCES = [
+    source_code
+    for test_case in (
+        test_attr_decorator_visitor.TestAttrDecoratorVisitor,
+        test_dangerous_function_visitor.TestDangerousFunctionsVisitor,
+        test_function_args_assign_visitor.TestFunctionArgsVisitor,
+        test_lambda_visitor.TestLambdaVisitor,
+        test_mutable_default_arg_visitor.TestFunctionArgsVisitor,
+        test_nested_functions_visitor.TestNestedFunctionsVisitor,
+    )
+    for source_code, _ in test_case.TEST_CASES
+] + EXTRA_SOURCES
+
+
+class TestAstBackendParity(unittest.TestCase):
+    def test_every_rule_has_an_ast_implementation(self):
+        self.assertEqual(set(AST_RULES), set(DEFAULT_RULES))
+
+    def test_same_violations_per_rule(self):
+        for rule in DEFAULT_RULES:
+            for source_code in SOURCES:
+                with self.subTest(rule=rule.__name__, source_code=source_code):
+                    cst_violations = CstBackend().lint(source_code, [rule])
+                    ast_violations = AstBackend().lint(source_code, [rule])
+                    self.assertEqual(
+                        [violation.to_dict() for violation in ast_violations],
+                        [violation.to_dict() for violation in cst_violations],
+                    )
+
+    def test_same_violations_for_all_rules(self):
+        source_code = "\n".join(EXTRA_SOURCES)
+        cst_violations = CstBackend().lint(source_code, DEFAULT_RULES)
+        ast_violations = AstBackend().lint(source_code, DEFAULT_RULES)
+        self.assertEqual(
+            [violation.format() for violation in ast_violations],
+            [violation.format() for violation in cst_violations],
+        )
+        self.assertGreater(len(cst_violations), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,36 @@ class Dog:
 """,
             3,  # missing auto_attribs, repr not False, random is not a valid keyword
         ),
+        (
+            """
+import attr as a
+
+@a.s(repr=True)
+class Dog:
+    pass
+""",
+            2,
+        ),
+        (
+            """
+from attr import s
+
+@s(auto_attribs=True, **options)
+class Dog:
+    pass
+""",
+            0,
+        ),
+        (
+            """
+@dataclass
+@attr.s
+@attr.define(frozen=True)
+class Dog:
+    pass
+""",
+            1,  # a bare @attr.s is missing auto_attribs
+        ),
     ]
 
     def test_usage(self):
@@ -0,0 +1,21 @@
+import ast
+import unittest
+
+from benchmarks.corpus import SHAPES
+from benchmarks.corpus import generate_module
+from cstlint.engine import lint_source
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    def test_generated_modules_are_deterministic_and_valid(self):
+        for shape in SHAPES:
+            with self.subTest(shape=shape):
+                source_code = generate_module(shape, 30)
+                self.assertEqual(source_code, generate_module(shape, 30))
+                self.assertNotEqual(source_code, generate_module(shape, 30, seed=1))
+                ast.parse(source_code)
+                lint_source(source_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
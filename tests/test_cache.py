@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cstlint.cache import ResultCache
+from cstlint.cache import rules_fingerprint
+from cstlint.registry import DEFAULT_RULE_CODES
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_file
+
+
+SOURCE_CODE = "def f(x, y=[]):\n    x = lambda: eval('1')\n"
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.path = os.path.join(self.tmp_dir.name, "example.py")
+        with open(self.path, "w") as file:
+            file.write(SOURCE_CODE)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_warm_run_matches_cold_run(self):
+        cache = ResultCache(self.cache_dir, rules_fingerprint(DEFAULT_RULE_CODES))
+        cold = lint_file(self.path, LintOptions(with_lines=True, cache=cache))
+        warm = lint_file(self.path, LintOptions(with_lines=True, cache=cache))
+        self.assertFalse(cold.cached)
+        self.assertTrue(warm.cached)
+        self.assertEqual(cold.violations, warm.violations)
+        self.assertEqual(cold.lines, warm.lines)
+
+    def test_rule_set_changes_invalidate(self):
+        all_rules = ResultCache(self.cache_dir, rules_fingerprint(DEFAULT_RULE_CODES))
+        lambda_only = ResultCache(self.cache_dir, rules_fingerprint(["S1003"]))
+        lint_file(self.path, LintOptions(cache=all_rules))
+        result = lint_file(self.path, LintOptions(rules=("S1003",), cache=lambda_only))
+        self.assertFalse(result.cached)
+        self.assertEqual(len(result.violations), 1)
+
+    def test_prune_evicts_least_recently_used(self):
+        cache = ResultCache(self.cache_dir, "fingerprint", max_size=0)
+        keys = [cache.key(str(idx).encode()) for idx in range(3)]
+        for idx, key in enumerate(keys):
+            cache.set(key, [])
+            entry_time = time.time() - 100 + idx
+            os.utime(cache._entry_path(key), (entry_time, entry_time))
+
+        # Reading the oldest entry makes it the most recently used
+        self.assertEqual(cache.get(keys[0]), [])
+        entry_size = os.path.getsize(cache._entry_path(keys[0]))
+        cache.max_size = entry_size
+        cache.prune()
+
+        remaining = [key for key in keys if os.path.exists(cache._entry_path(key))]
+        self.assertEqual(remaining, [keys[0]])
+
+    def test_malformed_entries_are_misses(self):
+        cache = ResultCache(self.cache_dir, "fingerprint")
+        key = cache.key(b"source")
+        cache.set(key, [])
+        for data in [b'{"violations": [', b"{}", b"[]", b'{"violations": [{}]}']:
+            with self.subTest(data=data):
+                with open(cache._entry_path(key), "wb") as file:
+                    file.write(data)
+                self.assertIsNone(cache.get(key))
+
+    def scandir_and_remove(self, path):
+        # Lists `path`, and then removes either the buckets or the entries in
+        # them, like a concurrent run that prunes or renames temporary files
+        entries = list(self.scandir(path))
+        if (path == self.cache_dir) == (self.removed == "buckets"):
+            for entry in entries:
+                if entry.is_dir():
+                    for name in os.listdir(entry.path):
+                        os.remove(os.path.join(entry.path, name))
+                    os.rmdir(entry.path)
+                else:
+                    os.remove(entry.path)
+        return entries
+
+    def test_prune_skips_removed_entries(self):
+        cache = ResultCache(self.cache_dir, "fingerprint", max_size=0)
+        self.scandir = os.scandir
+        for removed in ("buckets", "entries"):
+            with self.subTest(removed=removed):
+                for idx in range(20):
+                    cache.set(cache.key(str(idx).encode()), [])
+                self.removed = removed
+                with mock.patch("os.scandir", side_effect=self.scandir_and_remove):
+                    cache.prune()
+
+
+if __name__ == "__main__":
+    unittest.main()
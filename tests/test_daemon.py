@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from cstlint.cache import ResultCache
+from cstlint.daemon import LintServer
+from cstlint.daemon import default_socket_path
+from cstlint.daemon import lint_files_with_daemon
+from cstlint.daemon import request_lint
+from cstlint.daemon import serve
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_file
+
+
+SOURCE_CODE = "def f(x, y=[]):\n    x = lambda: eval('1')\n"
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, "cstlint.sock")
+        self.path = os.path.join(self.tmp_dir.name, "example.py")
+        with open(self.path, "w") as file:
+            file.write(SOURCE_CODE)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def start_server(self):
+        server = LintServer(self.socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_lint_by_path_and_inline_source(self):
+        self.start_server()
+        expected = lint_file(self.path, LintOptions(with_lines=True))
+
+        by_path = request_lint(
+            self.socket_path, self.path, options=LintOptions(with_lines=True)
+        )
+        self.assertEqual(by_path.violations, expected.violations)
+        self.assertEqual(by_path.lines, expected.lines)
+
+        inline = request_lint(self.socket_path, "unsaved.py", source=SOURCE_CODE)
+        self.assertEqual(inline.path, "unsaved.py")
+        self.assertEqual(inline.violations, expected.violations)
+
+    def test_lints_with_the_client_options(self):
+        # The daemon caches results for its own rules, the client asks for
+        # others without a cache
+        self.start_server()
+        self.assertEqual(len(request_lint(self.socket_path, self.path).violations), 4)
+        for options in [
+            LintOptions(rules=("S1003",)),
+            LintOptions(rules=("S1001", "S1003"), backend="ast"),
+        ]:
+            with self.subTest(options=options):
+                expected = lint_file(self.path, options)
+                results = list(
+                    lint_files_with_daemon(self.socket_path, [self.path], 1, options)
+                )
+                self.assertEqual(results[0].violations, expected.violations)
+                inline = request_lint(
+                    self.socket_path, "unsaved.py", source=SOURCE_CODE, options=options
+                )
+                self.assertEqual(inline.violations, expected.violations)
+
+    def test_client_cache(self):
+        self.start_server()
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        options = LintOptions(
+            rules=("S1003",), cache=ResultCache(cache_dir, "fingerprint")
+        )
+        first = request_lint(self.socket_path, self.path, options=options)
+        self.assertFalse(first.cached)
+        self.assertTrue(os.path.isdir(cache_dir))
+        second = request_lint(self.socket_path, self.path, options=options)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.violations, first.violations)
+
+    def test_unknown_rules_are_an_error(self):
+        self.start_server()
+        with self.assertRaises(RuntimeError):
+            request_lint(
+                self.socket_path, self.path, options=LintOptions(rules=("X9999",))
+            )
+
+    def test_ignores_sockets_of_other_users(self):
+        self.start_server()
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(request_lint(self.socket_path, self.path))
+
+    def test_default_socket_is_in_a_private_directory(self):
+        socket_dir = os.path.join(self.tmp_dir.name, f"cstlint-{os.getuid()}")
+        socket_path = os.path.join(socket_dir, "cstlint.sock")
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}), mock.patch(
+            "tempfile.gettempdir", return_value=self.tmp_dir.name
+        ):
+            self.assertEqual(default_socket_path(), socket_path)
+        with mock.patch("signal.signal"), mock.patch(
+            "cstlint.daemon.LintServer.serve_forever", side_effect=KeyboardInterrupt
+        ):
+            serve(socket_path)
+        self.assertEqual(os.stat(socket_dir).st_mode & 0o777, 0o700)
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(RuntimeError):
+                serve(socket_path)
+
+    def test_falls_back_without_daemon(self):
+        self.assertIsNone(request_lint(self.socket_path, self.path))
+        results = list(lint_files_with_daemon(self.socket_path, [self.path]))
+        self.assertEqual(results[0].violations, lint_file(self.path).violations)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,13 @@ class TestDangerousFunctionsVisitor(unittest.TestCase):
         ("evaluate(10)", 0),
         ("getattr = 0", 0),
         ("setattr = 1", 0),
+        # Through imports
+        ("from builtins import eval as e\ne('1')", 1),
+        ("import builtins as b\nb.exec('1')", 1),
+        ("try:\n    from builtins import getattr as g\nexcept ImportError:\n    pass\ng(x, 'y')", 1),
+        ("from safe import eval\neval('1')", 0),
+        ("import numpy as np\nnp.eval('1')", 0),
+        ("obj.eval('1')", 0),
     ]
 
     def test_usage(self):
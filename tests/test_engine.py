@@ -0,0 +1,119 @@
+import unittest
+
+import libcst as cst
+from cstlint.engine import DEFAULT_RULES
+from cstlint.engine import RuleDispatcher
+from cstlint.engine import lint_module
+from cstlint.engine import lint_source
+from cstlint.engine import rules_for_source
+from cstlint.visitors import DangerousFunctionVisitor
+from cstlint.visitors import LambdaVisitor
+from cstlint.visitors import NestedFunctionVisitor
+from cstlint.visitors import StyleViolationsVisitor
+from libcst.metadata import PositionProvider
+
+
+SOURCE_CODE = """
+import attr
+
+eval("1 + 1")
+f = lambda x: x + 1
+
+
+def outer(x, items=[]):
+    x += 1
+    items, y = [], 2
+
+    def inner(z={}):
+        z = lambda: getattr(z, "a")
+        return z
+
+    return inner
+
+
+@attr.s(auto_attribs=True, frozen=False, repr=True)
+class Dog:
+    def bark(self, volume):
+        volume = exec("print(1)")
+"""
+
+
+def sequential_violations(source_code, rules):
+    wrapper = cst.MetadataWrapper(cst.parse_module(source_code))
+    formatted = []
+    for rule in rules:
+        visitor = rule()
+        wrapper.visit(visitor)
+        formatted.extend(violation.format() for violation in visitor.violations)
+    return formatted
+
+
+class SkipFunctionBodiesVisitor(LambdaVisitor):
+    def visit_FunctionDef(self, node: cst.FunctionDef):
+        return False
+
+
+class TestRuleDispatcher(unittest.TestCase):
+    def test_matches_sequential_visits(self):
+        violations = lint_source(SOURCE_CODE)
+        self.assertEqual(
+            [violation.format() for violation in violations],
+            sequential_violations(SOURCE_CODE, DEFAULT_RULES),
+        )
+        self.assertGreater(len(violations), 0)
+
+    def test_visit_returning_false_only_skips_that_rule(self):
+        rules = (SkipFunctionBodiesVisitor, LambdaVisitor)
+        violations = lint_source(SOURCE_CODE, rules)
+        self.assertEqual(
+            [violation.format() for violation in violations],
+            sequential_violations(SOURCE_CODE, rules),
+        )
+        self.assertEqual(len(violations), 3)
+
+    def test_handlers_only_dispatched_to_rules_defining_them(self):
+        dispatcher = RuleDispatcher([rule() for rule in DEFAULT_RULES])
+        handler_rules = [idx for idx, _ in dispatcher._handlers("visit_FunctionDef")]
+        self.assertEqual(handler_rules, [DEFAULT_RULES.index(NestedFunctionVisitor)])
+        self.assertEqual(dispatcher._handlers("visit_Pass"), [])
+        # Rules stated as patterns have no handlers
+        self.assertEqual(dispatcher._handlers("visit_Lambda"), [])
+        self.assertEqual(set(dispatcher._matchers), {"Call", "FunctionDef", "Lambda"})
+        self.assertTrue(
+            all(issubclass(rule, StyleViolationsVisitor) for rule in DEFAULT_RULES)
+        )
+
+
+class TestLazyPositions(unittest.TestCase):
+    def test_positions_only_resolved_when_there_are_violations(self):
+        clean = cst.MetadataWrapper(cst.parse_module("def f(x):\n    return x\n"))
+        self.assertEqual(lint_module(clean), [])
+        self.assertNotIn(PositionProvider, clean._metadata)
+
+        dirty = cst.MetadataWrapper(cst.parse_module("def f(x):\n    x = 1\n"))
+        violations = lint_module(dirty)
+        self.assertEqual(
+            [violation.format()[:10] for violation in violations], ["2:4: S1004"]
+        )
+        self.assertIn(PositionProvider, dirty._metadata)
+
+
+class TestTriggerPrefilter(unittest.TestCase):
+    def test_rules_without_triggers_are_skipped(self):
+        self.assertEqual(
+            rules_for_source("x = lambda: 1\n", DEFAULT_RULES), [LambdaVisitor]
+        )
+        self.assertEqual(
+            rules_for_source("exec(x)\nz = lambda: 1\n", DEFAULT_RULES),
+            [DangerousFunctionVisitor, LambdaVisitor],
+        )
+
+    def test_parse_is_skipped_when_no_rule_can_fire(self):
+        # Not even valid Python, but nothing could match so it is never parsed
+        self.assertEqual(lint_source("x = (1 +\n"), [])
+        with self.assertRaises(cst.ParserSyntaxError):
+            lint_source("x = (lambda: 1 +\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
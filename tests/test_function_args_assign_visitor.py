@@ -15,6 +15,9 @@ class TestFunctionArgsVisitor(unittest.TestCase):
         ("def f(x, y):\n    y.value += 10", 1),
         ("def f(x, y):\n    x, z = 1, 2", 1),
         ("def f(x, y):\n    x, y = 1, 2", 2),
+        ("def f(x):\n    def g(y):\n        x = 1", 0),
+        ("def f(x):\n    for _ in x:\n        x = 1", 1),
+        ("class A:\n    def __init__(self, x):\n        x = 1", 0),
     ]
 
     def test_usage(self):
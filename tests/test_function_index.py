@@ -0,0 +1,123 @@
+import ast
+import unittest
+
+import libcst as cst
+from cstlint.function_index import FunctionIndexProvider
+from cstlint.function_index import build_ast_function_index
+from cstlint.visitors import LintMetadataWrapper
+
+
+SOURCE_CODE = """
+x = 1
+
+def outer(a, /, b, *args, c, d=1, **kwargs):
+    y = 2
+    if y:
+        def inner(e):
+            pass
+    else:
+        try:
+            z = 3
+        except ValueError:
+            class Local:
+                def method(self, f):
+                    return f
+        finally:
+            pass
+
+class A:
+    for _ in range(2):
+        def method(self, *, g): return g
+
+async def coroutine(h=None):
+    match h:
+        case None:
+            w = 4
+"""
+
+
+def cst_index(source_code):
+    wrapper = LintMetadataWrapper(cst.parse_module(source_code))
+    return wrapper.module, wrapper.resolve(FunctionIndexProvider)
+
+
+def describe(info):
+    if info is None:
+        return None
+    return (
+        info.name,
+        info.depth,
+        info.enclosing_class,
+        info.parent.name if info.parent else None,
+        sorted(info.all_params),
+    )
+
+
+class TestFunctionIndex(unittest.TestCase):
+    def test_functions(self):
+        module, index = cst_index(SOURCE_CODE)
+        functions = {
+            info.name + str(info.depth): info
+            for node, info in index.items()
+            if isinstance(node, cst.FunctionDef)
+        }
+        self.assertEqual(
+            [describe(info) for info in functions.values()],
+            [
+                ("outer", 0, None, None, ["a", "args", "b", "c", "d", "kwargs"]),
+                ("inner", 1, None, "outer", ["e"]),
+                ("method", 1, "Local", "outer", ["f", "self"]),
+                ("method", 0, "A", None, ["g", "self"]),
+                ("coroutine", 0, None, None, ["h"]),
+            ],
+        )
+
+        outer = functions["outer0"]
+        self.assertEqual(outer.params, {"b"})
+        self.assertEqual(outer.posonly_params, {"a"})
+        self.assertEqual(outer.kwonly_params, {"c", "d"})
+        self.assertEqual((outer.star_arg, outer.star_kwarg), ("args", "kwargs"))
+        self.assertIsNone(functions["method0"].star_arg)
+
+    def test_statements_map_to_innermost_function(self):
+        module, index = cst_index(SOURCE_CODE)
+        assigned_in = {}
+        for node, info in index.items():
+            if isinstance(node, cst.Assign):
+                assigned_in[node.targets[0].target.value] = info.name
+        # x is at module level, so it has no entry
+        self.assertEqual(assigned_in, {"y": "outer", "z": "outer", "w": "coroutine"})
+        self.assertNotIn(module.body[0], index)
+
+    def test_ast_index_matches(self):
+        _, index = cst_index(SOURCE_CODE)
+        ast_index = build_ast_function_index(ast.parse(SOURCE_CODE))
+        for statement_types, ast_types in (
+            (cst.FunctionDef, (ast.FunctionDef, ast.AsyncFunctionDef)),
+            (cst.Assign, ast.Assign),
+        ):
+            with self.subTest(statement_types=statement_types):
+                self.assertEqual(
+                    [
+                        describe(info)
+                        for node, info in index.items()
+                        if isinstance(node, statement_types)
+                    ],
+                    [
+                        describe(info)
+                        for node, info in ast_index.items()
+                        if isinstance(node, ast_types)
+                    ],
+                )
+
+    def test_resolved_without_traversal(self):
+        wrapper = LintMetadataWrapper(cst.parse_module(SOURCE_CODE))
+        # Nothing in the index is a batchable provider, so resolving it mustn't
+        # go through a (no-op) batched visit of the whole tree
+        wrapper.visit_batched = None
+        wrapper.resolve(FunctionIndexProvider)
+        self.assertIn(FunctionIndexProvider, wrapper._metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
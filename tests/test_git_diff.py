@@ -0,0 +1,139 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from cstlint.engine import lint_source
+from cstlint.files import DEFAULT_EXCLUDE
+from cstlint.files import DEFAULT_INCLUDE
+from cstlint.git_diff import changed_files
+from cstlint.git_diff import changed_lines
+from cstlint.git_diff import filter_to_changed_lines
+from cstlint.git_diff import parse_diff
+from cstlint.git_diff import unquote_path
+
+
+DIFF = """diff --git a/pkg/a.py b/pkg/a.py
+index 1111111..2222222 100644
+--- a/pkg/a.py
++++ b/pkg/a.py
+@@ -3,0 +4,2 @@ def f():
++    x = 1
++    y = 2
+@@ -10 +12 @@ def g():
+-    old()
++    new()
+@@ -20,3 +21,0 @@ def h():
+-    a
+-    b
+-    c
+diff --git a/new.py b/new.py
+new file mode 100644
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1,3 @@
++eval("1")
++
++lambda: 0
+"""
+
+SOURCE_CODE = """def f(x, y=[]):
+    x = 1
+    return lambda: eval(y)
+
+
+def g(z):
+    z = 2
+"""
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+class TestGitDiff(unittest.TestCase):
+    def test_parse_diff(self):
+        self.assertEqual(
+            parse_diff(DIFF),
+            {"pkg/a.py": [(4, 5), (12, 12)], "new.py": [(1, 3)]},
+        )
+
+    def test_filter_to_changed_lines(self):
+        violations = lint_source(SOURCE_CODE)
+        kept = filter_to_changed_lines(violations, [(7, 7), (3, 3)])
+        self.assertEqual(
+            sorted(violation.error_code.error_code for violation in kept),
+            # The mutable default's range spans the whole of f()
+            ["S1001", "S1003", "S1004", "S1006"],
+        )
+        self.assertEqual(filter_to_changed_lines(violations, [(5, 5)]), [])
+
+    def test_changed_files_respects_paths_and_globs(self):
+        changed = {"pkg/a.py": [], "pkg/notes.txt": [], "venv/b.py": [], "c.py": []}
+        self.assertEqual(
+            changed_files(changed, [], DEFAULT_INCLUDE, DEFAULT_EXCLUDE),
+            ["c.py", "pkg/a.py"],
+        )
+        self.assertEqual(
+            changed_files(changed, ["pkg"], DEFAULT_INCLUDE, DEFAULT_EXCLUDE),
+            ["pkg/a.py"],
+        )
+
+    @unittest.skipIf(shutil.which("git") is None, "git is not installed")
+    def test_changed_lines_from_git(self):
+        with tempfile.TemporaryDirectory() as repo:
+            git(repo, "init", "-q")
+            for name in ("touched.py", "untouched.py", "deleted.py"):
+                with open(os.path.join(repo, name), "w") as file:
+                    file.write("x = 1\n")
+            git(repo, "add", ".")
+            git(repo, "commit", "-q", "-m", "base")
+
+            with open(os.path.join(repo, "touched.py"), "a") as file:
+                file.write("y = lambda: 0\n")
+            os.remove(os.path.join(repo, "deleted.py"))
+
+            self.assertEqual(changed_lines("HEAD", cwd=repo), {"touched.py": [(2, 2)]})
+
+    def test_unquote_path(self):
+        self.assertEqual(unquote_path("b/a.py"), "b/a.py")
+        self.assertEqual(unquote_path('"b/\\303\\251.py"'), "b/\u00e9.py")
+        self.assertEqual(unquote_path('"b/t\\tq\\"\\\\.py"'), 'b/t\tq"\\.py')
+
+    @unittest.skipIf(shutil.which("git") is None, "git is not installed")
+    def test_changed_lines_ignores_path_config(self):
+        names = ["a b.py", "\u00e9.py", "t\tq.py"]
+        with tempfile.TemporaryDirectory() as repo:
+            git(repo, "init", "-q")
+            for name in names:
+                with open(os.path.join(repo, name), "w") as file:
+                    file.write("x = 1\n")
+            git(repo, "add", ".")
+            git(repo, "commit", "-q", "-m", "base")
+            for name in names:
+                with open(os.path.join(repo, name), "a") as file:
+                    file.write("y = lambda: 0\n")
+
+            for config in [
+                [],
+                ["diff.noprefix", "true"],
+                ["diff.mnemonicPrefix", "true"],
+                ["core.quotePath", "true"],
+            ]:
+                with self.subTest(config=config):
+                    if config:
+                        git(repo, "config", *config)
+                    self.assertEqual(
+                        changed_lines("HEAD", cwd=repo),
+                        {name: [(2, 2)] for name in names},
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
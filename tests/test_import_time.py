@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Each of these takes longer to import than cstlint needs to start up
+HEAVY_MODULES = ("libcst", "attr", "cstlint.visitors", "cstlint.engine")
+
+
+def heavy_modules_imported_by(code: str) -> list[str]:
+    script = textwrap.dedent(code) + textwrap.dedent(
+        f"""
+        import sys
+        print(",".join(
+            name for name in {HEAVY_MODULES!r}
+            if name in sys.modules
+        ))
+        """
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [name for name in completed.stdout.strip().split(",") if name]
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_import(self):
+        self.assertEqual(heavy_modules_imported_by("import cstlint.main"), [])
+
+    def test_files_without_triggers_are_not_parsed(self):
+        code = """
+            from cstlint.runner import LintOptions, lint_data
+            for backend in ("cst", "ast"):
+                result = lint_data("a.py", b"x = 1\\n", LintOptions(backend=backend))
+                assert result.violations == []
+        """
+        self.assertEqual(heavy_modules_imported_by(code), [])
+
+    def test_cache_hits(self):
+        code = """
+            import tempfile
+            from cstlint.cache import ResultCache
+            from cstlint.runner import LintOptions, lint_data, _error_violation
+            from cstlint.violation_error_codes import ViolationErrorCode
+
+            cache = ResultCache(tempfile.mkdtemp(), "fingerprint")
+            data = b"def f(x):\\n    x = lambda: 1\\n"
+            violation = _error_violation(ViolationErrorCode.LAMBDA, "", 2, 8)
+            cache.set(cache.key(data), [violation])
+            result = lint_data("a.py", data, LintOptions(cache=cache))
+            assert result.cached and result.violations == [violation]
+        """
+        self.assertEqual(heavy_modules_imported_by(code), [])
+
+    def test_parsing_imports_libcst(self):
+        code = """
+            from cstlint.runner import lint_data
+            lint_data("a.py", b"f = lambda: 1\\n")
+        """
+        self.assertIn("libcst", heavy_modules_imported_by(code))
+
+
+if __name__ == "__main__":
+    unittest.main()
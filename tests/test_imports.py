@@ -0,0 +1,261 @@
+import ast
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+import libcst as cst
+from cstlint.cache import ResultCache
+from cstlint.imports import ImportAliases
+from cstlint.imports import ImportCache
+from cstlint.imports import ModuleImports
+from cstlint.imports import absolute_bindings
+from cstlint.imports import ast_bindings
+from cstlint.imports import build_import_index
+from cstlint.imports import module_name
+from cstlint.lsp import IncrementalLinter
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_files
+from cstlint.runner import lint_source_code
+from cstlint.visitors import import_bindings
+
+
+SOURCE_CODE = """\
+import os.path
+import attr as a, json
+from . import sibling
+from ..parent import name as alias
+from pkg.mod import *
+if TYPE_CHECKING:
+    from typing import Any
+else:
+    try: import yaml
+    except ImportError: yaml = None
+def f():
+    import sys
+class A:
+    import re
+"""
+
+# A project whose modules import dangerous functions and attr from one
+# another
+PROJECT = {
+    "pkg/__init__.py": "",
+    "pkg/compat.py": (
+        "from builtins import eval as run_code\n"
+        "import attr as attrs\n"
+        "from attr import s as define\n"
+    ),
+    "pkg/api.py": "from .compat import run_code, define\nfrom . import compat\n",
+    "pkg/sub/__init__.py": "",
+    "pkg/sub/user.py": (
+        "from ..api import run_code, define\n"
+        "from pkg import api\n"
+        "\n"
+        "@define(frozen=True)\n"
+        "class A:\n"
+        "    pass\n"
+        "\n"
+        "@api.compat.attrs.s(auto_attribs=True)\n"
+        "class B:\n"
+        "    pass\n"
+        "\n"
+        "run_code('1')\n"
+        "api.compat.run_code('2')\n"
+    ),
+    "script.py": "from pkg.compat import run_code\nrun_code('3')\n",
+}
+
+
+class TestBindings(unittest.TestCase):
+    def test_bindings(self):
+        self.assertEqual(
+            ast_bindings(ast.parse(SOURCE_CODE).body),
+            [
+                ("os", "os", 0),
+                ("a", "attr", 0),
+                ("json", "json", 0),
+                ("sibling", "sibling", 1),
+                ("alias", "parent.name", 2),
+                ("Any", "typing.Any", 0),
+                ("yaml", "yaml", 0),
+            ],
+        )
+
+    def test_cst_bindings_match_ast(self):
+        self.assertEqual(
+            import_bindings(cst.parse_module(SOURCE_CODE).body),
+            ast_bindings(ast.parse(SOURCE_CODE).body),
+        )
+
+    def test_absolute_bindings(self):
+        bindings = ast_bindings(ast.parse(SOURCE_CODE).body)
+        resolved = absolute_bindings(bindings, "pkg.sub.mod")
+        self.assertEqual(resolved["sibling"], "pkg.sub.sibling")
+        self.assertEqual(resolved["alias"], "pkg.parent.name")
+        resolved = absolute_bindings(bindings, "pkg.sub", is_package=True)
+        self.assertEqual(resolved["sibling"], "pkg.sub.sibling")
+        self.assertEqual(resolved["alias"], "pkg.parent.name")
+        # Beyond the top-level package, or from modules of unknown name
+        self.assertNotIn("alias", absolute_bindings(bindings, "mod"))
+        self.assertNotIn("sibling", absolute_bindings(bindings))
+
+    def test_qualified_name(self):
+        aliases = ImportAliases(
+            {"e": "builtins.eval", "a": "attr", "api": "pkg.api"},
+            {"pkg.api.define": "attr.s"},
+        )
+        self.assertEqual(aliases.qualified_name("e"), "builtins.eval")
+        self.assertEqual(aliases.qualified_name("a.s"), "attr.s")
+        self.assertEqual(aliases.qualified_name("api.define"), "attr.s")
+        self.assertEqual(aliases.qualified_name("api.other"), "pkg.api.other")
+        self.assertEqual(aliases.qualified_name("exec"), "builtins.exec")
+        self.assertEqual(aliases.qualified_name("attr.s"), "attr.s")
+
+
+class TestImportIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.paths = []
+        for name, source_code in PROJECT.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(source_code)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_module_name(self):
+        self.assertEqual(
+            module_name(self.path("pkg/sub/user.py")), ("pkg.sub.user", False)
+        )
+        self.assertEqual(
+            module_name(self.path("pkg/sub/__init__.py")), ("pkg.sub", True)
+        )
+        self.assertEqual(module_name(self.path("script.py")), ("script", False))
+
+    def test_resolve(self):
+        index = build_import_index(self.paths)
+        self.assertEqual(index.resolve("pkg.api.run_code"), "builtins.eval")
+        self.assertEqual(index.resolve("pkg.sub.user.define"), "attr.s")
+        self.assertEqual(index.resolve("pkg.api.compat.attrs.s"), "attr.s")
+        self.assertEqual(index.resolve("pkg.api.other"), "pkg.api.other")
+
+    def test_project_imports(self):
+        project = build_import_index(self.paths).project_imports(["S1001", "S1005"])
+        self.assertEqual(project.exports["pkg.api.compat.run_code"], "builtins.eval")
+        self.assertEqual(project.exports["pkg.compat.attrs"], "attr")
+        self.assertEqual(project.triggers["S1001"], ("run_code",))
+        self.assertIn("define", project.triggers["S1005"])
+        # Only what the enabled rules look for
+        lambdas = build_import_index(self.paths).project_imports(["S1003"])
+        self.assertEqual(lambdas.exports, {})
+
+    def test_lint_with_index(self):
+        paths = [self.path("pkg/sub/user.py"), self.path("script.py")]
+        for backend in ("cst", "ast"):
+            options = LintOptions(backend=backend)
+            without = [result.to_dict() for result in lint_files(paths, 1, options)]
+            self.assertEqual(without[0]["violations"], [])
+            for jobs in (1, 2):
+                with self.subTest(backend=backend, jobs=jobs):
+                    index = build_import_index(self.paths, jobs)
+                    project = index.project_imports(options.rules)
+                    results = lint_files(paths, jobs, replace(options, imports=project))
+                    [user, script] = [
+                        [
+                            (violation.error_code.error_code, violation.line_number)
+                            for violation in result.violations
+                        ]
+                        for result in results
+                    ]
+                    self.assertEqual(user, [("S1001", 12), ("S1001", 13), ("S1005", 5)])
+                    self.assertEqual(script, [("S1001", 2)])
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ImportCache(cache_dir)
+            with mock.patch("ast.parse", wraps=ast.parse) as parse:
+                first = build_import_index(self.paths, cache=cache)
+                # Entries are by content, which both __init__.py share
+                num_sources = len(set(PROJECT.values()))
+                self.assertEqual(parse.call_count, num_sources)
+                # Only changed files are parsed again
+                with open(self.path("pkg/api.py"), "a") as file:
+                    file.write("from builtins import exec\n")
+                second = build_import_index(self.paths, cache=cache)
+                self.assertEqual(parse.call_count, num_sources + 1)
+        self.assertEqual(first.modules["pkg.compat"], second.modules["pkg.compat"])
+        self.assertEqual(second.modules["pkg.api"]["exec"], "builtins.exec")
+
+    def test_results_depend_on_the_index(self):
+        path = self.path("pkg/sub/user.py")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResultCache(cache_dir, "fingerprint")
+            with open(path, "rb") as file:
+                data = file.read()
+            index = build_import_index(self.paths)
+            project = index.project_imports(LintOptions().rules)
+            imports = ModuleImports.for_path(path, project)
+            self.assertNotEqual(cache.key(data), cache.key(data, imports.cache_context))
+            other = replace(project, digest="other")
+            self.assertNotEqual(
+                imports.cache_context,
+                ModuleImports.for_path(path, other).cache_context,
+            )
+
+
+class TestSplitModules(unittest.TestCase):
+    SOURCE_CODE = (
+        "from builtins import eval as e\n"
+        "import attr as a\n"
+        "\n"
+        "@a.s(repr=True)\n"
+        "class A:\n"
+        "    pass\n"
+        "\n"
+        "e('1')\n"
+    )
+
+    def test_split_modules_match_whole(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "module.py")
+            with open(path, "w") as file:
+                file.write(self.SOURCE_CODE * 5)
+            for backend in ("cst", "ast"):
+                with self.subTest(backend=backend):
+                    options = LintOptions(backend=backend)
+                    [expected] = lint_files([path], 1, options)
+                    self.assertEqual(len(expected.violations), 15)
+                    split_options = replace(options, split_threshold=5)
+                    [result] = lint_files([path], 2, split_options)
+                    self.assertEqual(result.violations, expected.violations)
+
+    def test_incremental_linter_resolves_imports_of_other_chunks(self):
+        for backend in ("cst", "ast"):
+            with self.subTest(backend=backend):
+                options = LintOptions(backend=backend)
+                linter = IncrementalLinter(options)
+                # Editing the imports lints every statement again
+                edited = self.SOURCE_CODE.replace("eval as e", "exec as f")
+                for source_code, num_violations in [
+                    (self.SOURCE_CODE, 3),
+                    (edited, 2),
+                ]:
+                    expected = lint_source_code(source_code, options)
+                    self.assertEqual(len(expected), num_violations)
+                    self.assertEqual(
+                        sorted(linter.lint(source_code), key=repr),
+                        sorted(expected, key=repr),
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,289 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from cstlint.chunks import merge_chunks
+from cstlint.chunks import split_lines
+from cstlint.chunks import split_module
+from cstlint.chunks import update_chunks
+from cstlint.lsp import IncrementalLinter
+from cstlint.lsp import LanguageServer
+from cstlint.lsp import read_message
+from cstlint.lsp import write_message
+from cstlint.runner import lint_source_code
+
+
+SOURCE_CODE = """\
+import os
+
+# Goes with the statement before it
+@decorator
+def f(x, y=[]):
+    return lambda: 0
+
+if x:
+    pass
+else:
+    eval('1')
+
+try:
+    pass
+except ValueError:
+    pass
+z = lambda: 0  # noqa
+"""
+
+URI = "file:///tmp/module.py"
+
+
+class TestChunks(unittest.TestCase):
+    def test_split_module(self):
+        chunks = split_module(SOURCE_CODE)
+        self.assertEqual([chunk.start_line for chunk in chunks], [1, 4, 8, 13, 17])
+        self.assertEqual("".join(chunk.text for chunk in chunks), SOURCE_CODE)
+        self.assertTrue(chunks[1].text.startswith("@decorator\n"))
+        self.assertTrue(chunks[2].text.endswith("eval('1')\n\n"))
+
+    def test_unclosed_bracket_runs_to_the_end(self):
+        chunks = split_module("x = 1\ny = (\nz = 2\n")
+        self.assertEqual([chunk.start_line for chunk in chunks], [1, 2])
+
+    def test_merge_chunks(self):
+        merged = merge_chunks(split_module(SOURCE_CODE), 5)
+        self.assertEqual([chunk.start_line for chunk in merged], [1, 8, 13])
+        self.assertEqual("".join(chunk.text for chunk in merged), SOURCE_CODE)
+
+    def test_update_matches_split(self):
+        lines = split_lines(SOURCE_CODE)
+        chunks = split_module(SOURCE_CODE)
+        edits = [
+            # An edit inside a statement
+            (5, 6, ["def f(x, y={}):\n"]),
+            # A clause continuing the statement before it
+            (12, 12, ["else:\n", "    pass\n"]),
+            # A decorator joining the statement after it
+            (7, 7, ["@decorator\n"]),
+            # A bracket left open, which swallows the rest of the module
+            (1, 1, ["x = (\n"]),
+            (0, len(lines), []),
+        ]
+        for start, end, new in edits:
+            with self.subTest(start=start, new=new):
+                new_lines = lines[:start] + new + lines[end:]
+                updated = update_chunks(chunks, lines, new_lines)
+                expected = split_module("".join(new_lines))
+                self.assertEqual(updated, expected)
+
+
+class TestIncrementalLinter(unittest.TestCase):
+    def test_matches_full_lint(self):
+        linter = IncrementalLinter()
+        source_code = SOURCE_CODE
+        for old, new in [
+            ("", ""),
+            ("import os\n", "import os\n\nw = lambda: 1\n"),
+            ("eval('1')", "pass"),
+            ("y=[]", "y=None"),
+            ("z = lambda: 0  # noqa\n", ""),
+        ]:
+            source_code = source_code.replace(old, new)
+            with self.subTest(new=new):
+                self.assertEqual(
+                    sorted(linter.lint(source_code), key=repr),
+                    sorted(lint_source_code(source_code), key=repr),
+                )
+
+    def test_syntax_errors_only_hide_their_statement(self):
+        linter = IncrementalLinter()
+        source_code = SOURCE_CODE.replace("if x:", "if x")
+        [syntax_error] = lint_source_code(source_code)
+        expected = lint_source_code(SOURCE_CODE)[1:3] + [syntax_error]
+        self.assertEqual(
+            [(v.error_code, v.line_number) for v in linter.lint(source_code)],
+            [(v.error_code, v.line_number) for v in expected],
+        )
+
+    def test_only_edited_statements_are_linted(self):
+        linter = IncrementalLinter()
+        first = linter.lint(SOURCE_CODE)
+        edited = SOURCE_CODE.replace("import os\n", "import os\n\n")
+        with mock.patch(
+            "cstlint.lsp.lint_source_code", wraps=lint_source_code
+        ) as lint:
+            violations = linter.lint(edited)
+        self.assertEqual(lint.call_count, 1)
+        self.assertEqual(
+            [violation.line_number for violation in violations],
+            [violation.line_number + 1 for violation in first],
+        )
+
+    def test_stale_versions_are_abandoned(self):
+        linter = IncrementalLinter()
+        is_stale = mock.Mock(return_value=True)
+        self.assertIsNone(linter.lint(SOURCE_CODE, is_stale))
+        self.assertEqual(
+            sorted(linter.lint(SOURCE_CODE), key=repr),
+            sorted(lint_source_code(SOURCE_CODE), key=repr),
+        )
+
+
+class Client:
+    def __init__(self, debounce):
+        server_input, self.input = os.pipe()
+        self.output, server_output = os.pipe()
+        self.server_input = os.fdopen(server_input, "rb")
+        self.server_output = os.fdopen(server_output, "wb")
+        self.input = os.fdopen(self.input, "wb")
+        self.output = os.fdopen(self.output, "rb")
+        self.server = LanguageServer(
+            self.server_input, self.server_output, debounce=debounce
+        )
+        self.exit_code = None
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+
+    def serve(self):
+        self.exit_code = self.server.serve()
+        self.server_output.close()
+
+    def close(self):
+        self.input.close()
+        self.thread.join(5)
+        self.output.close()
+        self.server_input.close()
+
+    def send(self, method, params=None, request_id=None):
+        message = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+        if request_id is not None:
+            message["id"] = request_id
+        write_message(self.input, message)
+
+    def change(self, version, text):
+        self.send(
+            "textDocument/didChange",
+            {
+                "textDocument": {"uri": URI, "version": version},
+                "contentChanges": [{"text": text}],
+            },
+        )
+
+    def receive(self):
+        return read_message(self.output)
+
+
+class TestLanguageServer(unittest.TestCase):
+    def setUp(self):
+        self.client = Client(debounce=0.2)
+        self.addCleanup(self.client.close)
+
+    def test_session(self):
+        client = self.client
+        client.send("initialize", {"capabilities": {}}, request_id=1)
+        response = client.receive()
+        self.assertEqual(response["id"], 1)
+        self.assertEqual(
+            response["result"]["capabilities"]["textDocumentSync"]["change"], 1
+        )
+        client.send("initialized")
+
+        client.send(
+            "textDocument/didOpen",
+            {
+                "textDocument": {
+                    "uri": URI,
+                    "languageId": "python",
+                    "version": 1,
+                    "text": "",
+                }
+            },
+        )
+        # Within the debounce delay, so only the last version is linted
+        client.change(2, "x = lambda: 0\n")
+        client.change(3, SOURCE_CODE)
+        diagnostics = client.receive()
+        self.assertEqual(diagnostics["method"], "textDocument/publishDiagnostics")
+        self.assertEqual(diagnostics["params"]["version"], 3)
+        expected = lint_source_code(SOURCE_CODE)
+        self.assertEqual(
+            sorted(
+                (d["code"], d["range"]["start"]["line"] + 1, d["severity"])
+                for d in diagnostics["params"]["diagnostics"]
+            ),
+            sorted((v.error_code.error_code, v.line_number, 2) for v in expected),
+        )
+
+        client.change(4, "def f(:\n")
+        [diagnostic] = client.receive()["params"]["diagnostics"]
+        self.assertEqual((diagnostic["code"], diagnostic["severity"]), ("E0001", 1))
+
+        client.send("textDocument/didClose", {"textDocument": {"uri": URI}})
+        self.assertEqual(client.receive()["params"]["diagnostics"], [])
+
+        client.send("textDocument/hover", {}, request_id=2)
+        self.assertEqual(client.receive()["error"]["code"], -32601)
+        client.send("shutdown", request_id=3)
+        self.assertEqual(client.receive(), {"jsonrpc": "2.0", "id": 3, "result": None})
+        client.send("exit")
+        client.thread.join(5)
+        self.assertEqual(client.exit_code, 0)
+
+    def open_and_receive(self, text):
+        document = {"uri": URI, "languageId": "python", "version": 1, "text": text}
+        self.client.send("textDocument/didOpen", {"textDocument": document})
+        return self.client.receive()["params"]["diagnostics"]
+
+    def test_utf16_columns(self):
+        self.client.send("initialize", {"capabilities": {}}, request_id=1)
+        capabilities = self.client.receive()["result"]["capabilities"]
+        self.assertEqual(capabilities["positionEncoding"], "utf-16")
+        # The emoji is a surrogate pair in UTF-16
+        [diagnostic] = self.open_and_receive("x = ('\U0001f600', lambda: 0)\n")
+        self.assertEqual(
+            diagnostic["range"],
+            {
+                "start": {"line": 0, "character": 11},
+                "end": {"line": 0, "character": 20},
+            },
+        )
+
+    def test_utf32_columns(self):
+        general = {"positionEncodings": ["utf-32", "utf-16"]}
+        self.client.send(
+            "initialize", {"capabilities": {"general": general}}, request_id=1
+        )
+        capabilities = self.client.receive()["result"]["capabilities"]
+        self.assertEqual(capabilities["positionEncoding"], "utf-32")
+        [diagnostic] = self.open_and_receive("x = ('\U0001f600', lambda: 0)\n")
+        self.assertEqual(diagnostic["range"]["start"]["character"], 10)
+        self.assertEqual(diagnostic["range"]["end"]["character"], 19)
+
+    def test_survives_malformed_messages(self):
+        client = self.client
+        client.send("initialize", {"capabilities": ["general"]}, request_id=1)
+        self.assertEqual(client.receive()["error"]["code"], -32602)
+        # Notifications can't be answered, their errors are logged
+        client.send("textDocument/didOpen", {"textDocument": {"uri": URI}})
+        log = client.receive()
+        self.assertEqual(log["method"], "window/logMessage")
+        self.assertIn("textDocument/didOpen", log["params"]["message"])
+        write_message(client.input, ["not", "an", "object"])
+        self.assertEqual(client.receive()["error"]["code"], -32600)
+
+        [diagnostic] = self.open_and_receive("x = lambda: 0\n")
+        self.assertEqual(diagnostic["code"], "S1003")
+        client.send(
+            "textDocument/didChange", {"textDocument": {"uri": URI, "version": 2}}
+        )
+        self.assertEqual(client.receive()["method"], "window/logMessage")
+        client.send("shutdown", request_id=2)
+        self.assertEqual(client.receive(), {"jsonrpc": "2.0", "id": 2, "result": None})
+
+    def test_exit_without_shutdown(self):
+        self.client.send("exit")
+        self.client.thread.join(5)
+        self.assertEqual(self.client.exit_code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,8 @@ class TestNestedFunctionsVisitor(unittest.TestCase):
         ("def a():\n    def b():\n        def c():\n            pass", 2),
         ("if x > 0:\n    def b():\n        pass", 0),
         ("class Dog:\n    def __init__(self):\n        pass", 0),
+        ("def a():\n    class B:\n        def c(self):\n            pass", 1),
+        ("def a(): pass\ndef b():\n    if b:\n        def c(): pass", 1),
     ]
 
     def test_usage(self):
@@ -0,0 +1,96 @@
+import unittest
+
+import libcst as cst
+from cstlint.engine import lint_source
+from cstlint.patterns import Pattern
+from cstlint.patterns import PatternTable
+from cstlint.visitors import StyleViolationsVisitor
+from cstlint.violation_error_codes import ViolationErrorCode
+
+
+SOURCE_CODE = """\
+eval("1")
+os.system("ls")
+print(exec, input())
+
+def f(a, b=[], *, c={}):
+    return lambda x=set(): x
+"""
+
+
+class BannedCallsVisitor(StyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = ViolationErrorCode.DANGEROUS_FUNCTION
+    PATTERNS = (
+        Pattern("Call", "func", names=frozenset(["eval", "input"]), message="{}"),
+        Pattern("Call", "func.attr", names=frozenset(["system"])),
+    )
+
+
+class PrintVisitor(StyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = ViolationErrorCode.DANGEROUS_FUNCTION
+    PATTERNS = (
+        Pattern("Call", "func", names=frozenset(["print", "eval"]), message="print"),
+        Pattern("Call", "args.*.value", types=frozenset(["Name"]), message="arg"),
+    )
+
+
+class DefaultsVisitor(StyleViolationsVisitor):
+    VIOLATION_ERROR_CODE = ViolationErrorCode.MUTABLE_DEFAULT_ARG
+    PATTERNS = (
+        Pattern("FunctionDef", "params.kwonly_params.*.default"),
+        Pattern("Lambda"),
+    )
+
+
+def positions(violations):
+    return [
+        (v.line_number, v.column_number, v.message_template) for v in violations
+    ]
+
+
+class TestPatterns(unittest.TestCase):
+    def test_name_sets_are_merged(self):
+        table = PatternTable([BannedCallsVisitor.PATTERNS, PrintVisitor.PATTERNS])
+        self.assertEqual(list(table.matchers), ["Call"])
+        # One matcher per distinct path
+        func, func_attr, args = table.matchers["Call"]
+        self.assertEqual(func.by_name["eval"], [(0, 0, "{}"), (2, 1, "print")])
+        self.assertEqual(set(func.by_name), {"eval", "input", "print"})
+        self.assertEqual(func_attr.by_name, {"system": [(1, 0, "")]})
+
+        call = cst.parse_expression("print(exec, input())")
+        self.assertEqual(
+            table.match(call, table.matchers["Call"]), [(1, "print"), (1, "arg")]
+        )
+
+    def test_rules_run_together_or_alone(self):
+        rules = (BannedCallsVisitor, PrintVisitor, DefaultsVisitor)
+        for rule in rules:
+            with self.subTest(rule=rule.__name__):
+                self.assertEqual(
+                    positions(lint_source(SOURCE_CODE, (rule,))),
+                    positions(rule.parse_and_evaluate_violations(SOURCE_CODE)),
+                )
+        self.assertEqual(
+            positions(lint_source(SOURCE_CODE, rules)),
+            [
+                (1, 0, "{}"),
+                (2, 0, ""),
+                (3, 12, "{}"),
+                (1, 0, "print"),
+                (3, 0, "print"),
+                (3, 0, "arg"),
+                (5, 0, ""),
+                (6, 11, ""),
+            ],
+        )
+
+    def test_invalid_patterns(self):
+        with self.assertRaises(ValueError):
+            Pattern("Call", "func", names=frozenset(["f"]), types=frozenset(["Name"]))
+        with self.assertRaises(ValueError):
+            Pattern("Call", "*.value")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import io
+import mmap
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from cstlint.pipeline import MMAP_THRESHOLD
+from cstlint.pipeline import Prefetcher
+from cstlint.pipeline import QueuedStream
+from cstlint.pipeline import read_file
+from cstlint.runner import LintOptions
+from cstlint.runner import decode_source
+from cstlint.runner import lint_data
+from cstlint.runner import lint_files
+
+
+SOURCE_CODE = b"def f(x, y=[]):\n    x = lambda: eval('1')\n"
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.paths = [f"{idx}.py" for idx in range(20)]
+        self.lock = threading.Lock()
+        self.held = 0
+        self.max_held = 0
+
+    def read(self, path):
+        if path == "5.py":
+            raise OSError("unreadable")
+        with self.lock:
+            self.held += 1
+            self.max_held = max(self.max_held, self.held)
+        # Slow reads, so that reads overlap
+        time.sleep(0.005)
+        return path.encode()
+
+    def test_in_order_and_bounded(self):
+        prefetcher = Prefetcher(self.paths, 4, read=self.read)
+        results = []
+        for path, data in prefetcher:
+            results.append((path, data))
+            if not isinstance(data, OSError):
+                with self.lock:
+                    self.held -= 1
+            prefetcher.release()
+        self.assertEqual([path for path, _ in results], self.paths)
+        self.assertIsInstance(results[5][1], OSError)
+        self.assertEqual(results[6][1], b"6.py")
+        self.assertLessEqual(self.max_held, 4)
+        self.assertGreater(self.max_held, 1)
+
+    def test_close_unblocks_other_threads(self):
+        prefetcher = Prefetcher(self.paths, 2, read=self.read)
+        consumed = []
+        thread = threading.Thread(target=consumed.extend, args=(prefetcher,))
+        thread.start()
+        # Nothing is released, so the thread waits for a slot until closed
+        time.sleep(0.2)
+        prefetcher.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(len(consumed), len(self.paths))
+
+
+class TestReading(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_large_files_are_mapped(self):
+        # Padded with a comment, which is quick to parse
+        data = SOURCE_CODE + b"#" * MMAP_THRESHOLD + b"\n"
+        path = self.write("large.py", data)
+        mapped = read_file(path)
+        self.assertIsInstance(mapped, mmap.mmap)
+        self.assertEqual(decode_source(mapped), data.decode())
+        mapped.close()
+        expected = lint_data(path, data).violations
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                [result] = lint_files([path], jobs)
+                self.assertEqual(result.violations, expected)
+
+    def test_encodings(self):
+        self.assertEqual(decode_source(b"\xef\xbb\xbfx = 1\r\n"), "x = 1\n")
+        latin_1 = "# -*- coding: latin-1 -*-\nx = 'é'\n"
+        self.assertEqual(decode_source(latin_1.encode("latin-1")), latin_1)
+        # Only the first two lines can declare an encoding
+        late_cookie = "x = 1\n\n# coding: latin-1\ny = 'é'\n"
+        self.assertEqual(decode_source(late_cookie.encode()), late_cookie)
+        with self.assertRaises(UnicodeError):
+            decode_source(b"# coding: no-such-encoding\nx = 1\n")
+
+        result = lint_data("a.py", latin_1.encode("latin-1") + b"eval('\xe9')\n")
+        self.assertEqual(
+            [v.error_code.error_code for v in result.violations], ["S1001"]
+        )
+
+    def test_prefetched_pool_matches_serial(self):
+        paths = [self.write(f"{idx}.py", SOURCE_CODE * idx) for idx in range(10)]
+        paths.insert(3, os.path.join(self.tmp_dir.name, "missing.py"))
+        options = LintOptions(with_lines=True)
+        expected = [result.to_dict() for result in lint_files(paths, 1, options)]
+        self.assertEqual(expected[3]["violations"][0]["code"], "E0002")
+        with mock.patch("cstlint.runner.MAX_PREFETCH_CHUNK", 1):
+            results = [result.to_dict() for result in lint_files(paths, 3, options)]
+        self.assertEqual(results, expected)
+
+
+class TestQueuedStream(unittest.TestCase):
+    def test_writes_in_order(self):
+        stream = io.StringIO()
+        with QueuedStream(stream, max_pending=2) as queued:
+            for idx in range(100):
+                queued.write(f"{idx}\n")
+            queued.flush()
+            self.assertEqual(stream.getvalue().split(), [str(i) for i in range(100)])
+
+    def test_errors_are_raised(self):
+        stream = io.StringIO()
+        stream.close()
+        queued = QueuedStream(stream)
+        queued.write("lost\n")
+        with self.assertRaises(ValueError):
+            queued.flush()
+        queued.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from cstlint.engine import DEFAULT_RULES
+from cstlint.profiling import FileProfile
+from cstlint.profiling import ProfileReport
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.runner import lint_files
+
+
+SOURCE_CODE = b"""
+def f(x, y=[]):
+    x = lambda: eval('1')
+    def g():
+        pass
+
+@attr.s(auto_attribs=True)
+class A:
+    pass
+"""
+
+
+class TestProfiling(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(lint_data("a.py", SOURCE_CODE).profile)
+
+    def test_phases_and_rules(self):
+        for backend in ("cst", "ast"):
+            with self.subTest(backend=backend):
+                options = LintOptions(backend=backend, profile=True)
+                result = lint_data("a.py", SOURCE_CODE, options)
+                self.assertEqual(
+                    result.violations, lint_data("a.py", SOURCE_CODE).violations
+                )
+
+                profile = result.profile
+                self.assertTrue({"decode", "parse"} <= set(profile.phases))
+                self.assertEqual(
+                    set(profile.rules), {rule.__name__ for rule in DEFAULT_RULES}
+                )
+                self.assertGreater(profile.nodes, 10)
+                # Nested measurements are excluded from the enclosing ones, so
+                # phases and rules add up to no more than the total
+                measured = sum(
+                    timing.wall
+                    for timings in (profile.phases, profile.rules)
+                    for timing in timings.values()
+                )
+                self.assertLessEqual(measured, profile.total.wall)
+
+    def test_metadata_is_only_resolved_for_violations(self):
+        options = LintOptions(profile=True)
+        clean = lint_data("a.py", b"def f(x):\n    return x\n", options)
+        self.assertNotIn("metadata", clean.profile.phases)
+        violating = lint_data("b.py", SOURCE_CODE, options)
+        self.assertIn("metadata", violating.profile.phases)
+
+    def test_peak_memory(self):
+        self.addCleanup(tracemalloc.stop)
+        options = LintOptions(profile=True, profile_memory=True)
+        profile = lint_data("a.py", SOURCE_CODE, options).profile
+        self.assertGreater(profile.total.peak_memory, 0)
+        self.assertGreaterEqual(
+            profile.total.peak_memory, profile.phases["parse"].peak_memory
+        )
+
+    def test_profiles_from_workers_and_report(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for idx in range(4):
+                paths.append(os.path.join(tmp_dir, f"{idx}.py"))
+                with open(paths[-1], "wb") as file:
+                    file.write(SOURCE_CODE)
+            results = list(lint_files(paths, jobs=2, options=LintOptions(profile=True)))
+
+        report = ProfileReport()
+        for result in results:
+            self.assertIn("read", result.profile.phases)
+            report.add(result.profile)
+        self.assertEqual(report.nodes, 4 * results[0].profile.nodes)
+        self.assertEqual(report.phases["parse"].calls, 4)
+
+        data = json.loads(json.dumps(report.to_dict()))
+        self.assertEqual(FileProfile.from_dict(data["files"][0]), results[0].profile)
+        output = io.StringIO()
+        report.print_summary(output)
+        self.assertIn("LambdaVisitor", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
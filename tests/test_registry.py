@@ -0,0 +1,44 @@
+import unittest
+
+from cstlint.engine import DEFAULT_RULES
+from cstlint.registry import DEFAULT_RULE_CODES
+from cstlint.registry import RULES
+from cstlint.registry import load_rules
+from cstlint.registry import rules_for_source
+from cstlint.registry import select_rules
+
+
+class TestRegistry(unittest.TestCase):
+    def test_specs_match_rules(self):
+        for code, spec in RULES.items():
+            with self.subTest(code=code):
+                rule = spec.load()
+                self.assertEqual(rule.VIOLATION_ERROR_CODE.error_code, code)
+                self.assertEqual(rule.TRIGGERS, spec.triggers)
+                self.assertEqual(rule.MODULE_WIDE, spec.module_wide)
+                self.assertEqual(rule.IMPORTS, spec.imports)
+        self.assertEqual(load_rules(DEFAULT_RULE_CODES), DEFAULT_RULES)
+
+    def test_select_and_ignore(self):
+        self.assertEqual(select_rules(), DEFAULT_RULE_CODES)
+        self.assertEqual(select_rules(["S1003", "S1001"]), ("S1001", "S1003"))
+        self.assertEqual(
+            select_rules(["S100"], ["S1002", "S1005"]),
+            ("S1001", "S1003", "S1004", "S1006"),
+        )
+        with self.assertRaises(ValueError):
+            select_rules(["S9"])
+
+    def test_rules_for_source(self):
+        self.assertEqual(
+            rules_for_source("f = lambda: eval(x)\n", DEFAULT_RULE_CODES),
+            ["S1001", "S1003"],
+        )
+        self.assertEqual(
+            rules_for_source("run(x)\n", DEFAULT_RULE_CODES, {"S1001": ("run",)}),
+            ["S1001"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+from cstlint import runner
+from cstlint.files import expand_paths
+from cstlint.registry import RULES
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_files
+from cstlint.violation_error_codes import ViolationErrorCode
+
+
+FILES = {
+    "a.py": "eval('1')\n",
+    "pkg/b.py": "def f(x):\n    x = 1\n",
+    "pkg/c.py": "f = lambda: 0\ng = lambda: 1\n",
+    "pkg/clean.py": "x = 1\n",
+    "pkg/broken.py": "def (\n",
+    "pkg/notes.txt": "eval('1')\n",
+    "venv/d.py": "eval('1')\n",
+    "gen/e_pb2.py": "eval('1')\n",
+}
+
+LARGE_MODULE = """\
+@decorator
+def f(x, y=[]):
+    x = lambda: eval('1')
+
+if x:
+    g = lambda: 0  # noqa
+else:
+    def g(x):
+        def h():
+            x += 1
+"""
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        for name, source_code in FILES.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(source_code)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def relative(self, paths):
+        return [os.path.relpath(path, self.root) for path in paths]
+
+    def test_expand_paths(self):
+        paths = expand_paths([self.root], exclude=("venv", "*_pb2.py"))
+        self.assertEqual(
+            self.relative(paths),
+            ["a.py", "pkg/b.py", "pkg/broken.py", "pkg/c.py", "pkg/clean.py"],
+        )
+
+    def test_explicit_files_are_kept_and_deduplicated(self):
+        notes = os.path.join(self.root, "pkg", "notes.txt")
+        paths = expand_paths([notes, os.path.join(self.root, "pkg"), notes])
+        self.assertEqual(self.relative(paths)[0], "pkg/notes.txt")
+        self.assertEqual(len(paths), len(set(paths)))
+
+    def test_parallel_matches_serial(self):
+        paths = expand_paths([self.root])
+        serial = [
+            (result.path, [v.format() for v in result.violations])
+            for result in lint_files(paths, jobs=1)
+        ]
+        parallel = [
+            (result.path, [v.format() for v in result.violations])
+            for result in lint_files(paths, jobs=2)
+        ]
+        self.assertEqual(serial, parallel)
+
+    def test_exit_codes_and_syntax_errors(self):
+        paths = expand_paths([os.path.join(self.root, "pkg")])
+        results = {
+            os.path.basename(result.path): result for result in lint_files(paths)
+        }
+        self.assertEqual(results["clean.py"].exit_code, 0)
+        self.assertEqual(results["c.py"].exit_code, 1)
+        self.assertEqual(
+            results["broken.py"].violations[0].error_code,
+            ViolationErrorCode.SYNTAX_ERROR,
+        )
+
+    def write_large_modules(self):
+        paths = []
+        for name, source_code in [
+            ("large.py", LARGE_MODULE * 10),
+            ("large_broken.py", LARGE_MODULE * 5 + "def (\n" + LARGE_MODULE * 5),
+        ]:
+            paths.append(os.path.join(self.root, name))
+            with open(paths[-1], "w") as file:
+                file.write(source_code)
+        return paths
+
+    def test_split_modules_match_whole(self):
+        paths = self.write_large_modules() + expand_paths([self.root])
+        for backend in ("cst", "ast"):
+            options = LintOptions(backend=backend, with_lines=True)
+            expected = [result.to_dict() for result in lint_files(paths, 1, options)]
+            self.assertEqual(len(expected[0]["violations"]), 50)
+            for jobs in (1, 2):
+                with self.subTest(backend=backend, jobs=jobs):
+                    split_options = replace(options, split_threshold=20)
+                    results = [
+                        result.to_dict()
+                        for result in lint_files(paths, jobs, split_options)
+                    ]
+                    self.assertEqual(results, expected)
+
+    def test_module_wide_rules_lint_whole_modules(self):
+        [path, _] = self.write_large_modules()
+        specs = dict(RULES, S1003=replace(RULES["S1003"], module_wide=True))
+        [expected] = lint_files([path])
+        options = LintOptions(split_threshold=20)
+        with mock.patch.dict("cstlint.registry.RULES", specs), mock.patch(
+            "cstlint.runner._lint_part", wraps=runner._lint_part
+        ) as lint_part:
+            [result] = lint_files([path], 1, options)
+        tasks = [task for (task,), _ in lint_part.call_args_list]
+        self.assertEqual(tasks[0], (1, LARGE_MODULE * 10, ("S1003",)))
+        self.assertGreater(len(tasks), 2)
+        self.assertNotIn("S1003", {code for _, _, codes in tasks[1:] for code in codes})
+        self.assertEqual(result.violations, expected.violations)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import gc
+import io
+import time
+import tracemalloc
+import unittest
+
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.writers import TextWriter
+
+# Guards against costs that grow faster than the input, e.g. scanning lists,
+# walking up the enclosing functions of every node or splitting the source
+# once per violation. Each input is linted at two sizes, SCALE apart, and the
+# time and peak memory of the larger one compared to the smaller one's. Both
+# are measured on the same machine in the same run, so only their ratio
+# matters, not how fast the machine is.
+SCALE = 8
+# A linear cost grows SCALE times, a quadratic one SCALE**2 times. Fixed
+# costs keep linear ratios below SCALE, timing noise can push them above.
+MAX_RATIO = 3 * SCALE
+# Timings are the fastest of this many runs, taken alternately at both sizes
+# so that other load on the machine affects both alike
+REPEATS = 3
+
+
+def many_functions(size: int) -> str:
+    lines = ["import os", ""]
+    for idx in range(size):
+        lines.extend(
+            [
+                f"def function_{idx}(arg, other=[]):",
+                "    arg = 1",
+                f"    value = [item * {idx} for item in range(10)]",
+                "    return eval(value)",
+                "",
+            ]
+        )
+    return "\n".join(lines)
+
+
+def deep_nesting(size: int) -> str:
+    # Python allows up to 100 levels of indentation. Tabs keep the module
+    # from growing much faster than its number of statements.
+    lines = []
+    for depth in range(size):
+        indent = "\t" * depth
+        lines.append(f"{indent}def level_{depth}(arg_{depth}, other=[]):")
+        lines.append(f"{indent}\targ_{depth} += 1")
+    lines.append("\t" * size + "return lambda: 0")
+    return "\n".join(lines) + "\n"
+
+
+def many_params(size: int) -> str:
+    # One per line, like formatters put them, so that reporting the source of
+    # each violating line doesn't add up to the square of the size
+    lines = ["def function("]
+    lines.extend(f"    arg_{idx}={{}}," for idx in range(size))
+    lines.append("):")
+    lines.extend(f"    arg_{idx} = arg_{size - idx - 1}" for idx in range(size))
+    lines.append("    (")
+    lines.extend(f"        arg_{idx}," for idx in range(size))
+    lines.append("    ) = ()")
+    return "\n".join(lines) + "\n"
+
+
+def many_violations(size: int) -> str:
+    lines = []
+    for idx in range(size):
+        noqa = "  # noqa: S1001" if idx % 2 else ""
+        lines.append(f"handler_{idx} = lambda x: eval(x) or exec(x){noqa}")
+    return "\n".join(lines) + "\n"
+
+
+def lint_and_write(source_code: bytes, options: LintOptions) -> int:
+    result = lint_data("module.py", source_code, options)
+    stream = io.StringIO()
+    with TextWriter(stream, with_lines=True) as writer:
+        writer.write_result(result)
+    return len(result.violations)
+
+
+def peak_memory(source_code: bytes, options: LintOptions) -> int:
+    tracemalloc.start()
+    try:
+        lint_and_write(source_code, options)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def time_ratio(small: bytes, large: bytes, options: LintOptions) -> float:
+    times = {small: [], large: []}
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(REPEATS):
+            for source_code, source_times in times.items():
+                start = time.perf_counter()
+                lint_and_write(source_code, options)
+                source_times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times[large]) / min(times[small])
+
+
+class TestScaling(unittest.TestCase):
+    def assert_linear(self, generate, cst_size: int, ast_size: int) -> None:
+        """
+        Times are compared at sizes per backend. The ast backend is fast
+        enough to lint sizes at which costs that grow with their square stand
+        out from the linear ones. Memory is measured exactly, and slowly, so
+        it's compared at the smaller sizes for both.
+        """
+        small = generate(cst_size).encode()
+        large = generate(cst_size * SCALE).encode()
+        # Memory also holds copies of the source, which can grow faster than
+        # the number of statements because of indentation
+        max_memory_ratio = MAX_RATIO * max(1, len(large) / len(small) / SCALE)
+        for backend, size in [("cst", cst_size), ("ast", ast_size)]:
+            with self.subTest(generate=generate.__name__, backend=backend):
+                options = LintOptions(backend=backend, with_lines=True)
+                self.assertGreater(lint_and_write(small, options), 0)
+                memory_ratio = peak_memory(large, options) / peak_memory(
+                    small, options
+                )
+                self.assertLess(memory_ratio, max_memory_ratio)
+
+                self.assertLess(
+                    time_ratio(
+                        generate(size).encode(),
+                        generate(size * SCALE).encode(),
+                        options,
+                    ),
+                    MAX_RATIO,
+                )
+
+    def test_many_functions(self):
+        self.assert_linear(many_functions, 20, 160)
+
+    def test_deep_nesting(self):
+        self.assert_linear(deep_nesting, 12, 12)
+
+    def test_many_params(self):
+        self.assert_linear(many_params, 50, 400)
+
+    def test_many_violations(self):
+        self.assert_linear(many_violations, 50, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from cstlint.merge import SORT_KEY
+from cstlint.merge import main as merge_main
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_files
+from cstlint.sharding import file_weights
+from cstlint.sharding import parse_shard
+from cstlint.sharding import select_shard
+from cstlint.writers import JsonStatisticsWriter
+from cstlint.writers import JsonWriter
+
+
+SOURCE_CODE = "def f(x, y=[]):\n    eval('1')\n"
+
+
+class TestSelectShard(unittest.TestCase):
+    def setUp(self):
+        self.paths = [f"src/{idx}.py" for idx in range(50)]
+        self.weights = [float((idx * 37) % 11 + 1) for idx in range(50)]
+
+    def shards(self, count, weights):
+        return [
+            select_shard(self.paths, (index, count), weights)
+            for index in range(1, count + 1)
+        ]
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("0/4", "5/4", "2", "a/b", "1/0"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_shard(value)
+
+    def test_partition(self):
+        for count in (1, 3, 7, 60):
+            with self.subTest(count=count):
+                shards = self.shards(count, self.weights)
+                merged = sorted(path for shard in shards for path in shard)
+                self.assertEqual(merged, sorted(self.paths))
+                for shard in shards:
+                    # In their original order
+                    self.assertEqual(shard, sorted(shard, key=self.paths.index))
+
+    def test_deterministic(self):
+        shards = self.shards(4, self.weights)
+        self.assertEqual(self.shards(4, list(self.weights)), shards)
+        # Doesn't depend on the order of the paths either
+        self.paths.reverse()
+        self.weights.reverse()
+        reordered = self.shards(4, self.weights)
+        self.assertEqual([set(s) for s in reordered], [set(s) for s in shards])
+
+    def test_balanced(self):
+        weight_of = dict(zip(self.paths, self.weights))
+        loads = [
+            sum(weight_of[path] for path in shard)
+            for shard in self.shards(4, self.weights)
+        ]
+        # Greedy assignment is within the heaviest file of even
+        self.assertLessEqual(max(loads) - min(loads), max(self.weights))
+
+    def test_timings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for idx, size in enumerate((100, 200, 300)):
+                paths.append(os.path.join(tmp_dir, f"{idx}.py"))
+                with open(paths[-1], "w") as file:
+                    file.write("#" * size)
+            self.assertEqual(file_weights(paths), [100.0, 200.0, 300.0])
+            # 0.1s for 100 bytes, so the others are estimated at 1ms per byte
+            weights = file_weights(paths, {paths[0]: 0.1, "gone.py": 5.0})
+            self.assertEqual(weights[0], 0.1)
+            self.assertAlmostEqual(weights[1], 0.2)
+            self.assertAlmostEqual(weights[2], 0.3)
+            # The slow small file gets a shard of its own
+            timings = {paths[0]: 10.0, paths[1]: 1.0, paths[2]: 1.0}
+            weights = file_weights(paths, timings)
+            self.assertEqual(select_shard(paths, (1, 2), weights), [paths[0]])
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.paths = []
+        for idx in range(7):
+            self.paths.append(os.path.join(self.tmp_dir.name, f"{idx}.py"))
+            with open(self.paths[-1], "w") as file:
+                file.write(SOURCE_CODE * (idx + 1) if idx % 3 else "x = 1\n")
+
+    def write_report(self, name, paths, shard=None):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as stream:
+            with JsonWriter(stream, with_lines=True, shard=shard) as writer:
+                for result in lint_files(paths, 1, LintOptions(with_lines=True)):
+                    writer.write_result(result)
+        return path
+
+    def run_shards(self, count):
+        return [
+            self.write_report(
+                f"shard-{index}.json",
+                select_shard(self.paths, (index, count)),
+                (index, count),
+            )
+            for index in range(1, count + 1)
+        ]
+
+    def merge(self, reports):
+        output = os.path.join(self.tmp_dir.name, "merged.json")
+        with redirect_stderr(StringIO()) as stderr:
+            exit_code = merge_main(reports + ["-o", output])
+        if exit_code == 2:
+            return exit_code, stderr.getvalue()
+        with open(output, "r") as file:
+            return exit_code, json.load(file)
+
+    def test_round_trip(self):
+        with open(self.write_report("full.json", self.paths), "r") as file:
+            expected = json.load(file)
+        self.assertEqual(expected["shard"], None)
+        # Rules report violations in their own order, merge sorts them
+        expected["violations"].sort(key=SORT_KEY)
+
+        for count in (1, 3):
+            with self.subTest(count=count):
+                reports = self.run_shards(count)
+                exit_code, merged = self.merge(reports[::-1])
+                self.assertEqual(exit_code, 1)
+                self.assertEqual(merged, expected)
+
+    def test_clean_run(self):
+        report = self.write_report("clean.json", [self.paths[0]], (1, 1))
+        empty = {"version": 1, "shard": None, "violations": []}
+        self.assertEqual(self.merge([report]), (0, empty))
+
+    def test_incomplete_runs(self):
+        reports = self.run_shards(3)
+        other_run = self.write_report("other.json", self.paths[:1], (1, 2))
+        for given, error in [
+            (reports[:2], "Missing shards: 3/3"),
+            (reports + reports[1:2], "more than once: 2/3"),
+            (reports + [other_run], "different shard counts"),
+            (reports + [self.write_report("full.json", self.paths)], "unsharded"),
+        ]:
+            with self.subTest(error=error):
+                exit_code, stderr = self.merge(given)
+                self.assertEqual(exit_code, 2)
+                self.assertIn(error, stderr)
+
+    def write_statistics(self, name, paths, shard=None):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as stream:
+            with JsonStatisticsWriter(stream, shard=shard) as writer:
+                for result in lint_files(paths):
+                    writer.write_result(result)
+        return path
+
+    def test_statistics(self):
+        with open(self.write_statistics("full.json", self.paths), "r") as file:
+            expected = json.load(file)
+        self.assertEqual(expected["kind"], "statistics")
+        reports = [
+            self.write_statistics(
+                f"shard-{index}.json", select_shard(self.paths, (index, 3)), (index, 3)
+            )
+            for index in range(1, 4)
+        ]
+        self.assertEqual(self.merge(reports), (1, expected))
+        exit_code, stderr = self.merge(reports[:2])
+        self.assertEqual(exit_code, 2)
+        self.assertIn("Missing shards: 3/3", stderr)
+        # Not to be mixed up with the violations
+        violations = self.write_report(
+            "violations.json", select_shard(self.paths, (3, 3)), (3, 3)
+        )
+        exit_code, stderr = self.merge(reports[:2] + [violations])
+        self.assertEqual(exit_code, 2)
+        self.assertIn("Can't merge statistics and violation reports", stderr)
+        exit_code, stderr = self.merge(reports + ["--format", "sarif"])
+        self.assertEqual(exit_code, 2)
+        self.assertIn("--format text or json", stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
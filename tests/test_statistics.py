@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from cstlint.cache import ResultCache
+from cstlint.runner import LintOptions
+from cstlint.runner import count_file
+from cstlint.runner import count_files
+from cstlint.runner import lint_files
+from cstlint.statistics import Statistics
+from cstlint.statistics import count_violations
+from cstlint.writers import JsonStatisticsWriter
+
+
+SOURCES = {
+    "a.py": "def f(x, y=[]):\n    x = lambda: eval('1')\n",
+    "pkg/b.py": "def f():\n    def g():\n        pass\n",
+    "pkg/sub/c.py": "x = lambda: 0  # noqa\ny = lambda: eval('1')  # noqa: S1001\n",
+    "pkg/sub/d.py": "def f(:\n",
+    "pkg/clean.py": "x = 1\n",
+}
+
+
+class TestStatistics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.paths = []
+        for name, source_code in SOURCES.items():
+            self.paths.append(os.path.join(self.tmp_dir.name, name))
+            os.makedirs(os.path.dirname(self.paths[-1]), exist_ok=True)
+            with open(self.paths[-1], "w") as file:
+                file.write(source_code)
+
+    def expected(self, options):
+        statistics = Statistics()
+        for result in lint_files(self.paths, 1, options):
+            statistics.add(result.path, count_violations(result.violations))
+        return statistics
+
+    def test_counts_match_violations(self):
+        for backend in ("cst", "ast"):
+            for jobs in (1, 2):
+                with self.subTest(backend=backend, jobs=jobs):
+                    options = LintOptions(backend=backend)
+                    statistics = count_files(self.paths, jobs, options)
+                    expected = self.expected(options)
+                    self.assertEqual(statistics.to_dict(), expected.to_dict())
+                    self.assertEqual(statistics.num_files, 5)
+                    self.assertEqual(
+                        statistics.by_code(),
+                        Counter(S1001=1, S1002=1, S1003=2, S1004=1, S1006=1, E0001=1),
+                    )
+
+    def test_no_violations_are_built(self):
+        with mock.patch("cstlint.visitors.StyleViolation") as style_violation:
+            self.assertEqual(sum(count_file(self.paths[0]).values()), 4)
+        style_violation.assert_not_called()
+
+    def test_cached_results(self):
+        cache = ResultCache(self.tmp_dir.name, "fingerprint")
+        options = LintOptions(cache=cache)
+        list(lint_files(self.paths, 1, options))
+        with mock.patch("cstlint.runner._lint_source_code") as lint_source_code:
+            statistics = count_files(self.paths, 1, options)
+        lint_source_code.assert_not_called()
+        self.assertEqual(statistics.to_dict(), self.expected(options).to_dict())
+
+    def test_by_directory(self):
+        statistics = Statistics()
+        statistics.add("a.py", Counter(S1001=1))
+        statistics.add("pkg/b.py", Counter(S1002=2))
+        statistics.add("pkg/sub/c.py", Counter(S1001=1, S1003=1))
+        statistics.add("pkg/clean.py", Counter())
+        self.assertEqual(
+            statistics.by_directory(),
+            {
+                ".": Counter(S1001=2, S1002=2, S1003=1),
+                "pkg": Counter(S1001=1, S1002=2, S1003=1),
+                "pkg/sub": Counter(S1001=1, S1003=1),
+            },
+        )
+        self.assertEqual(statistics.total(), 5)
+        self.assertEqual(statistics.num_files, 4)
+
+    def test_json(self):
+        stream = io.StringIO()
+        with JsonStatisticsWriter(stream, shard=(2, 3)) as writer:
+            for result in lint_files(self.paths):
+                writer.write_result(result)
+        data = json.loads(stream.getvalue())
+        self.assertEqual(data["shard"], "2/3")
+        self.assertEqual(data["total"], 7)
+        self.assertEqual(data["files_checked"], 5)
+        self.assertEqual(data["by_file"][self.paths[1]], {"S1002": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import pickle
+import unittest
+
+from cstlint.style_violation import CodeRange
+from cstlint.style_violation import StyleViolation
+from cstlint.violation_error_codes import ViolationErrorCode
+from cstlint.visitors import NESTED_FUNCTION_MESSAGE
+
+
+class TestStyleViolation(unittest.TestCase):
+    def setUp(self):
+        self.violation = StyleViolation(
+            ViolationErrorCode.NESTED_FUNCTION,
+            3,
+            4,
+            5,
+            12,
+            NESTED_FUNCTION_MESSAGE,
+            ("g", "f"),
+        )
+
+    def test_format(self):
+        self.assertEqual(
+            self.violation.format(),
+            "3:4: S1002: Definition of a function within another function is "
+            "discouraged. Function 'g' is defined within function 'f'.",
+        )
+        lambda_violation = StyleViolation(ViolationErrorCode.LAMBDA, 1, 0, 1, 10)
+        self.assertEqual(
+            lambda_violation.format(),
+            "1:0: S1003: Use of lambda functions is discouraged in favor of named "
+            "functions.",
+        )
+
+    def test_compact(self):
+        self.assertFalse(hasattr(self.violation, "__dict__"))
+        self.assertIs(self.violation.message_template, NESTED_FUNCTION_MESSAGE)
+
+    def test_round_trips(self):
+        for copy in (
+            pickle.loads(pickle.dumps(self.violation)),
+            StyleViolation.from_dict(self.violation.to_dict()),
+        ):
+            self.assertEqual(copy, self.violation)
+            self.assertEqual(copy.format(), self.violation.format())
+        self.assertEqual(
+            self.violation.code_range, CodeRange.from_positions((3, 4), (5, 12))
+        )
+        self.assertEqual(
+            StyleViolation.from_code_range(
+                self.violation.error_code,
+                self.violation.code_range,
+                self.violation.message,
+            ),
+            self.violation,
+        )
+        # The constructor's old forms
+        for violation in (
+            StyleViolation(
+                self.violation.error_code,
+                self.violation.code_range,
+                self.violation.message,
+            ),
+            StyleViolation(
+                error_code=self.violation.error_code,
+                code_range=self.violation.code_range,
+                message=self.violation.message,
+            ),
+        ):
+            self.assertEqual(violation, self.violation)
+
+
+if __name__ == "__main__":
+    unittest.main()
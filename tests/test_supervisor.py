@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.runner import lint_files
+from cstlint.supervisor import worker_rss
+
+
+SOURCE_CODE = b"def f(x, y=[]):\n    x = lambda: eval('1')\n"
+# Only set off the patched rules in files with this marker
+MARKER = "pathological"
+
+
+def _hang(wrapper, *args):
+    if MARKER in wrapper.module.code:
+        time.sleep(60)
+    return []
+
+
+def _die(wrapper, *args):
+    if MARKER in wrapper.module.code:
+        os._exit(3)
+    return []
+
+
+def _bloat(wrapper, *args):
+    if MARKER in wrapper.module.code:
+        memory = bytearray(256 * 2**20)
+        time.sleep(60)
+        del memory
+    return []
+
+
+def _raise(wrapper, *args):
+    raise ValueError("unsupported construct")
+
+
+@unittest.skipUnless(
+    multiprocessing.get_start_method() == "fork",
+    "patches only reach workers that are forked",
+)
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.paths = []
+        for idx in range(5):
+            self.paths.append(os.path.join(self.tmp_dir.name, f"{idx}.py"))
+            with open(self.paths[-1], "wb") as file:
+                file.write(SOURCE_CODE)
+        # The file in the middle is the pathological one
+        with open(self.paths[2], "ab") as file:
+            file.write(f"# {MARKER}\n".encode())
+
+    def lint(self, lint_module, jobs=2, **options):
+        with mock.patch("cstlint.engine.lint_module", lint_module):
+            return list(lint_files(self.paths, jobs, LintOptions(**options)))
+
+    def assert_only_middle_file_fails(self, results, error_code):
+        self.assertEqual([result.path for result in results], self.paths)
+        codes = [[v.error_code.error_code for v in r.violations] for r in results]
+        self.assertEqual(codes, [[], [], [error_code], [], []])
+
+    def test_timeout(self):
+        start = time.monotonic()
+        results = self.lint(_hang, timeout=0.5)
+        self.assert_only_middle_file_fails(results, "E0004")
+        self.assertLess(time.monotonic() - start, 30)
+
+    def test_worker_crash(self):
+        results = self.lint(_die, timeout=30)
+        self.assert_only_middle_file_fails(results, "E0003")
+        self.assertIn("exit code 3", results[2].violations[0].message)
+
+    @unittest.skipIf(worker_rss(os.getpid()) is None, "needs /proc")
+    def test_memory_limit(self):
+        max_memory = worker_rss(os.getpid()) + 128 * 2**20
+        results = self.lint(_bloat, max_memory=max_memory, timeout=30)
+        self.assert_only_middle_file_fails(results, "E0005")
+
+    def test_recycled_workers_match_unsupervised(self):
+        expected = list(lint_files(self.paths, 1))
+        for jobs in (1, 3):
+            with self.subTest(jobs=jobs):
+                results = list(
+                    lint_files(self.paths, jobs, LintOptions(max_files_per_worker=1))
+                )
+                self.assertEqual(
+                    [result.violations for result in results],
+                    [result.violations for result in expected],
+                )
+
+
+class TestCrashIsolation(unittest.TestCase):
+    def test_rule_exceptions_only_fail_the_file(self):
+        with mock.patch("cstlint.engine.lint_module", _raise):
+            result = lint_data("a.py", SOURCE_CODE)
+        [violation] = result.violations
+        self.assertEqual(violation.error_code.error_code, "E0003")
+        self.assertIn("ValueError: unsupported construct", violation.message)
+        self.assertEqual(len(lint_data("a.py", SOURCE_CODE).violations), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
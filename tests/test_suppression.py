@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+from cstlint.baseline import Baseline
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.runner import lint_file
+from cstlint.suppression import scan_source
+
+
+SOURCE_CODE = """\
+class C:
+    def m(self, x=[]):  # noqa: S1006
+        y = eval(  # NOQA:S1001
+            "1",
+        )
+
+        def inner():
+            return lambda: 0  # noqa
+        # noqa: S1003
+        return lambda: eval("2")
+def f(): return lambda: 1  # noqa: S1001
+"""
+
+
+def codes(violations):
+    return [(v.error_code.error_code, v.line_number) for v in violations]
+
+
+class TestNoqa(unittest.TestCase):
+    def test_scan(self):
+        scan = scan_source(SOURCE_CODE)
+        self.assertEqual(
+            scan.noqa,
+            {
+                2: ("S1006",),
+                3: ("S1001",),
+                4: ("S1001",),
+                5: ("S1001",),
+                8: None,
+                9: ("S1003",),
+                11: ("S1001",),
+            },
+        )
+        scopes = [scan.scope(line) for line in range(1, 13)]
+        self.assertEqual(
+            scopes,
+            ["", "C", "C.m", "C.m", "C.m", "C.m", "C.m", "C.m.inner"]
+            # Comments before a dedent are still in the block
+            + ["C.m.inner", "C.m", "", ""],
+        )
+
+    def test_suppressed_violations(self):
+        for backend in ("cst", "ast"):
+            with self.subTest(backend=backend):
+                result = lint_data(
+                    "a.py", SOURCE_CODE.encode(), LintOptions(backend=backend)
+                )
+                self.assertEqual(
+                    sorted(codes(result.violations)),
+                    [
+                        ("S1001", 10),
+                        ("S1002", 7),
+                        ("S1003", 10),
+                        ("S1003", 11),
+                    ],
+                )
+
+    def test_file_errors_are_not_suppressed(self):
+        result = lint_data("a.py", b"def f(:  # noqa\n")
+        self.assertEqual(codes(result.violations), [("E0001", 1)])
+
+
+class TestBaseline(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "a.py")
+        self.write("def f(x=[]):\n    return eval(x)\n\n\ndef g():\n    eval(1)\n")
+        self.baseline = Baseline()
+        self.baseline.add(lint_file(self.path))
+        baseline_path = os.path.join(self.tmp_dir.name, "baseline.json")
+        self.baseline.save(baseline_path)
+        self.baseline = Baseline.load(baseline_path)
+
+    def write(self, source_code):
+        with open(self.path, "w") as file:
+            file.write(source_code)
+
+    def lint(self):
+        result = lint_file(self.path)
+        self.baseline.filter(result)
+        return codes(result.violations)
+
+    def test_recorded_violations_are_ignored(self):
+        self.assertEqual(len(self.baseline), 3)
+        self.assertEqual(self.lint(), [])
+
+    def test_stable_when_lines_shift(self):
+        self.write(
+            "import os\n\n\ndef f(x=[]):\n    return  eval(x)\n\n\n"
+            "def g():\n    pass\n    eval(1)\n"
+        )
+        self.assertEqual(self.lint(), [])
+
+    def test_new_violations_are_reported(self):
+        self.write(
+            "def f(x=[]):\n    return eval(x)\n\n\ndef g():\n    eval(1)\n"
+            "    eval(1)\n\n\ndef h():\n    eval(1)\n"
+        )
+        # The same line again in g, and moved into another function
+        self.assertEqual(sorted(self.lint()), [("S1001", 7), ("S1001", 11)])
+
+    def test_other_files_are_unaffected(self):
+        result = lint_data("b.py", b"eval(1)\n")
+        self.baseline.filter(result)
+        self.assertEqual(codes(result.violations), [("S1001", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
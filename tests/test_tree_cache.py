@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import libcst as cst
+from cstlint.cache import ResultCache
+from cstlint.engine import CachedPositions
+from cstlint.runner import LintOptions
+from cstlint.runner import lint_data
+from cstlint.tree_cache import CachedTree
+from cstlint.tree_cache import TreeCache
+from cstlint.visitors import LintMetadataWrapper
+from libcst.metadata import PositionProvider
+
+
+SOURCE_CODE = "def f(x, y=[]):\n    z = eval('1')\n    return [lambda: z]\n"
+
+
+class TestTreeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.tree_cache = TreeCache(self.tmp_dir.name)
+        self.key = self.tree_cache.key(SOURCE_CODE.encode())
+
+    def lint(self, rules, **options):
+        return lint_data(
+            "a.py",
+            SOURCE_CODE.encode(),
+            LintOptions(rules=rules, tree_cache=self.tree_cache, **options),
+        )
+
+    def test_survives_rule_changes(self):
+        cold = self.lint(("S1003",), profile=True)
+        self.assertIn("parse", cold.profile.phases)
+
+        for rules in (("S1003",), ("S1001", "S1002"), ("S1004", "S1006")):
+            with self.subTest(rules=rules):
+                warm = self.lint(rules, profile=True)
+                self.assertNotIn("parse", warm.profile.phases)
+                uncached = lint_data("a.py", SOURCE_CODE.encode(), LintOptions(rules))
+                self.assertEqual(warm.violations, uncached.violations)
+
+    def test_positions_are_cached_once_resolved(self):
+        # No violations, so positions are never resolved
+        self.lint(("S1002", "S1004"))
+        self.assertEqual(self.tree_cache.get(self.key).position_nodes, ())
+
+        violations = self.lint(("S1001",)).violations
+        self.assertEqual(len(violations), 1)
+        cached = self.tree_cache.get(self.key)
+        positions = CachedPositions(cached.position_nodes, cached.positions)
+        wrapper = LintMetadataWrapper(cached.module, unsafe_skip_copy=True)
+        expected = wrapper.resolve(PositionProvider)
+        self.assertEqual(len(positions), len(expected))
+        self.assertEqual(dict(positions), dict(expected))
+
+        # Served from the cache: the same violation, without a parse
+        warm = self.lint(("S1001",), profile=True)
+        self.assertEqual(warm.violations, violations)
+        self.assertNotIn("parse", warm.profile.phases)
+
+    def test_unreadable_entries_are_misses(self):
+        self.tree_cache.set(self.key, CachedTree(cst.parse_module(SOURCE_CODE)))
+        path = self.tree_cache._entry_path(self.key)
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) // 2)
+        self.assertIsNone(self.tree_cache.get(self.key))
+        self.assertEqual(len(self.lint(("S1003",)).violations), 1)
+
+    def test_results_cache_prune_leaves_trees(self):
+        self.lint(("S1003",))
+        results = ResultCache(self.tmp_dir.name, "fingerprint", max_size=0)
+        results.set(results.key(b""), [])
+        results.prune()
+        self.assertIsNotNone(self.tree_cache.get(self.key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cstlint.runner import LintOptions
+from cstlint.runner import iter_violations
+from cstlint.runner import lint_data
+from cstlint.writers import JsonLinesWriter
+from cstlint.writers import SarifWriter
+from cstlint.writers import TextWriter
+
+
+SOURCE_CODE = b"def f(x, y=[]):\n    eval('1')\n    x = lambda: 0\n"
+
+
+def write_results(writer_type, results, with_lines=False):
+    stream = io.StringIO()
+    with writer_type(stream, with_lines=with_lines) as writer:
+        for result in results:
+            writer.write_result(result)
+    return stream.getvalue()
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.result = lint_data("a.py", SOURCE_CODE, LintOptions(with_lines=True))
+        self.clean = lint_data("clean.py", b"x = 1\n")
+
+    def test_text(self):
+        output = write_results(TextWriter, [self.result, self.clean])
+        self.assertEqual(
+            output.splitlines(),
+            [f"a.py:{violation.format()}" for violation in self.result.violations],
+        )
+        verbose = write_results(TextWriter, [self.result], with_lines=True)
+        code_lines = SOURCE_CODE.decode().split("\n")
+        self.assertEqual(
+            verbose.splitlines(),
+            [
+                f"a.py:{violation.format()}: {code_lines[violation.line_number - 1]}"
+                for violation in self.result.violations
+            ],
+        )
+
+    def test_json_lines(self):
+        output = write_results(JsonLinesWriter, [self.result, self.clean])
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(
+            records,
+            [
+                {"path": "a.py", **violation.to_dict()}
+                for violation in self.result.violations
+            ],
+        )
+
+    def test_sarif(self):
+        for results in ([], [self.result, self.clean, self.result]):
+            with self.subTest(num_results=len(results)):
+                log = json.loads(write_results(SarifWriter, results, with_lines=True))
+                run = log["runs"][0]
+                self.assertEqual(log["version"], "2.1.0")
+                rule_ids = [rule["id"] for rule in run["tool"]["driver"]["rules"]]
+                self.assertEqual(
+                    len(run["results"]),
+                    sum(len(result.violations) for result in results),
+                )
+                for sarif_result in run["results"]:
+                    self.assertEqual(
+                        rule_ids[sarif_result["ruleIndex"]], sarif_result["ruleId"]
+                    )
+
+        region = run["results"][0]["locations"][0]["physicalLocation"]["region"]
+        violation = self.result.violations[0]
+        self.assertEqual(region["startLine"], violation.line_number)
+        self.assertEqual(region["startColumn"], violation.column_number + 1)
+
+
+class TestIterViolations(unittest.TestCase):
+    def test_yields_path_and_violation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, source_code in (("a.py", SOURCE_CODE), ("b.py", b"x = 1\n")):
+                with open(os.path.join(tmp_dir, name), "wb") as file:
+                    file.write(source_code)
+            violations = list(iter_violations([tmp_dir]))
+
+        expected = lint_data("a.py", SOURCE_CODE).violations
+        self.assertEqual([violation for _, violation in violations], expected)
+        self.assertEqual({os.path.basename(path) for path, _ in violations}, {"a.py"})
+
+
+if __name__ == "__main__":
+    unittest.main()